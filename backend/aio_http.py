@@ -0,0 +1,110 @@
+"""
+Async counterpart of http_client for the ASGI server.
+
+One httpx.AsyncClient per event loop with the same pool sizes, timeouts and
+jittered retry policy as HttpClient, so outbound Nessie and ElevenLabs calls
+never block the loop. Requests, new connections and retries are counted per
+host, as in HttpClient.
+"""
+import asyncio
+import random
+from contextlib import asynccontextmanager
+
+import httpx
+
+from http_client import (HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX, HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES,
+                         HTTP_POOL_MAXSIZE, HTTP_READ_TIMEOUT, RETRY_STATUSES, PoolStats, _host_key)
+
+
+class AsyncHttpClient:
+    """Pooled, keep-alive async HTTP client with timeouts and jittered retry"""
+
+    def __init__(self, pool_maxsize=HTTP_POOL_MAXSIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, max_retries=HTTP_MAX_RETRIES,
+                 backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = PoolStats()
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_maxsize),
+        )
+
+    def _backoff(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _send(self, method, url, retries=None, timeout=None, stream=False, **kwargs):
+        retries = self.max_retries if retries is None else retries
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        host = _host_key(url)
+
+        async def trace(event, info):
+            # httpcore reports each new TCP connection; requests on a reused one skip this event
+            if event == "connection.connect_tcp.complete":
+                self.stats.record_connect(host)
+
+        for attempt in range(retries + 1):
+            self.stats.record_request(host)
+            try:
+                request = self.client.build_request(method, url, extensions={"trace": trace}, **kwargs)
+                response = await self.client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.TimeoutException, httpx.RemoteProtocolError):
+                if attempt >= retries:
+                    raise
+                self.stats.record_retry(host)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                self.stats.record_retry(host)
+                delay = self._backoff(attempt, response)
+                await response.aclose()
+                await asyncio.sleep(delay)
+                continue
+            return response
+
+    async def request(self, method, url, **kwargs):
+        """Send a request and read the body, retrying connection errors and 429/5xx responses"""
+        return await self._send(method, url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Like request(), but the body is read by the caller (response.aiter_bytes())"""
+        response = await self._send(method, url, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = {}
+
+
+def get_async_http_client():
+    """Return the AsyncHttpClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncHttpClient()
+    return client
+
+
+async def close_async_http_client():
+    """Close the running loop's client, if one was created"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
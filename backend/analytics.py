@@ -0,0 +1,148 @@
+"""
+Vectorised spending analytics over columnar purchase arrays.
+
+Purchases are loaded once into NumPy columns (amount, day, category code,
+account code); every aggregate after that is a bincount / cumsum / argpartition
+over those arrays instead of a Python loop per purchase.
+"""
+import numpy as np
+
+
+def _factorize(values):
+    """(codes, labels) for a sequence of strings"""
+    labels, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.astype(np.int32), [str(label) for label in labels]
+
+
+def _parse_day(value):
+    """A purchase date as datetime64[D]; missing or non-ISO dates (e.g. '2024-1-5') become NaT"""
+    try:
+        return np.datetime64(value, 'D')
+    except (TypeError, ValueError):
+        return np.datetime64('NaT', 'D')
+
+
+class PurchaseColumns:
+    """Columnar view of a set of purchases"""
+
+    def __init__(self, amount, day, category_code, categories, account_code, accounts):
+        self.amount = np.asarray(amount, dtype=np.float64)
+        self.day = np.asarray(day, dtype='datetime64[D]')
+        self.category_code = np.asarray(category_code, dtype=np.int32)
+        self.categories = list(categories)
+        self.account_code = np.asarray(account_code, dtype=np.int32)
+        self.accounts = list(accounts)
+
+    def __len__(self):
+        return len(self.amount)
+
+    @classmethod
+    def from_columns(cls, amounts, dates, categories, accounts):
+        """Build from parallel sequences; dates are ISO strings (missing, empty or malformed dates become NaT)"""
+        category_code, category_labels = _factorize(categories)
+        account_code, account_labels = _factorize(accounts)
+        dates = [d or 'NaT' for d in dates]
+        try:
+            day = np.array(dates, dtype='datetime64[D]')
+        except ValueError:
+            # Some date isn't ISO: parse one at a time so only the bad ones become NaT
+            day = np.array([_parse_day(d) for d in dates], dtype='datetime64[D]')
+        return cls(amounts, day, category_code, category_labels, account_code, account_labels)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (account_id, purchase_date, amount, category) rows, e.g. PurchaseStore.purchases()"""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        accounts, dates, amounts, categories = zip(*rows)
+        return cls.from_columns(amounts, dates, categories, accounts)
+
+    @classmethod
+    def from_purchases(cls, purchases, categorize=lambda p: p.get('category') or 'Other'):
+        """Build from Nessie purchase dicts"""
+        purchases = list(purchases)
+        if not purchases:
+            return cls.empty()
+        return cls.from_columns(
+            [p.get('amount', 0) or 0 for p in purchases],
+            [p.get('purchase_date') for p in purchases],
+            [categorize(p) for p in purchases],
+            [p.get('payer_id') or '' for p in purchases],
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [])
+
+    # ------------------------------------------------------------------
+    # Aggregates
+    # ------------------------------------------------------------------
+
+    def total(self):
+        return float(self.amount.sum())
+
+    def _group(self, codes, labels):
+        sums = np.bincount(codes, weights=self.amount, minlength=len(labels))
+        return {label: float(total) for label, total in zip(labels, sums)}
+
+    def by_category(self):
+        return self._group(self.category_code, self.categories)
+
+    def by_account(self):
+        return self._group(self.account_code, self.accounts)
+
+    def by_month(self):
+        """{'YYYY-MM': amount}, oldest first; undated purchases are left out"""
+        dated = ~np.isnat(self.day)
+        if not dated.any():
+            return {}
+        months = self.day[dated].astype('datetime64[M]')
+        labels, codes = np.unique(months, return_inverse=True)
+        sums = np.bincount(codes, weights=self.amount[dated], minlength=len(labels))
+        return {str(label): float(total) for label, total in zip(labels, sums)}
+
+    def daily_totals(self):
+        """(days, totals) for every calendar day between the first and last purchase"""
+        dated = ~np.isnat(self.day)
+        if not dated.any():
+            return np.array([], dtype='datetime64[D]'), np.array([])
+        day = self.day[dated]
+        start = day.min()
+        offsets = (day - start).astype(np.int64)
+        totals = np.bincount(offsets, weights=self.amount[dated])
+        return start + np.arange(len(totals)), totals
+
+    def rolling_average(self, window=30):
+        """(days, mean daily spend over the trailing `window` days)"""
+        days, totals = self.daily_totals()
+        if not len(totals):
+            return days, totals
+        csum = np.cumsum(np.concatenate(([0.0], totals)))
+        idx = np.arange(1, len(totals) + 1)
+        lower = np.maximum(idx - window, 0)
+        return days, (csum[idx] - csum[lower]) / np.minimum(idx, window)
+
+    def top_k_categories(self, k=3):
+        """[(category, amount)] for the k biggest categories, largest first"""
+        sums = np.bincount(self.category_code, weights=self.amount, minlength=len(self.categories))
+        k = min(k, len(sums))
+        if k == 0:
+            return []
+        top = np.argpartition(-sums, k - 1)[:k]
+        top = top[np.argsort(-sums[top], kind='stable')]
+        return [(self.categories[i], float(sums[i])) for i in top]
+
+    def summary(self, window=30, k=3):
+        """JSON-ready breakdown used by the advisor routes"""
+        days, rolling = self.rolling_average(window)
+        return {
+            "total_spending": round(self.total(), 2),
+            "purchases": len(self),
+            "by_category": {c: round(v, 2) for c, v in self.by_category().items()},
+            "by_month": {m: round(v, 2) for m, v in self.by_month().items()},
+            "by_account": {a: round(v, 2) for a, v in self.by_account().items()},
+            "rolling_daily_average": round(float(rolling[-1]), 2) if len(rolling) else 0.0,
+            "rolling_window_days": window,
+            "top_categories": [{"category": c, "amount": round(v, 2)} for c, v in self.top_k_categories(k)],
+        }
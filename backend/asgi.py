@@ -0,0 +1,733 @@
+"""
+ASGI mode of the advisor API (production entry point).
+
+    uvicorn asgi:app --host 0.0.0.0 --port 3001 --workers 4
+    python asgi.py                     # same, single worker, no debug reloader
+
+Serves the same routes as server.py (see API_ENDPOINTS) on Quart, reusing
+server.py's caches, stores, prompt assembly and response shapes. Outbound
+Nessie and ElevenLabs calls go through the async HTTP client and Gemini
+calls through generate_content_async, so a request waiting on I/O holds a
+coroutine rather than a thread and one process can serve hundreds of
+concurrent sessions. Work that stays synchronous (SQLite stores, audio cache
+writes, prompt prefix builds) runs on worker threads via asyncio.to_thread.
+Computer Use car searches keep running on the job manager's threads; the
+handlers only poll them.
+"""
+import asyncio
+import os
+import re
+import secrets
+import time
+from datetime import datetime
+from io import BytesIO
+
+from quart import Quart, Response, jsonify, request, send_file
+
+import server as core
+from aio_http import close_async_http_client, get_async_http_client
+from fanout import fan_out_async
+from gemini_dispatch import AsyncDispatcher, DispatcherBusy
+from jobs import QueueFull, SUCCEEDED
+from tracing import current_timings, finish_request, observe, register_gauge, render_metrics, span, start_request
+from tts_stream import astart_speech
+
+ASGI_WORKERS = int(os.getenv('ASGI_WORKERS', 1))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 0.25))
+
+app = Quart(__name__)
+
+# Same rate-limit bucket as the sync dispatcher, so both modes share one Gemini quota per process
+gemini_dispatcher = AsyncDispatcher(bucket=core.gemini_dispatcher.bucket)
+
+
+@app.after_request
+async def add_cors_headers(response):
+    return core.apply_cors_headers(response, request.headers.get('Origin', ''))
+
+
+@app.before_request
+async def start_request_timing():
+    start_request()
+
+
+@app.after_request
+async def add_server_timing(response):
+    """Record request metrics and report per-stage timings in a Server-Timing header"""
+    timings = current_timings()
+    if timings is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        header = finish_request(timings, route, request.method, response.status_code)
+        if header:
+            response.headers['Server-Timing'] = header
+    return response
+
+
+register_gauge("gemini_async_queued", "Gemini calls waiting for admission in ASGI mode, by lane",
+               lambda: {(("lane", lane),): n for lane, n in gemini_dispatcher.stats()["queued_by_lane"].items()})
+register_gauge("gemini_async_inflight", "Gemini calls running in ASGI mode", lambda: gemini_dispatcher.stats()["inflight"])
+
+
+@app.after_serving
+async def close_http_client():
+    await close_async_http_client()
+
+# ============================================================================
+# NESSIE
+# ============================================================================
+
+async def get_nessie_accounts():
+    """Fetch accounts from Nessie API"""
+    url = f"{core.NESSIE_BASE_URL}/accounts?key={core.NESSIE_API_KEY}"
+    try:
+        with span("nessie.accounts"):
+            response = await get_async_http_client().get(url, timeout=core.NESSIE_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+    except Exception as e:
+        print(f"Nessie API error: {e}")
+        return []
+
+
+async def fetch_nessie_transactions(account_id):
+    """Fetch transactions for an account, raising on failure"""
+    url = f"{core.NESSIE_BASE_URL}/accounts/{account_id}/purchases?key={core.NESSIE_API_KEY}"
+    with span("nessie.purchases"):
+        response = await get_async_http_client().get(url, timeout=core.NESSIE_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+
+async def calculate_spending_summary():
+    """Calculate spending summary from Nessie data"""
+    accounts = await get_nessie_accounts()
+    if not accounts:
+        return dict(core.MOCK_SPENDING_SUMMARY)
+
+    account_ids = [account.get('_id') for account in accounts if account.get('_id')]
+    fetched = await fan_out_async(fetch_nessie_transactions, account_ids,
+                                  max_concurrency=core.NESSIE_FETCH_CONCURRENCY, deadline=core.NESSIE_FETCH_DEADLINE)
+    for account_id, error in fetched.errors.items():
+        print(f"Nessie transactions error ({account_id}): {error}")
+    if fetched.timed_out:
+        print(f"Nessie transactions timed out for {len(fetched.timed_out)} account(s)")
+    return await asyncio.to_thread(core.summarize_spending, account_ids, fetched)
+
+
+_summary_refreshes = {}  # user_id -> task loading that user's summary
+
+
+def _refresh_summary(user_id):
+    """The in-flight summary load for user_id, starting one if there is none"""
+    task = _summary_refreshes.get(user_id)
+    if task is None:
+        async def load():
+            try:
+                generation = core.summary_cache.generation(user_id)
+                summary = await calculate_spending_summary()
+                core.summary_cache.set(user_id, summary, generation)
+                return summary
+            finally:
+                _summary_refreshes.pop(user_id, None)
+        task = _summary_refreshes[user_id] = asyncio.ensure_future(load())
+    return task
+
+
+async def cached_spending_summary(user_id="default"):
+    """The summary cache entry for a user (stale entries are returned while a refresh runs)"""
+    summary, state = core.summary_cache.lookup(user_id)
+    if state == "stale":
+        _refresh_summary(user_id)
+    if state is None:
+        summary = await asyncio.shield(_refresh_summary(user_id))
+    return summary
+
+
+async def get_spending_summary(user_id="default"):
+    """Cached spending summary for a user"""
+    return core.public_summary(await cached_spending_summary(user_id))
+
+
+async def get_spending_breakdown(user_id="default"):
+    summary = await cached_spending_summary(user_id)
+    return await asyncio.to_thread(core.spending_breakdown, summary)
+
+# ============================================================================
+# GEMINI
+# ============================================================================
+
+async def build_prompt(user_message, conversation_history=None, user_id="default", spending=None):
+    spending = spending or await get_spending_summary(user_id)
+    # A new prefix may create an explicit Gemini cache, which is a blocking call
+    return await asyncio.to_thread(core.build_prompt, user_message, conversation_history, user_id, spending)
+
+
+async def generate(prompt, **kwargs):
+    with span("gemini.generate"):
+        return await prompt.model.generate_content_async(prompt.contents, **kwargs)
+
+
+async def ask_gemini(user_message, conversation_history=None, user_id="default", semantic=False, lane="default",
+                     spending=None):
+    """Async ask_gemini: same response cache, dispatcher lanes and fallbacks"""
+    if not core.prompt_assembler:
+        print("ERROR: Gemini model not initialized!")
+        return core.GEMINI_UNAVAILABLE_MESSAGE
+
+    try:
+        prompt = await build_prompt(user_message, conversation_history, user_id, spending)
+        scope = core.response_scope(prompt)
+        cached = core.response_cache.get(scope, user_message, semantic)
+        if cached is not None:
+            print(f"Response cache hit: {user_message[:60]}")
+            return cached
+
+        response = await gemini_dispatcher.call(
+            lambda: generate(prompt), lane,
+            key=(prompt.prefix_key, prompt.contents) if core.GEMINI_COALESCE else None)
+        core.prompt_assembler.log_usage(prompt, response)
+
+        core.response_cache.put(scope, user_message, response.text, semantic)
+        return response.text
+    except DispatcherBusy as e:
+        print(f"Gemini dispatcher busy: {e}")
+        return core.GEMINI_BUSY_MESSAGE
+    except Exception as e:
+        core.log_gemini_error(e)
+        return core.GEMINI_ERROR_MESSAGE
+
+
+async def stream_gemini(user_message, conversation_history=None, user_id="default", semantic=False, lane="interactive",
+                        spending=None):
+    """Async stream_gemini: yields the answer as text chunks while Gemini generates it"""
+    if not core.prompt_assembler:
+        print("ERROR: Gemini model not initialized!")
+        yield core.GEMINI_UNAVAILABLE_MESSAGE
+        return
+
+    prompt = await build_prompt(user_message, conversation_history, user_id, spending)
+    scope = core.response_scope(prompt)
+    cached = core.response_cache.get(scope, user_message, semantic)
+    if cached is not None:
+        print(f"Response cache hit: {user_message[:60]}")
+        yield cached
+        return
+    started = time.perf_counter()
+    first_token_at = None
+
+    emitted = False
+    answer = []
+    try:
+        async with gemini_dispatcher.slot(lane):
+            response = await generate(prompt, stream=True)
+            async for chunk in response:
+                text = getattr(chunk, 'text', '')
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    observe("gemini.first_token", first_token_at - started)
+                    print(f"Time to first token: {(first_token_at - started) * 1000:.0f}ms")
+                emitted = True
+                answer.append(text)
+                yield text
+        observe("gemini.stream", time.perf_counter() - started)
+        core.prompt_assembler.log_usage(prompt, response)
+        core.response_cache.put(scope, user_message, "".join(answer), semantic)
+    except DispatcherBusy as e:
+        print(f"Gemini dispatcher busy: {e}")
+        yield core.GEMINI_BUSY_MESSAGE
+    except Exception as e:
+        core.log_gemini_error(e)
+        if emitted:
+            raise core.GeminiStreamError(str(e)) from e
+        yield core.GEMINI_ERROR_MESSAGE
+    print(f"Stream finished in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+# ============================================================================
+# ELEVENLABS
+# ============================================================================
+
+async def text_to_speech(text, voice_id):
+    """Convert text to speech using ElevenLabs"""
+    url = f"{core.ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}"
+    headers, data = core.elevenlabs_request(text)
+    try:
+        with span("tts.synthesize"):
+            response = await get_async_http_client().post(url, json=data, headers=headers,
+                                                          timeout=core.ELEVENLABS_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+    except Exception as e:
+        print(f"ElevenLabs error: {e}")
+        return None
+
+
+async def cached_text_to_speech(text, voice_id):
+    """Return (cache_key, audio file), synthesizing only on a cache miss. The file is None on failure"""
+    key = core.speech_cache_key(text, voice_id)
+    cache = core.get_audio_cache()
+    audio = cache.open(key)
+    if audio:
+        return key, audio
+    audio_data = await text_to_speech(text, voice_id)
+    if not audio_data:
+        return key, None
+    await asyncio.to_thread(cache.put, key, audio_data)
+    return key, BytesIO(audio_data)
+
+
+async def cached_text_to_speech_chunks(text, voice_id):
+    """Yield MP3 bytes for text from the cache, or from ElevenLabs while writing them to the cache"""
+    key = core.speech_cache_key(text, voice_id)
+    cache = core.get_audio_cache()
+    cached = cache.open(key)
+    if cached:
+        with cached as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, core.TTS_STREAM_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+
+    url = f"{core.ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}/stream"
+    headers, data = core.elevenlabs_request(text)
+    writer = cache.open_writer(key)
+    completed = False
+    started = time.perf_counter()
+    try:
+        async with get_async_http_client().stream("POST", url, json=data, headers=headers,
+                                                  timeout=core.ELEVENLABS_TIMEOUT) as response:
+            observe("tts.first_byte", time.perf_counter() - started)
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(core.TTS_STREAM_CHUNK_BYTES):
+                writer.write(chunk)
+                yield chunk
+        completed = True
+    finally:
+        observe("tts.stream", time.perf_counter() - started)
+        # Incomplete audio (error or client gone) must never be cached
+        if completed:
+            await asyncio.to_thread(writer.commit)
+        else:
+            writer.abort()
+
+
+def prefetch_speech(voice_id):
+    """Start synthesizing text that is about to be generated; None if TTS isn't configured or prefetch is at capacity"""
+    if not core.ELEVENLABS_API_KEY:
+        return None
+    return core.speech_prefetcher.start_async(lambda sentence: cached_text_to_speech_chunks(sentence, voice_id))
+
+
+async def send_cached_audio(key, audio):
+    """
+    Serve audio with the cache key as ETag and Range support. audio is a file from
+    AudioCache.open(): Quart opens paths only when the body is sent, after an
+    eviction could have removed the file, so the clip (seconds of speech) is read
+    from the already open file instead
+    """
+    with audio:
+        data = await asyncio.to_thread(audio.read)
+    response = await send_file(BytesIO(data), mimetype='audio/mpeg', attachment_filename='speech.mp3', add_etags=False,
+                               cache_timeout=core.AUDIO_CACHE_MAX_AGE)
+    response.set_etag(key)
+    await response.make_conditional(request, accept_ranges=True, complete_length=response.content_length)
+    response.headers['Content-Location'] = f"/api/advisor/audio/{key}"
+    return response
+
+# ============================================================================
+# CAR SEARCH JOBS
+# ============================================================================
+
+async def wait_for_job_events(job, after, timeout):
+    """
+    job.wait_for_events() without tying up a thread: poll every
+    JOB_POLL_INTERVAL until there are new events, the job finished or timeout
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        events = job.wait_for_events(after, timeout=0)
+        if events or job.done or time.monotonic() >= deadline:
+            return events
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+async def wait_for_job(job):
+    while not job.done:
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+def sse_response(generator):
+    return Response(generator, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ============================================================================
+# API ROUTES
+# ============================================================================
+
+@app.route('/', methods=['GET'])
+async def home():
+    """Welcome page"""
+    return jsonify({
+        "message": "MoneyTalks Advisor API",
+        "version": "1.0.0",
+        "status": "running",
+        "mode": "asgi",
+        "endpoints": core.API_ENDPOINTS
+    })
+
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint"""
+    status = await asyncio.to_thread(core.health_status)
+    status["async_http_pools"] = get_async_http_client().stats.snapshot()
+    status["gemini_async_dispatcher"] = gemini_dispatcher.stats()
+    return jsonify(status)
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, request counts and queue/cache gauges"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+async def generate_welcome(user_id, spending, voice_id):
+    """Stream the welcome message while synthesizing its sentences; returns (welcome_message, audio handle or None)"""
+    prefetch = prefetch_speech(voice_id)
+    parts = []
+    try:
+        async for text in stream_gemini(core.WELCOME_PROMPT, user_id=user_id, lane="interactive", spending=spending):
+            parts.append(text)
+            if prefetch:
+                prefetch.feed(text)
+    except core.GeminiStreamError:
+        # As in core.generate_welcome: fall back to the default welcome
+        if prefetch:
+            prefetch.cancel()
+        prefetch, parts = None, []
+    except BaseException:
+        if prefetch:
+            prefetch.cancel()
+        raise
+
+    welcome_message = "".join(parts) or core.DEFAULT_WELCOME_MESSAGE
+    key = core.speech_cache_key(welcome_message, voice_id)
+    cached = core.get_audio_cache().get(key)
+    if not prefetch:
+        return welcome_message, core.audio_handle(key) if cached else None
+    if cached:
+        prefetch.cancel()
+    else:
+        if not parts:
+            prefetch.feed(welcome_message)
+        prefetch.finish(key)
+    return welcome_message, core.audio_handle(key)
+
+
+@app.route('/api/advisor/start-session', methods=['POST'])
+async def start_session():
+    """Initialize a new advisor session, synthesizing the welcome message's speech while it is generated"""
+    data = await request.get_json()
+    user_id = data.get('user_id', 'default')
+    voice_id = data.get('voice_id', '21m00Tcm4TlvDq8ikWAM')  # Default Rachel voice
+
+    spending = await get_spending_summary(user_id)
+    welcome_message, welcome_audio = await generate_welcome(user_id, spending, voice_id)
+    session_id = await asyncio.to_thread(core.create_advisor_session, user_id, welcome_message, spending)
+
+    return jsonify({
+        "session_id": session_id,
+        "welcome_message": welcome_message,
+        "welcome_audio": welcome_audio,
+        "financial_summary": spending
+    })
+
+
+async def add_user_message(session_id, user_message):
+    """Record the user's turn; session["conversation_history"] stays the history before it, as in core.chat()"""
+    await asyncio.to_thread(core.record_turn, session_id, "user", user_message)
+
+
+@app.route('/api/advisor/chat', methods=['POST'])
+async def chat():
+    """Handle chat messages"""
+    data = await request.get_json()
+    session_id = data.get('session_id')
+    user_message = data.get('message')
+
+    session = await asyncio.to_thread(core.sessions.get, session_id) if session_id else None
+    if not session:
+        return jsonify({"error": "Invalid session"}), 400
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    await add_user_message(session_id, user_message)
+
+    ai_response = await ask_gemini(user_message, session["conversation_history"], user_id=session["user_id"],
+                                   semantic=True, lane="interactive")
+
+    await asyncio.to_thread(core.record_turn, session_id, "advisor", ai_response)
+
+    return jsonify({
+        "response": ai_response,
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@app.route('/api/advisor/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Handle chat messages, streaming the advisor's answer as Server-Sent Events"""
+    data = await request.get_json()
+    session_id = data.get('session_id')
+    user_message = data.get('message')
+
+    session = await asyncio.to_thread(core.sessions.get, session_id) if session_id else None
+    if not session:
+        return jsonify({"error": "Invalid session"}), 400
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    await add_user_message(session_id, user_message)
+
+    async def generate():
+        parts = []
+        try:
+            async for text in stream_gemini(user_message, session["conversation_history"], user_id=session["user_id"],
+                                            semantic=True):
+                parts.append(text)
+                yield core.sse_event("token", {"text": text})
+        except core.GeminiStreamError:
+            yield core.sse_event("error", {"error": core.GEMINI_ERROR_MESSAGE})
+            return
+
+        # Only a completed stream is written to the history
+        ai_response = "".join(parts)
+        turn = await asyncio.to_thread(core.record_turn, session_id, "advisor", ai_response)
+        yield core.sse_event("done", {"response": ai_response, "timestamp": datetime.fromtimestamp(turn.at).isoformat()})
+
+    return sse_response(generate())
+
+
+@app.route('/api/advisor/synthesize-speech', methods=['POST'])
+async def synthesize_speech():
+    """Convert text to speech"""
+    data = await request.get_json()
+    text = data.get('text')
+    voice_id = data.get('voice_id', '21m00Tcm4TlvDq8ikWAM')  # Default Rachel voice
+
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+
+    key, audio = await cached_text_to_speech(text, voice_id)
+    if audio is None:
+        return jsonify({"error": "Failed to generate speech"}), 500
+
+    return await send_cached_audio(key, audio)
+
+
+@app.route('/api/advisor/audio/<key>', methods=['GET'])
+async def get_cached_audio(key):
+    """Serve previously synthesized audio by its cache key (supports ETag and Range requests)"""
+    if not re.fullmatch(r'[0-9a-f]{64}', key):
+        return jsonify({"error": "Invalid audio key"}), 400
+
+    # Welcome audio that is still being synthesized streams as it arrives
+    prefetch = core.speech_prefetcher.get(key)
+    if prefetch is not None:
+        if not await prefetch.wait_for_audio():
+            return jsonify({"error": "Failed to generate speech"}), 500
+        return Response(prefetch.iter_audio(), mimetype='audio/mpeg',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    audio = core.get_audio_cache().open(key)
+    if audio is None:
+        return jsonify({"error": "Audio not found"}), 404
+
+    return await send_cached_audio(key, audio)
+
+
+@app.route('/api/advisor/synthesize-speech/stream', methods=['POST'])
+async def synthesize_speech_stream():
+    """Convert text to speech, streaming MP3 audio sentence by sentence"""
+    data = await request.get_json()
+    text = data.get('text')
+    voice_id = data.get('voice_id', '21m00Tcm4TlvDq8ikWAM')  # Default Rachel voice
+
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+
+    audio = await astart_speech(text, lambda sentence: cached_text_to_speech_chunks(sentence, voice_id))
+    if audio is None:
+        return jsonify({"error": "Failed to generate speech"}), 500
+    return Response(audio, mimetype='audio/mpeg', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def request_user_id():
+    data = await request.get_json()
+    session_id = data.get('session_id')
+    return await asyncio.to_thread(core.session_user_id, session_id)
+
+
+@app.route('/api/advisor/analyze-spending', methods=['POST'])
+async def analyze_spending():
+    """Get spending analysis with AI insights"""
+    user_id = await request_user_id()
+    spending_summary = await get_spending_summary(user_id)
+
+    ai_insights, breakdown = await asyncio.gather(
+        ask_gemini(core.analysis_prompt(spending_summary), user_id=user_id),
+        get_spending_breakdown(user_id))
+
+    return jsonify({
+        "spending_summary": spending_summary,
+        "breakdown": breakdown,
+        "ai_insights": ai_insights
+    })
+
+
+@app.route('/api/advisor/generate-goals', methods=['POST'])
+async def generate_goals():
+    """Generate personalized financial goals"""
+    user_id = await request_user_id()
+    spending_summary = await get_spending_summary(user_id)
+
+    ai_goals = await ask_gemini(core.goals_prompt(spending_summary), user_id=user_id, lane="background")
+
+    return jsonify({
+        "goals": ai_goals,
+        "based_on": spending_summary
+    })
+
+
+@app.route('/api/advisor/end-session', methods=['POST'])
+async def end_session():
+    """End advisor session"""
+    data = await request.get_json()
+    session_id = data.get('session_id')
+
+    if not session_id:
+        return jsonify({"error": "No session_id provided"}), 400
+
+    session = await asyncio.to_thread(core.sessions.get, session_id)
+    if session:
+        summary = await ask_gemini(core.END_SESSION_PROMPT, session["conversation_history"],
+                                   user_id=session["user_id"])
+        await asyncio.to_thread(core.sessions.delete, session_id)
+        return jsonify({
+            "summary": summary,
+            "ended_at": datetime.now().isoformat()
+        })
+
+    # Session already ended or doesn't exist - return success anyway
+    return jsonify({
+        "summary": "Session ended.",
+        "ended_at": datetime.now().isoformat()
+    })
+
+
+async def submit_car_search_request():
+    """(budget, job, None) for the request's car search, or (budget, None, 429 response) when the queue is full"""
+    data = await request.get_json(silent=True) or {}
+    budget = data.get('budget', 30000)
+    try:
+        return budget, core.submit_car_search(budget), None
+    except QueueFull:
+        body, headers = core.car_search_busy(budget)
+        return budget, None, (jsonify(body), 429, headers)
+
+
+@app.route('/api/advisor/car-recommendations', methods=['POST', 'OPTIONS'])
+async def get_car_recommendations():
+    """Get Toyota car recommendations using Computer Use API (waits for the result)"""
+    if request.method == 'OPTIONS':
+        return "", 204
+    budget, job, busy = await submit_car_search_request()
+    if busy:
+        return busy
+
+    await wait_for_job(job)
+    if job.status == SUCCEEDED:
+        return jsonify({**job.result, "budget": budget})
+    return jsonify({
+        "success": False,
+        "error": job.error,
+        "budget": budget
+    }), 500
+
+
+@app.route('/api/advisor/car-recommendations/jobs', methods=['POST', 'OPTIONS'])
+async def create_car_search_job():
+    """Queue a car search and return its job id immediately"""
+    if request.method == 'OPTIONS':
+        return "", 204
+    _, job, busy = await submit_car_search_request()
+    if busy:
+        return busy
+    return jsonify(core.car_search_job_links(job)), 202
+
+
+@app.route('/api/advisor/car-recommendations/jobs/<job_id>', methods=['GET'])
+async def get_car_search_job(job_id):
+    """Status, per-turn progress and (when finished) the result of a car search job"""
+    job = core.car_search_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+
+    data = job.to_dict()
+    data["queue_position"] = core.car_search_jobs.queue_position(job)
+    return jsonify(data)
+
+
+@app.route('/api/admin/car-search-cache/invalidate', methods=['POST'])
+async def invalidate_car_search_cache():
+    """Drop cached car searches: one budget's bucket, or everything. Requires ADMIN_TOKEN"""
+    if not core.ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled (ADMIN_TOKEN not set)"}), 403
+    if not secrets.compare_digest(request.headers.get('Authorization', ''), f"Bearer {core.ADMIN_TOKEN}"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = await request.get_json(silent=True) or {}
+    if 'budget' in data:
+        bucket = core.budget_bucket(data['budget'])
+        core.car_search_cache.invalidate(bucket)
+        return jsonify({"invalidated": [bucket]})
+    core.car_search_cache.invalidate()
+    return jsonify({"invalidated": "all"})
+
+
+@app.route('/api/advisor/car-recommendations/jobs/<job_id>/events', methods=['GET'])
+async def stream_car_search_job(job_id):
+    """Follow a car search job as Server-Sent Events until it finishes"""
+    job = core.car_search_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+
+    async def generate():
+        seen = 0
+        while True:
+            events = await wait_for_job_events(job, seen, timeout=15)
+            if not events and not job.done:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield core.sse_event("progress", event)
+            seen += len(events)
+            if job.done and seen >= len(job.events):
+                yield core.sse_event("done", job.to_dict(include_events=False))
+                return
+
+    return sse_response(generate())
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print(f"MoneyTalks Advisor API (ASGI, {ASGI_WORKERS} worker(s)) on http://0.0.0.0:{core.PORT}")
+    uvicorn.run("asgi:app", host='0.0.0.0', port=core.PORT, workers=ASGI_WORKERS)
@@ -0,0 +1,180 @@
+"""
+Content-addressed, size-bounded disk cache for synthesized speech.
+
+Audio is stored as DATA_DIR/audio/<key>.mp3 where key is a SHA-256 of the
+text, voice and synthesis settings, so the same sentence with the same voice
+is only ever synthesized once. The key doubles as the HTTP ETag. Total size
+is bounded by evicting least recently used files; recency survives restarts
+via file mtimes.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from purchase_store import DATA_DIR
+
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', os.path.join(DATA_DIR, 'audio'))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+
+def audio_cache_key(text, voice_id, model_id, voice_settings):
+    """Stable content hash of everything that determines the synthesized audio"""
+    material = json.dumps({
+        "text": text,
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "voice_settings": voice_settings,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class AudioCacheWriter:
+    """Streams audio into a temp file; commit() publishes it under its key, abort() discards it"""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.size = 0
+        self.tmp_path = os.path.join(cache.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        self._file = open(self.tmp_path, 'wb')
+
+    def write(self, data):
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        self._file.close()
+        if self.size == 0:
+            os.remove(self.tmp_path)
+            return None
+        return self.cache._publish(self.key, self.tmp_path, self.size)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class AudioCache:
+    """LRU-evicting audio file cache keyed by audio_cache_key()"""
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "evicted_bytes": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _scan(self):
+        """Rebuild the LRU order from files already on disk"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp'):
+                os.remove(entry.path)
+            elif entry.name.endswith('.mp3') and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._stats["evictions"] += 1
+            self._stats["evicted_bytes"] += size
+            try:
+                os.remove(self._path(key))
+            except OSError:  # already gone, or still open by a reader on Windows
+                pass
+
+    def get(self, key):
+        """Path of the cached audio for key, or None"""
+        with self._lock:
+            if key not in self._entries:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._entries.pop(key, 0)
+            return None
+        return path
+
+    def open(self, key):
+        """
+        The cached audio for key opened for reading, or None. The file is opened
+        under the lock, so eviction by another request can't remove it between
+        the lookup and the open (an open file stays readable after it is deleted)
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._stats["misses"] += 1
+                return None
+            try:
+                f = open(self._path(key), 'rb')
+            except FileNotFoundError:
+                self._bytes -= self._entries.pop(key, 0)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        try:
+            os.utime(f.name)
+        except OSError:
+            pass
+        return f
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, data):
+        """Store audio bytes and return the cached file path"""
+        writer = self.open_writer(key)
+        try:
+            writer.write(data)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def open_writer(self, key):
+        return AudioCacheWriter(self, key)
+
+    def _publish(self, key, tmp_path, size):
+        path = self._path(key)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._bytes += size
+            self._stats["writes"] += 1
+            self._evict()
+        return path
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
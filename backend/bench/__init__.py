@@ -0,0 +1 @@
+"""Offline benchmarks and local stand-ins for the external APIs. Run from backend/: python -m bench.<name>"""
@@ -0,0 +1,78 @@
+"""
+Python-loop aggregation (as in the original calculate_spending_summary) vs the
+NumPy analytics engine, on 10k / 100k / 1M synthetic purchases.
+
+    python -m bench.analytics [--sizes 10000 100000 1000000]
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from analytics import PurchaseColumns
+from bench.stub_nessie import MERCHANT_CATEGORIES
+
+START = date(2024, 1, 1)
+
+
+def synthetic_purchases(n, accounts=20, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1, 500, n)
+    days = rng.integers(0, 365, n)
+    cats = rng.integers(0, len(MERCHANT_CATEGORIES), n)
+    accts = rng.integers(0, accounts, n)
+    dates = [(START + timedelta(days=int(d))).isoformat() for d in range(365)]
+    return [
+        {"amount": int(a), "purchase_date": dates[d], "category": MERCHANT_CATEGORIES[c], "payer_id": f"acct{k}"}
+        for a, d, c, k in zip(amounts, days, cats, accts)
+    ]
+
+
+def loop_summary(purchases):
+    """Totals, per-category/month/account sums and top-3, one dict update per purchase"""
+    total = 0
+    categories, months, accounts, days = {}, {}, {}, {}
+    for txn in purchases:
+        amount = txn.get('amount', 0)
+        total += amount
+        category = txn.get('category', 'Other')
+        categories[category] = categories.get(category, 0) + amount
+        month = txn['purchase_date'][:7]
+        months[month] = months.get(month, 0) + amount
+        account = txn['payer_id']
+        accounts[account] = accounts.get(account, 0) + amount
+        days[txn['purchase_date']] = days.get(txn['purchase_date'], 0) + amount
+    top = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]
+    return total, top
+
+
+def numpy_summary(columns):
+    return columns.total(), columns.by_category(), columns.by_month(), columns.by_account(), \
+        columns.rolling_average(30), columns.top_k_categories(3)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'purchases':>10} {'loop':>9} {'load cols':>10} {'numpy agg':>10} {'agg speedup':>12}")
+    for n in args.sizes:
+        purchases = synthetic_purchases(n)
+        loop_time, (loop_total, loop_top) = timed(loop_summary, purchases)
+        load_time, columns = timed(PurchaseColumns.from_purchases, purchases)
+        agg_time, (np_total, *_rest, np_top) = timed(numpy_summary, columns)
+        assert abs(loop_total - np_total) < 1e-6 and [c for c, _ in loop_top] == [c for c, _ in np_top]
+        print(f"{n:>10} {loop_time:>8.3f}s {load_time:>9.3f}s {agg_time:>9.4f}s {loop_time / agg_time:>11.1f}x")
+        del purchases, columns
+
+
+if __name__ == "__main__":
+    main()
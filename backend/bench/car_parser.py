@@ -0,0 +1,141 @@
+"""
+Throughput and accuracy of the car output parser on synthetic agent answers
+in the formats the Computer Use agent produces (numbered one-liners with
+sub-bullets, "Label: value" blocks under headings, plain bullets, and
+numbered lists mixing one-liners with "2. Make and Model: ..." blocks).
+
+    python -m bench.car_parser [--outputs 5000] [--chunk 24]
+
+Each answer is parsed once in one shot and once fed in `chunk`-character
+pieces, as it would arrive from a stream.
+"""
+import argparse
+import random
+import time
+
+from car_parser import CarOutputParser, parse_car_output
+
+MODELS = ["Camry", "Corolla", "RAV4", "Prius", "Highlander", "Tacoma", "Tundra", "Sienna", "4Runner", "C-HR"]
+TRIMS = ["LE", "SE", "XLE", "XSE", "Limited", "SR5", ""]
+FEATURES = ["backup camera", "Apple CarPlay", "lane keep assist", "heated seats", "AWD", "sunroof",
+            "adaptive cruise control", "low mileage", "one owner", "hybrid powertrain"]
+
+
+def synthetic_car(rng, budget):
+    trim = rng.choice(TRIMS)
+    return {
+        "make": "Toyota",
+        "model": f"{rng.choice(MODELS)} {trim}".strip(),
+        "year": rng.randint(2012, 2025),
+        "price": float(rng.randrange(8000, int(budget * 1.2), 50)),
+        "condition": rng.choice(["New", "Used"]),
+        "features": rng.sample(FEATURES, 3),
+    }
+
+
+def render_numbered(cars):
+    lines = [f"I found {len(cars)} Toyota options on Google Shopping:", ""]
+    for i, car in enumerate(cars, 1):
+        lines.append(f"{i}. **{car['year']} {car['make']} {car['model']}** - ${car['price']:,.0f} ({car['condition']})")
+        lines.append(f"   - Features: {', '.join(car['features'])}")
+        lines.append("   - Rated 4.5/5 by owners")
+    lines += ["", "Let me know if you'd like more details on any of these."]
+    return "\n".join(lines)
+
+
+def render_labelled(cars):
+    lines = ["Here are the results:", ""]
+    for i, car in enumerate(cars, 1):
+        lines += [
+            f"### Option {i}",
+            f"**Make and Model:** {car['make']} {car['model']}",
+            f"**Year:** {car['year']}",
+            f"**Price:** ${car['price']:,.2f}",
+            f"**Condition:** {car['condition']}",
+            f"**Key features:** {', '.join(car['features'])}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def render_bullets(cars):
+    return "\n".join(
+        f"* {car['make']} {car['model']} {car['year']}, {car['condition'].lower()}, listed at ${car['price']:,.0f}. "
+        f"{'; '.join(car['features'])}."
+        for car in cars
+    )
+
+
+def render_mixed(cars):
+    """Numbered list whose items alternate between one-liners and "Label: value" blocks"""
+    lines = ["These fit your budget:", ""]
+    for i, car in enumerate(cars, 1):
+        if i % 2:
+            lines.append(f"{i}. {car['year']} {car['make']} {car['model']} - ${car['price']:,.0f} ({car['condition']})")
+            lines.append(f"   - Features: {', '.join(car['features'])}")
+        else:
+            lines += [
+                f"{i}. Make and Model: {car['make']} {car['model']}",
+                f"   Year: {car['year']}",
+                f"   Price: ${car['price']:,.0f}",
+                f"   Condition: {car['condition']}",
+            ]
+    return "\n".join(lines)
+
+
+RENDERERS = [render_numbered, render_labelled, render_bullets, render_mixed]
+
+
+def synthetic_outputs(n, budget, seed=0):
+    rng = random.Random(seed)
+    outputs = []
+    for i in range(n):
+        cars = [synthetic_car(rng, budget) for _ in range(rng.randint(3, 5))]
+        outputs.append((RENDERERS[i % len(RENDERERS)](cars), cars))
+    return outputs
+
+
+def parse_streamed(text, budget, chunk):
+    parser = CarOutputParser(budget)
+    records = []
+    for start in range(0, len(text), chunk):
+        records += parser.feed(text[start:start + chunk])
+    return records + parser.close()
+
+
+def field_accuracy(outputs, parsed):
+    """Fraction of expected cars whose make/model/year/price/condition all came out exactly"""
+    correct = total = 0
+    for (_, expected), records in zip(outputs, parsed):
+        total += len(expected)
+        for car, record in zip(expected, records):
+            correct += (record.make, record.model, record.year, record.price, record.condition) == \
+                (car["make"], car["model"], car["year"], car["price"], car["condition"])
+    return correct / total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--outputs", type=int, default=5000)
+    parser.add_argument("--chunk", type=int, default=24)
+    parser.add_argument("--budget", type=float, default=30000)
+    args = parser.parse_args()
+
+    outputs = synthetic_outputs(args.outputs, args.budget)
+    total_bytes = sum(len(text) for text, _ in outputs)
+    expected_over = sum(car["price"] > args.budget for _, cars in outputs for car in cars)
+
+    print(f"{args.outputs} outputs, {total_bytes / 1e6:.1f}MB of text")
+    print(f"{'mode':>12} {'time':>8} {'outputs/s':>10} {'MB/s':>7} {'accuracy':>9} {'over budget':>12}")
+    for mode, parse in (("one-shot", lambda text: parse_car_output(text, args.budget)),
+                        (f"stream/{args.chunk}", lambda text: parse_streamed(text, args.budget, args.chunk))):
+        started = time.perf_counter()
+        parsed = [parse(text) for text, _ in outputs]
+        elapsed = time.perf_counter() - started
+        over = sum(r.within_budget is False for records in parsed for r in records)
+        print(f"{mode:>12} {elapsed:>7.2f}s {args.outputs / elapsed:>10.0f} {total_bytes / 1e6 / elapsed:>7.1f} "
+              f"{field_accuracy(outputs, parsed):>8.1%} {over:>5}/{expected_over:<6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local stand-in for google.generativeai's GenerativeModel.
+
+generate_content() / generate_content_async() sleep for a configurable
+latency (plus jitter) and return a deterministic answer derived from the
+prompt, with usage_metadata like the real responses. With stream=True the
+answer arrives in chunks (words), the first after `latency` and the rest
+`chunk_delay` apart; without it the whole answer arrives when the last
+chunk would have, as with the real API.
+
+    install_fake_gemini(server, latency=0.4)
+
+points the server's prompt assembler at the fake, with explicit
+context caching off, so advisor routes run without an API key.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+from prompt_cache import PromptAssembler, estimate_tokens
+
+ANSWER_SENTENCES = [
+    "Your spending is within budget this month, with housing as the largest category.",
+    "Consider moving a fixed amount into savings on payday so it happens automatically.",
+    "Dining out is trending up, so a weekly cap would keep food spending predictable.",
+    "Your emergency fund is almost halfway there; keeping the current pace finishes it this year.",
+    "Review the subscriptions renewing next week and cancel any you no longer use.",
+]
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, answer_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = answer_tokens
+        self.cached_content_token_count = 0
+
+
+class FakeResponse:
+    """Quacks like a GenerateContentResponse (or one chunk of a streamed one)"""
+
+    def __init__(self, text, usage=None, chunks=None, chunk_delay=0.0):
+        self.text = text
+        self.usage_metadata = usage
+        self._chunks = chunks or []
+        self._chunk_delay = chunk_delay
+
+    def __iter__(self):
+        for i, chunk in enumerate(self._chunks):
+            if i and self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield FakeResponse(chunk)
+
+    async def _aiter(self):
+        for i, chunk in enumerate(self._chunks):
+            if i and self._chunk_delay:
+                await asyncio.sleep(self._chunk_delay)
+            yield FakeResponse(chunk)
+
+    def __aiter__(self):
+        return self._aiter()
+
+
+class FakeGenerativeModel:
+    """GenerativeModel with a fixed latency and deterministic answers; counts calls"""
+
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name="fake-gemini", system_instruction=None, latency=0.4, jitter=0.1,
+                 chunk_delay=0.03, sentences=2, seed=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.sentences = sentences
+        self._rng = random.Random(seed)
+
+    def _answer(self, contents):
+        digest = int(hashlib.sha256(str(contents).encode()).hexdigest(), 16)
+        picks = [ANSWER_SENTENCES[(digest >> (8 * i)) % len(ANSWER_SENTENCES)] for i in range(self.sentences)]
+        return " ".join(picks)
+
+    def _delay(self):
+        with FakeGenerativeModel._lock:
+            FakeGenerativeModel.calls += 1
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _response(self, contents, stream):
+        text = self._answer(contents)
+        usage = _Usage(estimate_tokens(self.system_instruction + str(contents)), estimate_tokens(text))
+        chunks = [word + " " for word in text.split(" ")] if stream else None
+        return FakeResponse(text, usage, chunks, self.chunk_delay)
+
+    def _generation_time(self, response):
+        return 0.0 if response._chunks else self.chunk_delay * (len(response.text.split(" ")) - 1)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        response = self._response(contents, stream)
+        time.sleep(self._delay() + self._generation_time(response))
+        return response
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        response = self._response(contents, stream)
+        await asyncio.sleep(self._delay() + self._generation_time(response))
+        return response
+
+
+def install_fake_gemini(server, **model_kwargs):
+    """Route server.py's Gemini calls (sync and async) to FakeGenerativeModel"""
+    def factory(model_name, system_instruction=None):
+        return FakeGenerativeModel(model_name, system_instruction, **model_kwargs)
+
+    server.prompt_assembler = PromptAssembler("fake-gemini", explicit_cache=False, model_factory=factory)
+    return server.prompt_assembler
@@ -0,0 +1,137 @@
+"""
+Burst of advisor calls against a stub model that enforces a provider-style
+rate limit, with and without the Gemini dispatcher.
+
+    python -m bench.gemini_dispatch [--requests 60] [--limit-rps 5] [--latency 0.4]
+
+The stub rejects calls beyond `limit-rps` in any one-second window (like a
+429) and records peak concurrency. The burst mixes interactive chat calls,
+background goal generation and duplicate prompts; the report shows
+rejections, peak upstream concurrency, latency per lane and how many
+duplicates were coalesced.
+"""
+import argparse
+import random
+import threading
+import time
+from collections import deque
+
+from gemini_dispatch import Dispatcher, DispatcherBusy
+
+
+class RateLimited(Exception):
+    pass
+
+
+class StubModel:
+    """generate_content() that sleeps `latency` and 429s beyond `limit_rps`"""
+
+    def __init__(self, latency, limit_rps):
+        self.latency = latency
+        self.limit_rps = limit_rps
+        self._lock = threading.Lock()
+        self._window = deque()
+        self.calls = self.rejected = self.inflight = self.peak_inflight = 0
+
+    def generate_content(self, prompt):
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] >= 1.0:
+                self._window.popleft()
+            if len(self._window) >= self.limit_rps:
+                self.rejected += 1
+                raise RateLimited("429 Resource exhausted")
+            self._window.append(now)
+            self.calls += 1
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+        try:
+            time.sleep(self.latency)
+            return f"answer to {prompt}"
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+
+def workload(n, seed=0):
+    """(lane, prompt) pairs: 1/3 interactive, 2/3 background, with some duplicate background prompts"""
+    rng = random.Random(seed)
+    calls = []
+    for i in range(n):
+        if i % 3 == 0:
+            calls.append(("interactive", f"chat question {i}"))
+        else:
+            calls.append(("background", f"goals for user {rng.randint(0, n // 4)}"))
+    rng.shuffle(calls)
+    return calls
+
+
+def run_burst(calls, model, dispatcher):
+    latencies = {"interactive": [], "background": []}
+    failures = {"rate_limited": 0, "busy": 0}
+    lock = threading.Lock()
+
+    def one(lane, prompt):
+        started = time.perf_counter()
+        try:
+            if dispatcher is None:
+                model.generate_content(prompt)
+            else:
+                dispatcher.call(lambda: model.generate_content(prompt), lane, key=prompt)
+            outcome = None
+        except RateLimited:
+            outcome = "rate_limited"
+        except DispatcherBusy:
+            outcome = "busy"
+        with lock:
+            if outcome:
+                failures[outcome] += 1
+            else:
+                latencies[lane].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=one, args=call) for call in calls]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, failures
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--limit-rps", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--max-inflight", type=int, default=4)
+    args = parser.parse_args()
+
+    calls = workload(args.requests)
+    print(f"{args.requests} calls in one burst, stub allows {args.limit_rps}/s at {args.latency}s each")
+    print(f"{'mode':>11} {'wall':>6} {'ok':>4} {'429s':>5} {'busy':>5} {'upstream':>9} {'peak conc':>10} "
+          f"{'chat p50/p95':>14} {'bg p50/p95':>14} {'coalesced':>10}")
+    for mode in ("direct", "dispatcher"):
+        model = StubModel(args.latency, args.limit_rps)
+        dispatcher = None
+        if mode == "dispatcher":
+            # rate + burst <= limit keeps every one-second window under the stub's limit
+            rate = args.limit_rps * 0.8
+            dispatcher = Dispatcher(rate=rate, burst=max(1, int(args.limit_rps - rate)), max_inflight=args.max_inflight,
+                                    max_queue=args.requests, queue_timeout=120)
+        wall, latencies, failures = run_burst(calls, model, dispatcher)
+        ok = sum(len(v) for v in latencies.values())
+        chat, bg = latencies["interactive"], latencies["background"]
+        coalesced = dispatcher.stats()["coalesced"] if dispatcher else 0
+        chat_pct = f"{pct(chat, .5):.2f}/{pct(chat, .95):.2f}s"
+        bg_pct = f"{pct(bg, .5):.2f}/{pct(bg, .95):.2f}s"
+        print(f"{mode:>11} {wall:>5.1f}s {ok:>4} {failures['rate_limited']:>5} {failures['busy']:>5} "
+              f"{model.calls:>9} {model.peak_inflight:>10} {chat_pct:>14} {bg_pct:>14} {coalesced:>10}")
+
+
+if __name__ == "__main__":
+    main()
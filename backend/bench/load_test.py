@@ -0,0 +1,351 @@
+"""
+Offline load test of the advisor API against local stand-ins for Nessie,
+Gemini and ElevenLabs.
+
+    python -m bench.load_test [--app flask|asgi] [--scenario all|session|analyze|speech]
+                              [--users 20] [--duration 10] [--chat-turns 3]
+                              [--output bench/results/load_test.json]
+                              [--compare baseline.json --tolerance 0.2]
+
+The app (the Flask server, or the ASGI app under uvicorn) runs in this
+process on a local port with:
+
+- the stub Nessie API (bench.stub_nessie, records generated from
+  nessie_api.txt) with --nessie-latency per request
+- FakeGenerativeModel in place of Gemini (bench.fake_gemini) with
+  --gemini-latency per generate call
+- the stub ElevenLabs API (bench.stub_tts) with --tts-ttfb before the
+  first byte
+
+Each scenario runs --users virtual users in a closed loop for --duration
+seconds:
+
+- session: start-session, its welcome audio, --chat-turns chat messages,
+  end-session
+- analyze: analyze-spending
+- speech: synthesize-speech over a pool of --speech-texts texts, so some
+  requests hit the audio cache
+
+The report has p50/p95/p99/max latency per route and per scenario
+iteration, throughput and error counts, plus upstream call counts. It is
+written as JSON to --output. With --compare, p95 latency and throughput
+are checked against an earlier result file, and the exit status is 1 if
+either regressed by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.stub_nessie import start_stub_nessie
+from bench.stub_tts import start_stub_tts
+
+QUESTIONS = [
+    "How am I doing against my budget this month?",
+    "Where could I cut back on spending?",
+    "Should I put more into my emergency fund?",
+    "Can I afford the Paris trip by summer?",
+    "Which subscriptions should I cancel?",
+    "How much should I save each paycheck?",
+]
+SPEECH_SENTENCES = [
+    "Your spending is within budget this month.",
+    "Housing is your largest category at twelve hundred dollars.",
+    "Consider moving a fixed amount into savings on payday.",
+    "Dining out is trending up compared to last month.",
+    "Your emergency fund is almost halfway to its goal.",
+]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 1)  # noqa: E731
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_per_s": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(values, 0.50)),
+            "p95": ms(percentile(values, 0.95)),
+            "p99": ms(percentile(values, 0.99)),
+            "mean": ms(sum(values) / len(values)) if values else None,
+            "max": ms(values[-1] if values else None),
+        },
+    }
+
+
+class Recorder:
+    """Latencies and errors per route and per scenario iteration"""
+
+    def __init__(self):
+        self.routes = {}
+        self.route_errors = {}
+        self.iterations = []
+        self.iteration_errors = 0
+
+    async def call(self, client, route, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        if ok:
+            self.routes.setdefault(route, []).append(time.perf_counter() - started)
+        else:
+            self.route_errors[route] = self.route_errors.get(route, 0) + 1
+            self.routes.setdefault(route, [])
+        return response if ok else None
+
+    def report(self, elapsed):
+        return {
+            "iterations": summarize(self.iterations, self.iteration_errors, elapsed),
+            "routes": {route: summarize(values, self.route_errors.get(route, 0), elapsed)
+                       for route, values in sorted(self.routes.items())},
+            "requests_per_s": round(sum(len(v) for v in self.routes.values()) / elapsed, 2),
+        }
+
+
+async def session_scenario(client, recorder, vu, iteration, args):
+    response = await recorder.call(client, "start-session", "POST", "/api/advisor/start-session",
+                                   json={"user_id": f"load-user-{vu}"})
+    if response is None:
+        return False
+    session_id = response.json()["session_id"]
+    ok = True
+    welcome_audio = response.json().get("welcome_audio")
+    if welcome_audio:
+        ok &= await recorder.call(client, "welcome-audio", "GET", welcome_audio["url"]) is not None
+    for turn in range(args.chat_turns):
+        message = QUESTIONS[(vu + iteration + turn) % len(QUESTIONS)]
+        ok &= await recorder.call(client, "chat", "POST", "/api/advisor/chat",
+                                  json={"session_id": session_id, "message": message}) is not None
+    ok &= await recorder.call(client, "end-session", "POST", "/api/advisor/end-session",
+                              json={"session_id": session_id}) is not None
+    return ok
+
+
+async def analyze_scenario(client, recorder, vu, iteration, args):
+    return await recorder.call(client, "analyze-spending", "POST", "/api/advisor/analyze-spending",
+                               json={}) is not None
+
+
+async def speech_scenario(client, recorder, vu, iteration, args):
+    index = (vu * 7 + iteration) % args.speech_texts
+    text = " ".join(SPEECH_SENTENCES[(index + i) % len(SPEECH_SENTENCES)] for i in range(2)) + f" Note {index}."
+    response = await recorder.call(client, "synthesize-speech", "POST", "/api/advisor/synthesize-speech",
+                                   json={"text": text})
+    return response is not None and len(response.content) > 0
+
+
+SCENARIOS = {"session": session_scenario, "analyze": analyze_scenario, "speech": speech_scenario}
+
+
+async def run_scenario(base_url, scenario, args):
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def virtual_user(vu):
+            iteration = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                ok = await SCENARIOS[scenario](client, recorder, vu, iteration, args)
+                if ok:
+                    recorder.iterations.append(time.perf_counter() - started)
+                else:
+                    recorder.iteration_errors += 1
+                iteration += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(vu) for vu in range(args.users)))
+        elapsed = time.perf_counter() - started
+    return recorder.report(elapsed), elapsed
+
+
+def start_flask(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def start_asgi(app):
+    import socket
+
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on", access_log=False))
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve(sockets=[sock])), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}", stop
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(result, baseline, tolerance):
+    """Regressions of result vs baseline: p95 up or throughput down by more than tolerance"""
+    regressions = []
+    for scenario, current in result["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        pairs = [("iterations", current["iterations"], before["iterations"])]
+        pairs += [(route, stats, before["routes"][route]) for route, stats in current["routes"].items()
+                  if route in before.get("routes", {})]
+        for name, now, then in pairs:
+            p95_now, p95_then = now["latency_ms"]["p95"], then["latency_ms"]["p95"]
+            if p95_now and p95_then and p95_now > p95_then * (1 + tolerance):
+                regressions.append(f"{scenario}/{name}: p95 {p95_then}ms -> {p95_now}ms")
+        tput_now, tput_then = current["iterations"]["throughput_per_s"], before["iterations"]["throughput_per_s"]
+        if tput_then and tput_now < tput_then * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {tput_then}/s -> {tput_now}/s")
+    return regressions
+
+
+def print_report(scenario, report, out):
+    print(f"\n[{scenario}] {report['iterations']['count']} iterations, {report['requests_per_s']} req/s", file=out)
+    print(f"{'':>18} {'count':>6} {'err':>4} {'per s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}",
+          file=out)
+    for name, stats in [("iteration", report["iterations"])] + list(report["routes"].items()):
+        lat = stats["latency_ms"]
+        cells = " ".join(f"{'-' if lat[k] is None else lat[k]:>8}" for k in ("p50", "p95", "p99", "max"))
+        print(f"{name:>18} {stats['count']:>6} {stats['errors']:>4} {stats['throughput_per_s']:>7} {cells}", file=out)
+    print(f"{'upstream calls':>18} {report['upstream_calls']}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--scenario", choices=("all",) + tuple(SCENARIOS), default="all")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--chat-turns", type=int, default=3)
+    parser.add_argument("--speech-texts", type=int, default=20, help="distinct texts in the speech scenario")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--nessie-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-latency", type=float, default=0.4)
+    parser.add_argument("--tts-ttfb", type=float, default=0.2)
+    parser.add_argument("--gemini-rate", type=float, default=50, help="dispatcher rate limit (GEMINI_RATE_PER_SEC)")
+    parser.add_argument("--gemini-inflight", type=int, default=32, help="GEMINI_MAX_INFLIGHT")
+    parser.add_argument("--output", default=os.path.join("bench", "results", "load_test.json"))
+    parser.add_argument("--compare", help="earlier result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true", help="show the app's own logging")
+    args = parser.parse_args()
+
+    # The app prints per request; keep the report readable unless asked
+    out = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    nessie, nessie_url, data = start_stub_nessie(latency=args.nessie_latency, accounts=args.accounts)
+    tts, tts_url = start_stub_tts(ttfb=args.tts_ttfb)
+    data_dir = tempfile.mkdtemp(prefix="load_test_")
+    # Configuration is read at import time, so set it before the app is imported
+    os.environ.update({
+        "NESSIE_BASE_URL": nessie_url, "NESSIE_API_KEY": "bench",
+        "ELEVENLABS_BASE_URL": tts_url, "ELEVENLABS_API_KEY": "bench",
+        "DATA_DIR": data_dir, "AUDIO_CACHE_DIR": os.path.join(data_dir, "audio"),
+        "BROWSER_POOL_WARMUP": "0", "SDK_PREWARM": "0",
+        "GEMINI_RATE_PER_SEC": str(args.gemini_rate), "GEMINI_BURST": str(max(1, int(args.gemini_rate))),
+        "GEMINI_MAX_INFLIGHT": str(args.gemini_inflight),
+    })
+    import server
+    from bench.fake_gemini import FakeGenerativeModel, install_fake_gemini
+
+    install_fake_gemini(server, latency=args.gemini_latency)
+    if args.app == "asgi":
+        import asgi
+        base_url, stop = start_asgi(asgi.app)
+    else:
+        base_url, stop = start_flask(server.app)
+
+    schema_errors = data.validate()
+    print(f"{args.app} app on {base_url}; {args.users} users x {args.duration:g}s per scenario; "
+          f"latency nessie {args.nessie_latency * 1000:.0f}ms, gemini {args.gemini_latency * 1000:.0f}ms, "
+          f"tts ttfb {args.tts_ttfb * 1000:.0f}ms; stub data schema errors: {len(schema_errors)}", file=out)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "app": args.app,
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "scenarios": {},
+    }
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    try:
+        for scenario in scenarios:
+            upstream_before = (nessie.stats["requests"], FakeGenerativeModel.calls, tts.stats["requests"])
+            report, elapsed = asyncio.run(run_scenario(base_url, scenario, args))
+            report["elapsed_s"] = round(elapsed, 2)
+            report["upstream_calls"] = {
+                "nessie": nessie.stats["requests"] - upstream_before[0],
+                "gemini": FakeGenerativeModel.calls - upstream_before[1],
+                "tts": tts.stats["requests"] - upstream_before[2],
+            }
+            result["scenarios"][scenario] = report
+            print_report(scenario, report, out)
+    finally:
+        stop()
+        nessie.shutdown()
+        tts.shutdown()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {args.output}", file=out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=out)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}", file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Wall time of the spending summary with serial vs concurrent Nessie fetches.
+
+    python -m bench.nessie_fanout [--latency 0.05] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("NESSIE_API_KEY", "bench")
+os.environ.setdefault("SDK_PREWARM", "0")  # keep background imports out of the timings
+
+import server  # noqa: E402
+from bench.stub_nessie import start_stub_nessie  # noqa: E402
+
+
+def serial_summary():
+    """The pre-fan-out loop: one blocking fetch per account"""
+    total = 0
+    for account in server.get_nessie_accounts():
+        for txn in server.get_nessie_transactions(account.get("_id")):
+            total += txn.get("amount", 0)
+    return total
+
+
+def concurrent_summary():
+    return server.calculate_spending_summary()["total_spending"]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per request (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Stub latency {args.latency * 1000:.0f}ms, concurrency {server.NESSIE_FETCH_CONCURRENCY}")
+    print(f"{'accounts':>8} {'serial':>10} {'concurrent':>11} {'speedup':>8}")
+    for accounts in (1, 10, 100):
+        stub, url, _ = start_stub_nessie(latency=args.latency, accounts=accounts, purchases_per_account=20,
+                                         seed=accounts)
+        server.NESSIE_BASE_URL = url
+        try:
+            assert serial_summary() == concurrent_summary()
+            serial = timed(serial_summary, args.repeat)
+            concurrent = timed(concurrent_summary, args.repeat)
+        finally:
+            stub.shutdown()
+        print(f"{accounts:>8} {serial:>9.3f}s {concurrent:>10.3f}s {serial / concurrent:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+The Nessie API schema (nessie_api.txt, Swagger 2.0) as test data.
+
+fake_record() builds a record for a definition (account, purchase,
+merchant, ...) from the schema's properties: 24-char hex ids, enum values,
+integers above their minimum, ISO dates, nested $refs. validate() checks a
+record against a definition, and GET path templates are compiled into
+regexes so the stub answers exactly the routes the real API has.
+"""
+import json
+import os
+import re
+from datetime import date, timedelta
+
+SPEC_PATH = os.getenv('NESSIE_SPEC_PATH', os.path.join(os.path.dirname(__file__), '..', '..', 'nessie_api.txt'))
+
+_TYPES = {"string": str, "integer": int, "number": (int, float), "boolean": bool, "array": list, "object": dict}
+
+
+def load_spec(path=SPEC_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _resolve(spec, schema):
+    while "$ref" in schema:
+        schema = spec["definitions"][schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+def fake_value(spec, schema, rng, name=""):
+    schema = _resolve(spec, schema)
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if kind == "object":
+        return {prop: fake_value(spec, sub, rng, prop) for prop, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [fake_value(spec, schema.get("items", {}), rng, name) for _ in range(rng.randint(0, 2))]
+    if kind == "integer":
+        low = int(schema.get("minimum", 0))
+        return rng.randint(low, int(schema.get("maximum", low + 1000)))
+    if kind == "number":
+        return round(rng.uniform(schema.get("minimum", 0), schema.get("maximum", 1000)), 6)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if schema.get("format") == "date":
+        return (date(2025, 1, 1) + timedelta(days=rng.randrange(365))).isoformat()
+    length = schema.get("minLength")
+    if length and length == schema.get("maxLength"):
+        if name == "state":
+            return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(length))
+        digits = "0123456789" if "number" in name or "zip" in name else "0123456789abcdef"
+        return "".join(rng.choice(digits) for _ in range(length))
+    return f"{name or 'value'} {rng.randrange(10000)}"
+
+
+def fake_record(spec, definition, rng, **overrides):
+    """A record for spec definition `definition` with every property filled in, then overrides applied"""
+    record = fake_value(spec, spec["definitions"][definition], rng, definition)
+    record.update(overrides)
+    return record
+
+
+def validate(spec, definition, record):
+    """Schema violations of record against a definition (empty list if it conforms)"""
+    schema = _resolve(spec, spec["definitions"][definition])
+    errors = [f"{definition}: missing {field}" for field in schema.get("required", []) if field not in record]
+    for prop, sub in schema.get("properties", {}).items():
+        if prop not in record:
+            continue
+        value, sub = record[prop], _resolve(spec, sub)
+        expected = _TYPES.get(sub.get("type", "object" if "properties" in sub else None))
+        if expected and (not isinstance(value, expected) or (expected is int and isinstance(value, bool))):
+            errors.append(f"{definition}.{prop}: {type(value).__name__} is not {sub.get('type')}")
+        elif "enum" in sub and value not in sub["enum"]:
+            errors.append(f"{definition}.{prop}: {value!r} not in {sub['enum']}")
+        elif isinstance(value, str) and len(value) < sub.get("minLength", 0):
+            errors.append(f"{definition}.{prop}: shorter than {sub['minLength']}")
+        elif isinstance(value, (int, float)) and value < sub.get("minimum", value):
+            errors.append(f"{definition}.{prop}: below {sub['minimum']}")
+    return errors
+
+
+def get_routes(spec):
+    """[(regex, template, response schema)] for every GET path in the spec"""
+    routes = []
+    for template, methods in spec["paths"].items():
+        if "get" not in methods:
+            continue
+        pattern = re.sub(r"\\\{[^/]+\\\}", "([^/]+)", re.escape(template))
+        schema = methods["get"].get("responses", {}).get("200", {}).get("schema", {})
+        routes.append((re.compile(f"^{pattern}/?$"), template, schema))
+    return routes
@@ -0,0 +1,76 @@
+"""
+Advisor answer cache through the chat route: which questions in a new
+session (same financial snapshot, same welcome) are answered from the cache.
+
+    python -m bench.response_cache [--gemini-latency 0.4]
+
+Every question is asked as the first message of a fresh session, after a
+session that asked the "seed" question. Gemini is bench.fake_gemini and the
+semantic tier uses the default embedder and threshold. Exits non-zero when a
+question is (or isn't) served from the cache against expectations.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("ELEVENLABS_API_KEY", "")
+os.environ.setdefault("NESSIE_API_KEY", "bench")
+os.environ.setdefault("BROWSER_POOL_WARMUP", "0")
+os.environ.setdefault("SDK_PREWARM", "0")
+os.environ.setdefault("HISTORY_MAX_TURNS", "1000")
+
+import server  # noqa: E402
+from bench.fake_gemini import install_fake_gemini  # noqa: E402
+from bench.stub_nessie import start_stub_nessie  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+# (seed question, follow-up in a new session, expected cache tier: "exact", "semantic" or None)
+CASES = [
+    ("What's my budget?", "What's my budget", "exact"),
+    ("Should I lease or buy a car?", "should i buy or lease a car", "semantic"),
+    ("How much can I afford to spend on a car if I make 5000 a month?",
+     "How much can I afford to spend on a car if I make 8000 a month?", None),
+    ("Is it a good idea to lease a car?", "Is it a bad idea to lease a car?", None),
+]
+
+
+def ask(client, message):
+    """(seconds, response) for message as the first chat turn of a new session"""
+    session_id = client.post('/api/advisor/start-session', json={"user_id": "default"}).get_json()["session_id"]
+    started = time.perf_counter()
+    response = client.post('/api/advisor/chat', json={"session_id": session_id, "message": message}).get_json()
+    return time.perf_counter() - started, response["response"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gemini-latency", type=float, default=0.4)
+    args = parser.parse_args()
+
+    _, nessie_url, _ = start_stub_nessie(latency=0.01, accounts=2)
+    server.NESSIE_BASE_URL = nessie_url
+    install_fake_gemini(server, latency=args.gemini_latency, jitter=0, chunk_delay=0.005)
+    server.response_cache = ResponseCache(semantic=True)
+    client = server.app.test_client()
+
+    print(f"semantic threshold {server.response_cache.stats()['similarity']}, gemini {args.gemini_latency * 1000:.0f}ms")
+    print(f"{'follow-up':>66} {'expected':>9} {'served':>9} {'ms':>6}")
+    failures = 0
+    for seed, follow_up, expected in CASES:
+        ask(client, seed)
+        before = server.response_cache.stats()
+        seconds, _ = ask(client, follow_up)
+        after = server.response_cache.stats()
+        # The welcome of the new session is an exact hit too; only the chat turn's lookup is compared
+        served = ("semantic" if after["semantic_hits"] > before["semantic_hits"]
+                  else "exact" if after["hits"] - before["hits"] > 1 else None)
+        failures += served != expected
+        print(f"{follow_up[:66]:>66} {expected or 'miss':>9} {served or 'miss':>9} {seconds * 1000:>6.0f}"
+              f"{'' if served == expected else '  <- unexpected'}")
+    print(server.response_cache.stats())
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Memory held by 10k concurrent advisor sessions, by history format.
+
+    python -m bench.session_memory [--sessions 10000] [--turns 60] [--words 45]
+
+Every session gets --turns messages of about --words words each, appended
+one at a time through MemorySessionStore.append_message():
+
+- "dicts": the old format, an unbounded list of {"role", "content",
+  "timestamp": ISO string} dicts (stored as-is in the same store)
+- "compact": ConversationHistory of slotted Turns whose background
+  summaries never land, so only the HISTORY_HARD_MAX_TURNS cap applies
+- "compact + summary": the same, folded as record_turn() does in the server
+  (HISTORY_MAX_TURNS / HISTORY_KEEP_TURNS), with the extractive summary
+  standing in for Gemini so the run is offline and synchronous
+
+Memory is measured with tracemalloc (Python allocations made while the
+sessions were built), so it excludes interpreter and module overhead.
+Build times include tracemalloc's own overhead and are only comparable
+with each other.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from conversation import (ConversationHistory, Turn, extractive_summary, HISTORY_KEEP_TURNS, HISTORY_MAX_TURNS)
+from session_store import MemorySessionStore
+
+WORDS = ("budget savings rent groceries dining subscriptions emergency fund paycheck transfer balance "
+         "credit card interest goal month spending category travel insurance utilities").split()
+
+
+def message(rng, index, words):
+    """A distinct message string, as real ones are (no sharing between sessions)"""
+    return f"{index} " + " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class DictHistoryStore(MemorySessionStore):
+    """MemorySessionStore with the old list-of-dicts history"""
+
+    def append_message(self, session_id, message):
+        with self._lock:
+            session = self._live(session_id)
+            session['conversation_history'].append(message)
+            return len(session['conversation_history'])
+
+
+def build(kind, sessions, turns, words, seed=7):
+    rng = random.Random(seed)
+    store = (DictHistoryStore if kind == "dicts" else MemorySessionStore)(max_sessions=sessions)
+    ids = []
+    for _ in range(sessions):
+        history = [] if kind == "dicts" else ConversationHistory()
+        ids.append(store.create({"user_id": "default", "started_at": datetime.now().isoformat(),
+                                 "conversation_history": history}))
+    for index in range(turns):
+        role = "user" if index % 2 else "advisor"
+        for session_id in ids:
+            content = message(rng, index, words)
+            if kind == "dicts":
+                store.append_message(session_id, {"role": role, "content": content,
+                                                  "timestamp": datetime.now().isoformat()})
+                continue
+            count = store.append_message(session_id, Turn(role, content))
+            if kind == "compact + summary" and count > HISTORY_MAX_TURNS:
+                history = store._sessions[session_id][0]['conversation_history']
+                upto, folded = history.fold_candidates(HISTORY_KEEP_TURNS)
+                store.fold_history(session_id, upto, extractive_summary(history.summary, folded))
+    return store
+
+
+def measure(kind, sessions, turns, words):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = build(kind, sessions, turns, words)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    held = [len(store._sessions[sid][0]['conversation_history']) for sid in store._sessions]
+    del store
+    return current, peak, seconds, max(held)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--words", type=int, default=45)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.turns} messages of ~{args.words} words "
+          f"(fold past {HISTORY_MAX_TURNS}, keep {HISTORY_KEEP_TURNS})")
+    print(f"{'history':>18} {'held MB':>9} {'peak MB':>9} {'per session':>12} {'turns held':>11} {'build s':>8}")
+    for kind in ("dicts", "compact", "compact + summary"):
+        current, peak, seconds, held = measure(kind, args.sessions, args.turns, args.words)
+        print(f"{kind:>18} {current / 2**20:>9.1f} {peak / 2**20:>9.1f} {current / args.sessions / 1024:>10.1f}KB "
+              f"{held:>11} {seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cold start of an API worker: import time and time to the first /health.
+
+    python -m bench.startup [--runs 5] [--app flask|asgi|both]
+
+Every measurement is a fresh interpreter. "lazy" is the normal start-up
+(SDKs imported on first use, or by the background pre-warm); "eager"
+imports google.generativeai, google.genai and Playwright before the app, as
+server.py used to at import time. Time to first /health is measured from
+spawning the process to the first 200, with the pre-warm on and off.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER = "import sdk; sdk.load_gemini(); sdk.load_computer_use(); "
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); {eager}import server; print(time.perf_counter() - started)"
+SERVE_SCRIPTS = {
+    "flask": "{eager}from werkzeug.serving import run_simple; import server; run_simple('127.0.0.1', {port}, server.app)",
+    "asgi": "{eager}import uvicorn; uvicorn.run('asgi:app', host='127.0.0.1', port={port}, log_level='warning')",
+}
+
+
+def environment(prewarm):
+    env = dict(os.environ)
+    env.update({
+        "SDK_PREWARM": "1" if prewarm else "0",
+        "BROWSER_POOL_WARMUP": "0",
+        "DATA_DIR": tempfile.mkdtemp(prefix="startup_"),
+        "PYTHONWARNINGS": "ignore",
+    })
+    return env
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(eager):
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(eager=EAGER if eager else "")],
+                            cwd=BACKEND, env=environment(prewarm=False), capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def first_health(app, eager, prewarm, timeout=60):
+    port = free_port()
+    script = SERVE_SCRIPTS[app].format(eager=EAGER if eager else "", port=port)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", script], cwd=BACKEND, env=environment(prewarm),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"{app} didn't answer /health within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app", choices=["flask", "asgi", "both"], default="both")
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} fresh processes\n")
+    print(f"{'import server':>34} {'seconds':>8}")
+    for name, eager in (("eager SDKs", True), ("lazy", False)):
+        print(f"{name:>34} {statistics.median(import_time(eager) for _ in range(args.runs)):>8.3f}")
+
+    apps = ["flask", "asgi"] if args.app == "both" else [args.app]
+    print(f"\n{'first /health':>34} {'seconds':>8}")
+    for app in apps:
+        for name, eager, prewarm in (("eager SDKs", True, False), ("lazy, no pre-warm", False, False),
+                                     ("lazy + background pre-warm", False, True)):
+            seconds = statistics.median(first_health(app, eager, prewarm) for _ in range(args.runs))
+            print(f"{app + ', ' + name:>34} {seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in for the Nessie REST API (see nessie_api.txt).
+
+Serves deterministic accounts, purchases and merchants with a configurable
+per-request latency so benchmarks can run without network access. Records
+are generated from the schema's definitions and every GET route in the
+schema is answered: the account, purchase and merchant routes from the
+dataset, other list routes with an empty list.
+
+    python -m bench.stub_nessie --accounts 10 --latency 0.05 --port 4010
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from bench.nessie_schema import fake_record, get_routes, load_spec, validate
+
+MERCHANT_CATEGORIES = ["Food", "Housing", "Transport", "Shopping", "Entertainment", "Health", "Utilities"]
+
+
+def object_id(*parts):
+    """24-char hex id like the ones Nessie hands out"""
+    return hashlib.md5(":".join(str(p) for p in parts).encode()).hexdigest()[:24]
+
+
+class NessieData:
+    """Deterministic fake dataset shaped like the Nessie schema"""
+
+    def __init__(self, accounts=10, purchases_per_account=20, merchants=25, seed=42, spec=None):
+        rng = random.Random(seed)
+        self.seed = seed  # part of every id, so datasets with different seeds never share records
+        self.spec = spec or load_spec()
+        self.routes = get_routes(self.spec)
+        self.merchants = [
+            fake_record(self.spec, "merchant", rng, _id=object_id("merchant", seed, i), name=f"Merchant {i}",
+                        category=MERCHANT_CATEGORIES[i % len(MERCHANT_CATEGORIES)])
+            for i in range(merchants)
+        ]
+        self.accounts = [
+            fake_record(self.spec, "account", rng, _id=object_id("account", seed, i),
+                        type=["Checking", "Credit Card", "Savings"][i % 3], nickname=f"Account {i}", rewards=0,
+                        balance=rng.randint(100, 10000), account_number=f"{i:016d}",
+                        customer_id=object_id("customer", seed, 0))
+            for i in range(accounts)
+        ]
+        self.purchases = {}
+        start = date(2025, 1, 1)
+        for a, account in enumerate(self.accounts):
+            self.purchases[account["_id"]] = [
+                self._purchase(rng, account["_id"], (a, p), start + timedelta(days=p % 300))
+                for p in range(purchases_per_account)
+            ]
+        self.lock = threading.Lock()
+
+    def _purchase(self, rng, account_id, key, purchase_date):
+        return fake_record(self.spec, "purchase", rng, _id=object_id("purchase", self.seed, *key), type="merchant",
+                           merchant_id=rng.choice(self.merchants)["_id"], payer_id=account_id,
+                           purchase_date=purchase_date.isoformat(), amount=rng.randint(1, 250),
+                           status="completed", medium="balance", description="stub purchase")
+
+    def add_purchases(self, account_id, count, purchase_date=None, seed=None):
+        """Append new purchases to an account (for incremental-refresh benchmarks)"""
+        rng = random.Random(seed)
+        with self.lock:
+            existing = self.purchases.setdefault(account_id, [])
+            base = len(existing)
+            when = purchase_date or date.today()
+            new = [self._purchase(rng, account_id, (account_id, base + i), when) for i in range(count)]
+            existing.extend(new)
+            return new
+
+    def all_purchases(self):
+        with self.lock:
+            return [p for purchases in self.purchases.values() for p in purchases]
+
+    def _get(self, template, ids):
+        """Body for a GET route template, or None when the object doesn't exist"""
+        if template == "/accounts":
+            return self.accounts
+        if template == "/accounts/{id}":
+            return next((a for a in self.accounts if a["_id"] == ids[0]), None)
+        if template == "/customers/{id}/accounts":
+            return [a for a in self.accounts if a["customer_id"] == ids[0]]
+        if template == "/accounts/{id}/purchases":
+            with self.lock:
+                return list(self.purchases.get(ids[0], []))
+        if template == "/purchases/{id}":
+            return next((p for p in self.all_purchases() if p["_id"] == ids[0]), None)
+        if template == "/merchants":
+            return self.merchants
+        if template == "/merchants/{id}":
+            return next((m for m in self.merchants if m["_id"] == ids[0]), None)
+        if template == "/merchants/{id}/purchases":
+            return [p for p in self.all_purchases() if p["merchant_id"] == ids[0]]
+        if template == "/merchants/{id}/accounts/{accountId}/purchases":
+            return [p for p in self.all_purchases() if p["merchant_id"] == ids[0] and p["payer_id"] == ids[1]]
+        return None
+
+    def route(self, path):
+        """Return (status, body) for a GET path"""
+        for pattern, template, schema in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            body = self._get(template, match.groups())
+            if body is None and schema.get("type") == "array":
+                body = []  # a route we hold no data for (ATMs, bills, ...)
+            if body is not None:
+                return 200, body
+            break
+        return 404, {"code": 404, "message": "Not found"}
+
+    def validate(self):
+        """Schema violations across the dataset (empty when every record conforms)"""
+        errors = []
+        for definition, records in (("account", self.accounts), ("merchant", self.merchants),
+                                    ("purchase", self.all_purchases())):
+            for record in records:
+                errors.extend(validate(self.spec, definition, record))
+        return errors
+
+
+def make_handler(data, latency, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            status, body = data.route(urlparse(self.path).path)
+            payload = json.dumps(body).encode()
+            with stats["lock"]:
+                stats["requests"] += 1
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def start_stub_nessie(port=0, latency=0.05, **data_kwargs):
+    """Start the stub in a background thread. Returns (server, base_url, data)"""
+    data = NessieData(**data_kwargs)
+    stats = {"requests": 0, "lock": threading.Lock()}
+    server = StubServer(("127.0.0.1", port), make_handler(data, latency, stats))
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=4010)
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--purchases", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    server, url, _ = start_stub_nessie(args.port, args.latency, accounts=args.accounts,
+                                       purchases_per_account=args.purchases)
+    print(f"Stub Nessie listening on {url} (set NESSIE_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
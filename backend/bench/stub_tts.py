@@ -0,0 +1,79 @@
+"""
+Local stand-in for the ElevenLabs text-to-speech API.
+
+POST /v1/text-to-speech/{voice_id}[/stream] returns fake "MP3" bytes whose
+size grows with the text. The payload spells out the input text so callers
+can check that audio came back in the right order. Latency is modelled as a
+time-to-first-byte plus a delay per streamed chunk.
+
+    python -m bench.stub_tts --port 4020 --ttfb 0.2
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from bench.stub_nessie import StubServer
+
+BYTES_PER_CHAR = 400  # roughly 128kbps MP3 at normal speaking speed
+CHUNK_BYTES = 4096
+
+
+def fake_audio(text, bytes_per_char=BYTES_PER_CHAR):
+    """Deterministic stand-in audio for text"""
+    marker = f"<{text}>".encode()
+    size = max(len(marker), len(text) * bytes_per_char)
+    return (marker * (size // len(marker) + 1))[:size]
+
+
+def make_handler(ttfb, chunk_delay, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            audio = fake_audio(body.get("text", ""))
+            with stats["lock"]:
+                stats["requests"] += 1
+                stats["characters"] += len(body.get("text", ""))
+            streaming = self.path.rstrip("/").endswith("/stream")
+            # Non-streaming responses arrive only once the whole clip is generated
+            time.sleep(ttfb if streaming else ttfb + chunk_delay * (len(audio) // CHUNK_BYTES))
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(len(audio)))
+            self.end_headers()
+            for start in range(0, len(audio), CHUNK_BYTES):
+                self.wfile.write(audio[start:start + CHUNK_BYTES])
+                if streaming and chunk_delay:
+                    self.wfile.flush()
+                    time.sleep(chunk_delay)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_tts(port=0, ttfb=0.2, chunk_delay=0.01):
+    """Start the stub in a background thread. Returns (server, base_url)"""
+    stats = {"requests": 0, "characters": 0, "lock": threading.Lock()}
+    server = StubServer(("127.0.0.1", port), make_handler(ttfb, chunk_delay, stats))
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=4020)
+    parser.add_argument("--ttfb", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    server, url = start_stub_tts(args.port, args.ttfb, args.chunk_delay)
+    print(f"Stub TTS listening on {url} (set ELEVENLABS_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
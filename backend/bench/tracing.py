@@ -0,0 +1,74 @@
+"""
+Cost of the tracing spans, per span and per simulated request.
+
+    python -m bench.tracing [--spans 200000] [--threads 8]
+
+Times an empty block with tracing off and on (with and without a request
+being traced), then a request shaped like start-session (accounts, a few
+purchase fetches, summary, prompt, generate) from several threads at once,
+and a /metrics render afterwards.
+"""
+import argparse
+import threading
+import time
+
+import tracing
+from tracing import span, start_request, finish_request, render_metrics
+
+STAGES = ["nessie.accounts"] + ["nessie.purchases"] * 4 + ["summary.compute", "prompt.assemble", "gemini.generate"]
+
+
+def empty_spans(n, stage="bench.empty"):
+    started = time.perf_counter()
+    for _ in range(n):
+        with span(stage):
+            pass
+    return (time.perf_counter() - started) / n
+
+
+def fake_requests(n):
+    for _ in range(n):
+        timings = start_request()
+        for stage in STAGES:
+            with span(stage):
+                pass
+        finish_request(timings, "/api/advisor/start-session", "POST", 200)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    empty_spans(args.spans // 10, "bench.warmup")
+    tracing.TRACING_ENABLED = False
+    off = empty_spans(args.spans)
+    tracing.TRACING_ENABLED = True
+    on = empty_spans(args.spans)
+    start_request()
+    in_request = empty_spans(args.spans)
+    print(f"{'span':>24} {'ns/span':>8}")
+    for name, seconds in (("tracing off", off), ("on, no request", on), ("on, inside a request", in_request)):
+        print(f"{name:>24} {seconds * 1e9:>8.0f}")
+
+    per_thread = args.requests // args.threads
+    threads = [threading.Thread(target=fake_requests, args=(per_thread,)) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total = per_thread * args.threads
+    print(f"\n{total} traced requests ({len(STAGES)} spans + header each) on {args.threads} threads: "
+          f"{elapsed / total * 1e6:.1f}us/request")
+
+    started = time.perf_counter()
+    text = render_metrics()
+    print(f"/metrics render: {(time.perf_counter() - started) * 1000:.2f}ms, {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Buffered /synthesize-speech vs sentence-streamed /synthesize-speech/stream
+against the local stub TTS server: time to first audio byte, total time,
+peak Python memory, and a check that streamed audio arrives in sentence order.
+
+    python -m bench.tts_stream [--sentences 12] [--ttfb 0.2]
+"""
+import argparse
+import hashlib
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("ELEVENLABS_API_KEY", "bench")
+os.environ.setdefault("SDK_PREWARM", "0")  # keep background imports out of the timings
+
+import server  # noqa: E402
+from bench.stub_tts import fake_audio, start_stub_tts  # noqa: E402
+from tts_stream import split_sentences  # noqa: E402
+
+SENTENCES = [
+    "You spent $3,247 this month, which is 87% of your budget.",
+    "Housing is still your largest category at $1,200.",
+    "Food spending came in at $450, slightly above last month.",
+    "Your Paris trip fund is 68% of the way to its $5,000 target.",
+    "At the current pace you will reach it in about four months.",
+    "Consider moving $100 a month from dining out into that goal.",
+]
+
+
+def measure(client, path, text):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.post(path, json={"text": text}, buffered=False)
+    first_byte = None
+    digest = hashlib.sha256()
+    for chunk in response.response:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - started
+        digest.update(chunk)
+    response.close()
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, total, peak, digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=12)
+    parser.add_argument("--ttfb", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    stub, url = start_stub_tts(ttfb=args.ttfb, chunk_delay=args.chunk_delay)
+    server.ELEVENLABS_BASE_URL = url
+    client = server.app.test_client()
+    text = " ".join(SENTENCES[i % len(SENTENCES)] for i in range(args.sentences))
+
+    try:
+        buf_first, buf_total, buf_peak, _ = measure(client, "/api/advisor/synthesize-speech", text)
+        st_first, st_total, st_peak, streamed = measure(client, "/api/advisor/synthesize-speech/stream", text)
+    finally:
+        stub.shutdown()
+
+    expected = b"".join(fake_audio(s) for s in split_sentences(text))
+    in_order = hashlib.sha256(expected).hexdigest() == streamed
+
+    print(f"{len(text)} chars, {len(split_sentences(text))} sentence chunks, stub TTFB {args.ttfb * 1000:.0f}ms")
+    print(f"{'mode':>9} {'first byte':>11} {'total':>8} {'peak mem':>10}")
+    print(f"{'buffered':>9} {buf_first:>10.3f}s {buf_total:>7.3f}s {buf_peak / 1024:>8.0f}KB")
+    print(f"{'streamed':>9} {st_first:>10.3f}s {st_total:>7.3f}s {st_peak / 1024:>8.0f}KB")
+    print(f"streamed audio in sentence order: {in_order}")
+
+
+if __name__ == "__main__":
+    main()
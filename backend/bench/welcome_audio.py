@@ -0,0 +1,95 @@
+"""
+Time to the first byte of the spoken welcome: start-session followed by
+/synthesize-speech (the welcome is synthesized only once the client has
+it) vs start-session with speech prefetch, then GET welcome_audio.url.
+
+    python -m bench.welcome_audio [--runs 5] [--gemini-latency 0.6] [--ttfb 0.3]
+
+Gemini is bench.fake_gemini (streaming the welcome word by word after
+--gemini-latency), TTS is the stub ElevenLabs server. Caches are emptied
+before every run so each welcome is generated and synthesized from scratch.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("ELEVENLABS_API_KEY", "bench")
+os.environ.setdefault("NESSIE_API_KEY", "bench")
+os.environ.setdefault("BROWSER_POOL_WARMUP", "0")
+os.environ.setdefault("SDK_PREWARM", "0")
+
+import server  # noqa: E402
+from audio_cache import AudioCache  # noqa: E402
+from bench.fake_gemini import install_fake_gemini  # noqa: E402
+from bench.stub_nessie import start_stub_nessie  # noqa: E402
+from bench.stub_tts import start_stub_tts  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+
+def reset_caches():
+    server.response_cache = ResponseCache()
+    server._audio_cache = AudioCache(directory=tempfile.mkdtemp(prefix="welcome_audio_"))
+
+
+def first_byte(response, started):
+    """Seconds from started until the response's first body byte, and the body size"""
+    at, size = None, 0
+    for chunk in response.response:
+        if chunk and at is None:
+            at = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    return at, size
+
+
+def serial(client, user_id):
+    started = time.perf_counter()
+    session = client.post('/api/advisor/start-session', json={"user_id": user_id}).get_json()
+    welcome = time.perf_counter() - started
+    response = client.post('/api/advisor/synthesize-speech', json={"text": session["welcome_message"]}, buffered=False)
+    return (welcome,) + first_byte(response, started)
+
+
+def prefetched(client, user_id):
+    started = time.perf_counter()
+    session = client.post('/api/advisor/start-session', json={"user_id": user_id}).get_json()
+    welcome = time.perf_counter() - started
+    response = client.get(session["welcome_audio"]["url"], buffered=False)
+    return (welcome,) + first_byte(response, started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--gemini-latency", type=float, default=0.6)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--ttfb", type=float, default=0.3)
+    args = parser.parse_args()
+
+    _, nessie_url, _ = start_stub_nessie(latency=0.02, accounts=3)
+    _, tts_url = start_stub_tts(ttfb=args.ttfb)
+    server.NESSIE_BASE_URL = nessie_url
+    server.ELEVENLABS_BASE_URL = tts_url
+    install_fake_gemini(server, latency=args.gemini_latency, jitter=0, chunk_delay=args.chunk_delay, sentences=3)
+    client = server.app.test_client()
+    server.get_spending_summary("default")  # summary cache warm, so only Gemini and TTS are timed
+
+    print(f"gemini {args.gemini_latency * 1000:.0f}ms + {args.chunk_delay * 1000:.0f}ms/word, "
+          f"tts ttfb {args.ttfb * 1000:.0f}ms, {args.runs} runs")
+    print(f"{'mode':>10} {'start-session':>14} {'first audio':>12} {'audio bytes':>12}")
+    for name, run, prefetch in (("serial", serial, False), ("prefetch", prefetched, True)):
+        server.speech_prefetcher.enabled = prefetch
+        samples = []
+        for _ in range(args.runs):
+            reset_caches()
+            samples.append(run(client, "default"))
+            time.sleep(0.2)  # let the previous clip finish writing to its cache
+        welcome = statistics.median(s[0] for s in samples)
+        audio = statistics.median(s[1] for s in samples)
+        print(f"{name:>10} {welcome * 1000:>12.0f}ms {audio * 1000:>10.0f}ms {samples[-1][2]:>12}")
+
+
+if __name__ == "__main__":
+    main()
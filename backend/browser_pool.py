@@ -0,0 +1,203 @@
+"""
+Pool of pre-launched headless browsers for Computer Use runs.
+
+Playwright's sync API objects may only be used from the thread that created
+them, so each pooled browser lives on its own worker thread. Callers submit a
+function with BrowserPool.run(fn); an idle worker calls fn(page) on a warm
+page (fresh context, start URL already loaded) and returns the result.
+
+After every job the worker throws the context away and prepares the next warm
+page in the background. Browsers are health-checked while idle and relaunched
+after `max_pages` jobs or whenever they stop responding.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', 2))
+BROWSER_POOL_MAX_PAGES = int(os.getenv('BROWSER_POOL_MAX_PAGES', 20))
+BROWSER_POOL_HEALTH_INTERVAL = float(os.getenv('BROWSER_POOL_HEALTH_INTERVAL', 30))
+BROWSER_POOL_WARM_URL = os.getenv('BROWSER_POOL_WARM_URL', 'https://www.google.com')
+
+_STOP = object()
+
+
+class _BrowserWorker(threading.Thread):
+    """Owns one Playwright instance + browser and runs jobs on warm pages"""
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"browser-{index}", daemon=True)
+        self.pool = pool
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.pages_served = 0
+
+    # -- lifecycle --------------------------------------------------------
+
+    def _launch(self):
+        self._close_browser()
+        started = time.monotonic()
+        self.playwright = self.pool.sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=True)
+        self.pages_served = 0
+        self.pool._record("launches")
+        print(f"[{self.name}] browser launched in {time.monotonic() - started:.2f}s")
+
+    def _close_browser(self):
+        self._close_page()
+        for closer in (getattr(self.browser, 'close', None), getattr(self.playwright, 'stop', None)):
+            try:
+                if closer:
+                    closer()
+            except Exception:
+                pass
+        self.browser = None
+        self.playwright = None
+
+    def _close_page(self):
+        try:
+            if self.context:
+                self.context.close()
+        except Exception:
+            pass
+        self.context = None
+        self.page = None
+
+    def _prepare_page(self):
+        """Make sure a healthy browser and a warm page are ready"""
+        if self.browser is None or not self._healthy() or self.pages_served >= self.pool.max_pages:
+            if self.browser is not None:
+                self.pool._record("recycles")
+            self._launch()
+        if self.page is None:
+            self.context = self.browser.new_context(viewport=self.pool.viewport)
+            self.page = self.context.new_page()
+            if self.pool.warm_url:
+                self.page.goto(self.pool.warm_url, wait_until="domcontentloaded", timeout=30000)
+
+    def _healthy(self):
+        try:
+            if not self.browser.is_connected():
+                return False
+            if self.page is not None:
+                if self.page.is_closed():
+                    self._close_page()
+                else:
+                    self.page.evaluate("1")
+            return True
+        except Exception as e:
+            print(f"[{self.name}] health check failed: {e}")
+            self._close_page()
+            return False
+
+    def _warm(self):
+        try:
+            self._prepare_page()
+            return True
+        except Exception as e:
+            self.pool._record("warm_errors")
+            print(f"[{self.name}] warmup error: {e}")
+            self._close_browser()
+            return False
+
+    # -- main loop --------------------------------------------------------
+
+    def run(self):
+        self._warm()
+        while True:
+            try:
+                job = self.pool._jobs.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                self._warm()  # idle: health-check and keep a page ready
+                continue
+            if job is _STOP:
+                break
+            fn, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._run_job(fn, future)
+        self._close_browser()
+
+    def _run_job(self, fn, future):
+        warm = self.page is not None and self.browser is not None and self._healthy()
+        self.pool._record("warm_starts" if warm else "cold_starts")
+        try:
+            self._prepare_page()
+        except Exception as e:
+            self._close_browser()
+            future.set_exception(e)
+            return
+
+        self.pool._in_use.add(self.name)
+        try:
+            future.set_result(fn(self.page))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            self.pool._in_use.discard(self.name)
+            self.pages_served += 1
+            self._close_page()
+            self._warm()
+
+
+class BrowserPool:
+    """Fixed-size pool of browser worker threads"""
+
+    def __init__(self, sync_playwright, size=BROWSER_POOL_SIZE, max_pages=BROWSER_POOL_MAX_PAGES,
+                 viewport=None, warm_url=BROWSER_POOL_WARM_URL, health_interval=BROWSER_POOL_HEALTH_INTERVAL):
+        self.sync_playwright = sync_playwright
+        self.size = size
+        self.max_pages = max_pages
+        self.viewport = viewport
+        self.warm_url = warm_url
+        self.health_interval = health_interval
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._in_use = set()
+        self._lock = threading.Lock()
+        self._stats = {"jobs": 0, "warm_starts": 0, "cold_starts": 0, "launches": 0,
+                       "recycles": 0, "warm_errors": 0}
+
+    def _record(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    def start(self):
+        """Launch the worker threads; each one warms up its browser in the background"""
+        with self._lock:
+            if self._workers:
+                return
+            self._workers = [_BrowserWorker(self, i) for i in range(self.size)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn):
+        """Queue fn(page) for the next free browser; returns a Future"""
+        self.start()
+        future = Future()
+        self._record("jobs")
+        self._jobs.put((fn, future))
+        return future
+
+    def run(self, fn, timeout=None):
+        """Run fn(page) on a warm page and return its result"""
+        return self.submit(fn).result(timeout=timeout)
+
+    def shutdown(self):
+        for _ in self._workers:
+            self._jobs.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout=10)
+        self._workers = []
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["browsers"] = len(self._workers)
+        stats["busy"] = len(self._in_use)
+        stats["queued"] = self._jobs.qsize()
+        return stats
@@ -0,0 +1,273 @@
+"""
+Structured extraction of car recommendations from the Computer Use agent's
+final answer.
+
+The agent answers in loosely formatted Markdown: numbered or bulleted
+entries, headings, "Label: value" lines, one-line summaries such as
+"2021 Toyota Camry SE - $24,500 (Used)". CarOutputParser splits the text
+into one block per car and pulls typed fields (make, model, year, price,
+condition, description, features) out of each block with precompiled
+regexes, so no second model call is needed.
+
+The parser is incremental: feed() accepts text as it streams in and returns
+the records whose block is complete, and close() flushes the last one.
+parse_car_output() is the one-shot wrapper. Prices are checked against the
+search budget; over-budget cars are reported separately instead of being
+recommended.
+"""
+import re
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+MAKES = (
+    "Toyota", "Lexus", "Honda", "Acura", "Nissan", "Infiniti", "Mazda", "Subaru", "Mitsubishi",
+    "Hyundai", "Kia", "Genesis", "Ford", "Lincoln", "Chevrolet", "Chevy", "GMC", "Cadillac", "Buick",
+    "Dodge", "Ram", "Jeep", "Chrysler", "Tesla", "Volkswagen", "VW", "Audi", "BMW", "Mercedes-Benz",
+    "Mercedes", "Volvo", "Porsche", "Mini", "Fiat", "Land Rover", "Jaguar",
+)
+MAKE_ALIASES = {"chevy": "Chevrolet", "vw": "Volkswagen", "mercedes": "Mercedes-Benz"}
+
+_MAKE_RE = re.compile(r"\b(" + "|".join(re.escape(m) for m in sorted(MAKES, key=len, reverse=True)) + r")\b",
+                      re.IGNORECASE)
+_YEAR_RE = re.compile(r"\b(19[89]\d|20[0-4]\d)\b")
+_PRICE_RE = re.compile(r"\$\s?(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s?([kK])?\b")
+_CONDITION_RE = re.compile(r"\b(certified pre-owned|pre-owned|cpo|used|new)\b", re.IGNORECASE)
+_MARKER_RE = re.compile(r"^\s{0,3}(?:#{1,6}\s*|(?:\d{1,2}[.)]|[-*•])\s+)")
+_LABEL_RE = re.compile(r"^\s*(?:[-*•]\s*)?\**\s*([A-Za-z][A-Za-z /&()-]{1,40}?)\s*\**\s*:\s*\**\s*(.*)$")
+_MARKDOWN_RE = re.compile(r"[*_`#]+")
+# Words that end a model name when they follow the make ("Toyota Camry - $20,000", "Toyota RAV4 (Used)")
+_MODEL_RE = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9-]*(?:\s+(?!for\b|at\b|with\b|in\b|priced\b|listed\b)"
+                       r"[A-Za-z0-9][A-Za-z0-9-]*){0,3})")
+
+_FIELD_LABELS = {
+    "make and model": "make_model", "make & model": "make_model", "make/model": "make_model",
+    "vehicle": "make_model", "car": "make_model", "model": "model", "make": "make",
+    "year": "year", "price": "price", "listed price": "price", "asking price": "price", "cost": "price",
+    "condition": "condition", "type": "condition",
+    "description": "description", "brief description": "description", "summary": "description",
+    "features": "features", "key features": "features", "highlights": "features",
+    "description/features": "description", "description or key features": "description",
+    "brief description or key features": "description",
+}
+
+
+@dataclass
+class CarRecord:
+    """One parsed recommendation, in the shape the frontend's CarRecommendation expects"""
+    make: Optional[str] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    price: Optional[float] = None
+    condition: Optional[str] = None
+    description: str = ""
+    features: List[str] = field(default_factory=list)
+    within_budget: Optional[bool] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def parse_price(text):
+    """First dollar amount in text as a float ("$24,500" -> 24500.0, "$24.5k" -> 24500.0), or None"""
+    match = _PRICE_RE.search(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", "") + (match.group(2) or ""))
+    return value * 1000 if match.group(3) else value
+
+
+def _normalize_condition(text):
+    match = _CONDITION_RE.search(text)
+    if not match:
+        return None
+    return "New" if match.group(1).lower() == "new" else "Used"
+
+
+def _split_features(text):
+    return [f.strip(" .") for f in re.split(r"[;,]|\s\|\s", text) if f.strip(" .")]
+
+
+def _clean(text):
+    return _MARKDOWN_RE.sub("", text).strip()
+
+
+def _make_and_model(text):
+    """(make, model) from text like "2021 Toyota Camry SE - $24,500"""
+    match = _MAKE_RE.search(text)
+    if not match:
+        return None, None
+    make = match.group(1)
+    make = MAKE_ALIASES.get(make.lower(), next((m for m in MAKES if m.lower() == make.lower()), make))
+    model_match = _MODEL_RE.match(text[match.end():])
+    model = model_match.group(1).strip() if model_match else None
+    if model and _YEAR_RE.fullmatch(model.split()[-1]):
+        model = " ".join(model.split()[:-1]) or None
+    return make, model
+
+
+class _Block:
+    """Lines belonging to one car while they are being collected"""
+
+    def __init__(self):
+        self.record = CarRecord()
+        self.free_text = []
+        self.labelled = set()
+
+    def add_line(self, line):
+        text = _clean(_MARKER_RE.sub("", line, count=1))
+        if not text:
+            return
+        label = _LABEL_RE.match(_MARKER_RE.sub("", line, count=1))
+        kind = _FIELD_LABELS.get(label.group(1).strip().lower()) if label else None
+        if kind is None:
+            self._add_free_text(text)
+            return
+
+        value = _clean(label.group(2))
+        record = self.record
+        self.labelled.add(kind)
+        if kind == "make_model":
+            make, model = _make_and_model(value)
+            record.make = make or record.make
+            record.model = model or record.model or value or None
+            year = _YEAR_RE.search(value)
+            if year and record.year is None:
+                record.year = int(year.group(1))
+        elif kind == "make":
+            record.make = _make_and_model(value)[0] or value or record.make
+        elif kind == "model":
+            record.model = value or record.model
+        elif kind == "year":
+            year = _YEAR_RE.search(value)
+            record.year = int(year.group(1)) if year else record.year
+        elif kind == "price":
+            price = parse_price(value)
+            record.price = price if price is not None else record.price
+        elif kind == "condition":
+            record.condition = _normalize_condition(value) or record.condition
+        elif kind == "features":
+            record.features.extend(_split_features(value))
+        elif kind == "description":
+            record.description = f"{record.description} {value}".strip()
+
+    def _add_free_text(self, text):
+        """Unlabelled line: the entry's title line, or description/feature text"""
+        record = self.record
+        is_title = record.make is None and record.model is None
+        if is_title:
+            make, model = _make_and_model(text)
+            record.make, record.model = make, model
+        if record.year is None:
+            year = _YEAR_RE.search(text)
+            if year:
+                record.year = int(year.group(1))
+        if record.price is None:
+            record.price = parse_price(text)
+        if record.condition is None:
+            record.condition = _normalize_condition(text)
+        if not is_title:
+            self.free_text.append(text)
+
+    def has_car(self):
+        return self.record.make is not None or "make_model" in self.labelled or "model" in self.labelled
+
+    def finish(self, budget):
+        record = self.record
+        if not record.description and self.free_text:
+            record.description = " ".join(self.free_text)
+        elif self.free_text and not record.features:
+            record.features = [t for t in self.free_text if t != record.description]
+        if record.model and record.make and record.model.lower().startswith(record.make.lower()):
+            record.model = record.model[len(record.make):].strip() or None
+        if budget is not None and record.price is not None:
+            record.within_budget = record.price <= budget
+        return record
+
+
+class CarOutputParser:
+    """
+    Incremental parser. feed() text chunks in order; each call returns the
+    records completed by that chunk. close() returns the final record.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self._pending = ""
+        self._block = None
+        self._after_blank = False
+
+    def _ends_entry(self, line):
+        """Unindented, unmarked prose after a blank line is closing commentary, not part of the last car"""
+        if not self._after_blank or line[:1].isspace() or _MARKER_RE.match(line):
+            return False
+        label = _LABEL_RE.match(line)
+        return not (label and label.group(1).strip().lower() in _FIELD_LABELS)
+
+    def _starts_entry(self, line):
+        """True if line opens a new car entry rather than continuing the current one"""
+        stripped = line.strip()
+        if not stripped:
+            return False
+        marker = _MARKER_RE.match(line) and len(line) - len(line.lstrip()) <= 3  # not an indented sub-bullet
+        if marker and (stripped.startswith("#") or stripped[0].isdigit()):
+            # Headings and top-level numbered items always open an entry, even "2. Make and Model: ..."
+            return True
+        label = _LABEL_RE.match(_MARKER_RE.sub("", stripped, count=1))
+        kind = _FIELD_LABELS.get(label.group(1).strip().lower()) if label else None
+        if kind in ("make_model", "make"):
+            # A second "Make and Model:" line means the previous car's fields are done
+            return self._block is None or "make_model" in self._block.labelled or "make" in self._block.labelled
+        if kind is not None or not marker:
+            return False
+        return bool(_MAKE_RE.search(stripped))
+
+    def _finish_block(self):
+        block, self._block = self._block, None
+        if block is not None and block.has_car():
+            return block.finish(self.budget)
+        return None
+
+    def _feed_line(self, line, completed):
+        if not line.strip():
+            self._after_blank = True
+            return
+        starts = self._starts_entry(line)
+        if starts or self._ends_entry(line):
+            record = self._finish_block()
+            if record is not None:
+                completed.append(record)
+            self._block = _Block() if starts else None
+        self._after_blank = False
+        if self._block is not None:
+            self._block.add_line(line)
+
+    def feed(self, chunk):
+        completed = []
+        self._pending += chunk
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._feed_line(line, completed)
+        return completed
+
+    def close(self):
+        completed = []
+        if self._pending:
+            self._feed_line(self._pending, completed)
+            self._pending = ""
+        record = self._finish_block()
+        if record is not None:
+            completed.append(record)
+        return completed
+
+
+def parse_car_output(text, budget=None):
+    """Parse a complete agent answer into CarRecords"""
+    parser = CarOutputParser(budget)
+    return parser.feed(text) + parser.close()
+
+
+def split_by_budget(records):
+    """(recommended, over_budget). Cars without a price stay recommended; the agent was asked to respect the budget"""
+    recommended = [r for r in records if r.within_budget is not False]
+    over_budget = [r for r in records if r.within_budget is False]
+    return recommended, over_budget
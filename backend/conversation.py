@@ -0,0 +1,197 @@
+"""
+Compact, bounded conversation history for advisor sessions.
+
+A session's history is a ConversationHistory: recent turns as slotted Turn
+records (role, content, integer epoch seconds) plus a running summary of
+everything older. Once a history holds more than HISTORY_MAX_TURNS turns,
+HistorySummarizer folds all but the last HISTORY_KEEP_TURNS into the summary
+on a background thread (a Gemini call in the background lane), so the
+request that crossed the limit doesn't wait for it.
+
+Memory per session stays bounded even when summaries fall behind or fail:
+past HISTORY_HARD_MAX_TURNS the oldest turns are folded into the summary
+right away with a cheap extractive digest, and the summary is capped at
+HISTORY_SUMMARY_MAX_CHARS.
+
+Histories serialise to JSON as {"summary", "start", "turns": [[role,
+content, at], ...]} for the SQLite session store. The old list-of-dicts
+format is still read.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+HISTORY_MAX_TURNS = int(os.getenv('HISTORY_MAX_TURNS', 20))
+HISTORY_KEEP_TURNS = int(os.getenv('HISTORY_KEEP_TURNS', 8))
+HISTORY_HARD_MAX_TURNS = int(os.getenv('HISTORY_HARD_MAX_TURNS', 2 * HISTORY_MAX_TURNS))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv('HISTORY_SUMMARY_MAX_CHARS', 1200))
+HISTORY_SUMMARY_WORKERS = int(os.getenv('HISTORY_SUMMARY_WORKERS', 2))
+
+# Characters of each turn kept by the extractive fallback digest
+_DIGEST_CHARS = 160
+
+
+class Turn:
+    """One message: role ('user' or 'advisor'), content, and when it was sent (epoch seconds)"""
+
+    __slots__ = ("role", "content", "at")
+
+    def __init__(self, role, content, at=None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.at = int(time.time()) if at is None else at
+
+    def to_json(self):
+        return [self.role, self.content, self.at]
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, dict):  # pre-compact format: {"role", "content", "timestamp": ISO string}
+            stamp = data.get("timestamp")
+            at = int(datetime.fromisoformat(stamp).timestamp()) if stamp else None
+            return cls(data.get("role", "user"), data.get("content", ""), at)
+        role, content, at = data
+        return cls(role, content, at)
+
+    def __repr__(self):
+        return f"Turn({self.role!r}, {self.content[:40]!r}, at={self.at})"
+
+
+def format_turn(turn):
+    return f"{turn.role}: {turn.content}"
+
+
+def cap_summary(summary, max_chars=HISTORY_SUMMARY_MAX_CHARS):
+    """Keep the end of an overlong summary (the most recent context), cut at a word boundary"""
+    if len(summary) <= max_chars:
+        return summary
+    cut = summary[-max_chars:]
+    space = cut.find(" ")
+    return cut[space + 1:] if 0 <= space < 40 else cut
+
+
+def extractive_summary(summary, turns, max_chars=HISTORY_SUMMARY_MAX_CHARS):
+    """Summary extended with the start of each turn; the fallback when no model summary is available"""
+    lines = [summary] if summary else []
+    for turn in turns:
+        content = " ".join(turn.content.split())
+        if len(content) > _DIGEST_CHARS:
+            content = content[:_DIGEST_CHARS].rsplit(" ", 1)[0] + "..."
+        lines.append(f"{turn.role}: {content}")
+    return cap_summary(" ".join(lines), max_chars)
+
+
+class ConversationHistory:
+    """Recent turns plus a summary of the ones folded away; start counts every turn ever folded"""
+
+    __slots__ = ("turns", "summary", "start")
+
+    def __init__(self, turns=None, summary="", start=0):
+        self.turns = list(turns or [])
+        self.summary = summary
+        self.start = start
+
+    def __len__(self):
+        return len(self.turns)
+
+    def append(self, turn, hard_max=HISTORY_HARD_MAX_TURNS):
+        """Add a turn; past hard_max the oldest turns are folded into the summary right away"""
+        self.turns.append(turn)
+        overflow = len(self.turns) - hard_max
+        if overflow > 0:
+            self.fold(self.start + overflow, extractive_summary(self.summary, self.turns[:overflow]))
+        return len(self.turns)
+
+    def fold_candidates(self, keep=HISTORY_KEEP_TURNS):
+        """(upto, turns): the turns to summarise (all but the last keep) and the absolute index after them"""
+        count = max(0, len(self.turns) - keep)
+        return self.start + count, self.turns[:count]
+
+    def fold(self, upto, summary):
+        """Replace the turns before absolute index upto with summary. False if they were already folded"""
+        count = upto - self.start
+        if count <= 0:
+            return False
+        del self.turns[:count]
+        self.start = upto
+        self.summary = cap_summary(summary)
+        return True
+
+    def copy(self):
+        return ConversationHistory(self.turns, self.summary, self.start)
+
+    def to_json(self):
+        return {"summary": self.summary, "start": self.start, "turns": [turn.to_json() for turn in self.turns]}
+
+    @classmethod
+    def from_json(cls, data):
+        if data is None:
+            return cls()
+        if isinstance(data, list):  # pre-compact format: a plain list of message dicts
+            return cls([Turn.from_json(message) for message in data])
+        return cls([Turn.from_json(turn) for turn in data.get("turns", [])], data.get("summary", ""),
+                   data.get("start", 0))
+
+
+class HistorySummarizer:
+    """
+    Folds long session histories into their summaries on background threads.
+
+    summarize(summary, turns) returns the new summary text (normally a Gemini
+    call). If it fails, the turns are folded with extractive_summary() instead
+    so they are never lost. At most one job per session is queued or running.
+    """
+
+    def __init__(self, store, summarize, keep=HISTORY_KEEP_TURNS, workers=HISTORY_SUMMARY_WORKERS):
+        self.store = store
+        self.summarize = summarize
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='history-summary')
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._stats = {"scheduled": 0, "folded": 0, "fallbacks": 0, "turns_folded": 0}
+
+    def schedule(self, session_id):
+        """Queue a fold for session_id unless one is already queued. Returns whether a job was queued"""
+        with self._lock:
+            if session_id in self._pending:
+                return False
+            self._pending.add(session_id)
+            self._stats["scheduled"] += 1
+        self._executor.submit(self._run, session_id)
+        return True
+
+    def _run(self, session_id):
+        try:
+            session = self.store.get(session_id)
+            if session is None:
+                return
+            history = session['conversation_history']
+            upto, turns = history.fold_candidates(self.keep)
+            if not turns:
+                return
+            try:
+                summary = self.summarize(history.summary, turns)
+                fallback = not summary
+            except Exception as e:
+                print(f"History summary failed for {session_id[:16]}...: {e}")
+                summary, fallback = None, True
+            if fallback:
+                summary = extractive_summary(history.summary, turns)
+            if self.store.fold_history(session_id, upto, summary):
+                with self._lock:
+                    self._stats["folded"] += 1
+                    self._stats["fallbacks"] += fallback
+                    self._stats["turns_folded"] += len(turns)
+        except Exception as e:
+            print(f"History summarizer error: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), **self._stats}
@@ -0,0 +1,149 @@
+"""
+Bounded-concurrency fan-out for independent blocking calls (Nessie fetches etc).
+
+Calls run on a shared thread pool so concurrent requests can't multiply the
+number of outbound connections. Every fan-out has an overall deadline: calls
+that haven't finished by then are cancelled (if not started yet) or abandoned,
+and whatever did finish is returned as a partial result.
+
+fan_out_async() is the asyncio counterpart for coroutine functions (ASGI mode).
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', 16))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared fan-out thread pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix='fanout')
+        return _executor
+
+
+class FanOutResult:
+    """Outcome of a fan-out: successful results, errors and keys that never finished"""
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.timed_out = []
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    @property
+    def partial(self):
+        return bool(self.errors or self.timed_out or self.cancelled)
+
+    def __repr__(self):
+        return (f"FanOutResult(ok={len(self.results)}, errors={len(self.errors)}, "
+                f"timed_out={len(self.timed_out)}, elapsed={self.elapsed:.3f}s)")
+
+
+def fan_out(fn, keys, max_concurrency=8, deadline=10.0, cancel_event=None):
+    """
+    Call fn(key) for every key with at most max_concurrency calls in flight.
+
+    Returns a FanOutResult once every call finished, the deadline (seconds)
+    passed, or cancel_event was set. Per-call timeouts are the caller's job
+    (pass them through to the HTTP client inside fn); the deadline bounds the
+    whole fan-out.
+    """
+    result = FanOutResult()
+    keys = list(keys)
+    started = time.monotonic()
+    if not keys:
+        return result
+
+    executor = get_executor()
+    expires_at = started + deadline if deadline else None
+    pending_keys = iter(keys)
+    in_flight = {}
+
+    def submit_next():
+        key = next(pending_keys, None)
+        if key is None:
+            return False
+        # Each call runs in a copy of the caller's context (so spans report into its request)
+        in_flight[executor.submit(contextvars.copy_context().run, fn, key)] = key
+        return True
+
+    for _ in range(max(1, max_concurrency)):
+        if not submit_next():
+            break
+
+    while in_flight:
+        if cancel_event is not None and cancel_event.is_set():
+            result.cancelled = True
+            break
+
+        timeout = None
+        if expires_at is not None:
+            timeout = expires_at - time.monotonic()
+            if timeout <= 0:
+                break
+        # Wake up periodically so cancel_event is honoured promptly
+        if cancel_event is not None:
+            timeout = 0.1 if timeout is None else min(timeout, 0.1)
+
+        done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = in_flight.pop(future)
+            try:
+                result.results[key] = future.result()
+            except Exception as e:
+                result.errors[key] = e
+            submit_next()
+
+    # Anything still in flight or never submitted missed the deadline
+    for future, key in in_flight.items():
+        future.cancel()
+        result.timed_out.append(key)
+    result.timed_out.extend(pending_keys)
+
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+async def fan_out_async(fn, keys, max_concurrency=8, deadline=10.0):
+    """
+    Await fn(key) for every key with at most max_concurrency calls in flight.
+
+    Same contract as fan_out(): calls still running at the deadline are
+    cancelled and reported in timed_out.
+    """
+    result = FanOutResult()
+    keys = list(keys)
+    started = time.monotonic()
+    if not keys:
+        return result
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def call(key):
+        async with semaphore:
+            return await fn(key)
+
+    tasks = {asyncio.ensure_future(call(key)): key for key in keys}
+    done, pending = await asyncio.wait(tasks, timeout=deadline or None)
+    for task in done:
+        key = tasks[task]
+        try:
+            result.results[key] = task.result()
+        except Exception as e:
+            result.errors[key] = e
+    for task in pending:
+        task.cancel()
+    result.timed_out.extend(tasks[task] for task in pending)
+
+    result.elapsed = time.monotonic() - started
+    return result
@@ -0,0 +1,328 @@
+"""
+Admission control for Gemini generate calls.
+
+Every call goes through a Dispatcher, which enforces
+
+- a token-bucket rate limit (GEMINI_RATE_PER_SEC, bursts up to GEMINI_BURST)
+- at most GEMINI_MAX_INFLIGHT calls running at once
+- priority lanes: waiting calls are admitted interactive first, then
+  default, then background, FIFO within a lane
+- a bounded queue (GEMINI_MAX_QUEUE) and queue wait (GEMINI_QUEUE_TIMEOUT);
+  beyond either, DispatcherBusy is raised instead of piling up threads
+- optional coalescing: concurrent calls with the same key share one
+  upstream call
+
+Queue depth, in-flight count and per-lane wait times are exposed by stats().
+AsyncDispatcher applies the same policy to coroutines (ASGI mode) and can
+share a Dispatcher's token bucket so both modes draw on one rate limit.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+
+GEMINI_RATE_PER_SEC = float(os.getenv('GEMINI_RATE_PER_SEC', 5))
+GEMINI_BURST = int(os.getenv('GEMINI_BURST', 10))
+GEMINI_MAX_INFLIGHT = int(os.getenv('GEMINI_MAX_INFLIGHT', 8))
+GEMINI_MAX_QUEUE = int(os.getenv('GEMINI_MAX_QUEUE', 100))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', 30))
+
+LANES = {"interactive": 0, "default": 1, "background": 2}
+
+
+class DispatcherBusy(Exception):
+    """Raised when a call can't be admitted (queue full or queue wait timed out)"""
+
+
+class TokenBucket:
+    """Classic token bucket (non-blocking; the dispatcher does the waiting)"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available. Returns 0, or the seconds until the next token"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class _LaneStats:
+    def __init__(self):
+        self.calls = 0
+        self.waits = deque(maxlen=1000)  # recent queue waits in seconds
+
+    def snapshot(self):
+        waits = sorted(self.waits)
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1) if waits else 0.0
+        return {"calls": self.calls, "wait_ms_p50": pct(0.5), "wait_ms_p95": pct(0.95), "wait_ms_max": pct(1.0)}
+
+
+class Dispatcher:
+    """Rate-limited, concurrency-limited, prioritised gateway for model calls"""
+
+    def __init__(self, rate=GEMINI_RATE_PER_SEC, burst=GEMINI_BURST, max_inflight=GEMINI_MAX_INFLIGHT,
+                 max_queue=GEMINI_MAX_QUEUE, queue_timeout=GEMINI_QUEUE_TIMEOUT, name="gemini", bucket=None):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (lane priority, seq)
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._coalescing = {}  # key -> Future of the call everyone with that key shares
+        self._lanes = {lane: _LaneStats() for lane in LANES}
+        self._stats = {"admitted": 0, "rejected": 0, "timed_out": 0, "coalesced": 0, "errors": 0,
+                       "rate_limited": 0}
+
+    def _admit(self, lane):
+        """
+        Wait until this call is first in line, a slot is free and a rate token
+        is available. Tokens are only taken by the head of the queue, so rate
+        limiting never lets a background call overtake an interactive one.
+        Returns seconds waited.
+        """
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        rate_limited = False
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise DispatcherBusy(f"{self.name}: {len(self._waiting)} calls already queued")
+            ticket = (LANES.get(lane, LANES["default"]), next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    ready = self._cond.wait_for(
+                        lambda: self._waiting[0] == ticket and self._inflight < self.max_inflight,
+                        timeout=max(0.0, deadline - time.monotonic()))
+                    if not ready:
+                        raise DispatcherBusy(f"{self.name}: no slot within {self.queue_timeout:.0f}s")
+                    delay = self.bucket.try_acquire()
+                    if delay == 0:
+                        break
+                    if time.monotonic() + delay > deadline:
+                        raise DispatcherBusy(f"{self.name}: rate limit wait exceeds {self.queue_timeout:.0f}s")
+                    rate_limited = True
+                    # A higher-priority arrival may take the head while we wait for the token
+                    self._cond.wait(timeout=delay)
+            except DispatcherBusy:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._stats["timed_out"] += 1
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._inflight += 1
+            self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self._stats["admitted"] += 1
+            self._stats["rate_limited"] += 1 if rate_limited else 0
+            stats = self._lanes.get(lane, self._lanes["default"])
+            stats.calls += 1
+            stats.waits.append(waited)
+        return waited
+
+    def _release(self):
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, lane="default"):
+        """Hold one admitted slot for the duration of the block (e.g. a streamed response)"""
+        self._admit(lane)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def call(self, fn, lane="default", key=None):
+        """
+        Run fn() once admitted and return its result. Calls sharing a non-None
+        key while one is queued or running get that call's result instead.
+        """
+        if key is not None:
+            with self._cond:
+                future = self._coalescing.get(key)
+                owner = future is None
+                if owner:
+                    future = self._coalescing[key] = Future()
+                else:
+                    self._stats["coalesced"] += 1
+            if not owner:
+                return future.result()
+            try:
+                result = self._run(fn, lane)
+                future.set_result(result)
+                return result
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._cond:
+                    self._coalescing.pop(key, None)
+        return self._run(fn, lane)
+
+    def _run(self, fn, lane):
+        with self.slot(lane):
+            try:
+                return fn()
+            except Exception:
+                with self._cond:
+                    self._stats["errors"] += 1
+                raise
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "queued": len(self._waiting),
+                "queued_by_lane": {lane: sum(1 for p, _ in self._waiting if p == prio) for lane, prio in LANES.items()},
+                "inflight": self._inflight,
+                "max_inflight": self.max_inflight,
+                "rate_per_sec": self.bucket.rate,
+                "lanes": {lane: s.snapshot() for lane, s in self._lanes.items()},
+            })
+        return stats
+
+
+class AsyncDispatcher:
+    """Dispatcher for coroutines: same lanes, limits, coalescing and stats, without blocking the event loop"""
+
+    def __init__(self, rate=GEMINI_RATE_PER_SEC, burst=GEMINI_BURST, max_inflight=GEMINI_MAX_INFLIGHT,
+                 max_queue=GEMINI_MAX_QUEUE, queue_timeout=GEMINI_QUEUE_TIMEOUT, name="gemini-async", bucket=None):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self._cond = None  # created on first use, inside the event loop
+        self._waiting = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._coalescing = {}
+        self._lanes = {lane: _LaneStats() for lane in LANES}
+        self._stats = {"admitted": 0, "rejected": 0, "timed_out": 0, "coalesced": 0, "errors": 0,
+                       "rate_limited": 0}
+
+    def _condition(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _admit(self, lane):
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        rate_limited = False
+        cond = self._condition()
+        async with cond:
+            if len(self._waiting) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise DispatcherBusy(f"{self.name}: {len(self._waiting)} calls already queued")
+            ticket = (LANES.get(lane, LANES["default"]), next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    try:
+                        await asyncio.wait_for(cond.wait_for(
+                            lambda: self._waiting[0] == ticket and self._inflight < self.max_inflight),
+                            timeout=max(0.0, deadline - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        raise DispatcherBusy(f"{self.name}: no slot within {self.queue_timeout:.0f}s")
+                    delay = self.bucket.try_acquire()
+                    if delay == 0:
+                        break
+                    if time.monotonic() + delay > deadline:
+                        raise DispatcherBusy(f"{self.name}: rate limit wait exceeds {self.queue_timeout:.0f}s")
+                    rate_limited = True
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                # Timed out, rejected or the request was cancelled: give up our place in line
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._stats["timed_out"] += 1
+                cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._inflight += 1
+            cond.notify_all()
+
+            waited = time.monotonic() - started
+            self._stats["admitted"] += 1
+            self._stats["rate_limited"] += 1 if rate_limited else 0
+            stats = self._lanes.get(lane, self._lanes["default"])
+            stats.calls += 1
+            stats.waits.append(waited)
+        return waited
+
+    async def _release(self):
+        cond = self._condition()
+        async with cond:
+            self._inflight -= 1
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, lane="default"):
+        await self._admit(lane)
+        try:
+            yield
+        finally:
+            await self._release()
+
+    async def call(self, fn, lane="default", key=None):
+        """Await fn() once admitted; concurrent calls with the same non-None key share one call"""
+        if key is None:
+            return await self._run(fn, lane)
+        task = self._coalescing.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(task)
+        task = self._coalescing[key] = asyncio.ensure_future(self._run(fn, lane))
+        task.add_done_callback(lambda _: self._coalescing.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _run(self, fn, lane):
+        async with self.slot(lane):
+            try:
+                return await fn()
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update({
+            "queued": len(self._waiting),
+            "queued_by_lane": {lane: sum(1 for p, _ in self._waiting if p == prio) for lane, prio in LANES.items()},
+            "inflight": self._inflight,
+            "max_inflight": self.max_inflight,
+            "rate_per_sec": self.bucket.rate,
+            "lanes": {lane: s.snapshot() for lane, s in self._lanes.items()},
+        })
+        return stats
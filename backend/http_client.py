@@ -0,0 +1,171 @@
+"""
+Shared HTTP client for outbound API calls (Nessie, ElevenLabs).
+
+One requests.Session with a keep-alive connection pool per host, default
+timeouts and jittered exponential backoff on connection errors and retryable
+status codes. Pool hits/misses are counted per host: a miss is a new TCP
+connection, a hit is a request served on a reused one.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))  # hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))  # keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', 0.25))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', 4.0))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class PoolStats:
+    """Thread-safe per-host counters for requests, new connections and retries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _incr(self, host, field, amount=1):
+        with self._lock:
+            counters = self._hosts.setdefault(host, {"requests": 0, "connections": 0, "retries": 0})
+            counters[field] += amount
+
+    def record_request(self, host):
+        self._incr(host, "requests")
+
+    def record_connect(self, host):
+        self._incr(host, "connections")
+
+    def record_retry(self, host):
+        self._incr(host, "retries")
+
+    def snapshot(self):
+        """Per-host dict with hits, misses, retries and hit rate"""
+        with self._lock:
+            hosts = {host: dict(c) for host, c in self._hosts.items()}
+        report = {}
+        for host, c in hosts.items():
+            misses = min(c["connections"], c["requests"])
+            hits = c["requests"] - misses
+            report[host] = {
+                "requests": c["requests"],
+                "pool_hits": hits,
+                "pool_misses": misses,
+                "retries": c["retries"],
+                "hit_rate": round(hits / c["requests"], 3) if c["requests"] else 0.0,
+            }
+        return report
+
+
+def _counting_pool_classes(stats):
+    """Connection pool classes whose connections report every TCP connect to stats"""
+
+    def connection_cls(base, scheme):
+        class CountingConnection(base):
+            def connect(self):
+                stats.record_connect(f"{scheme}://{self.host}:{self.port}")
+                return super().connect()
+        return CountingConnection
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = connection_cls(HTTPConnection, "http")
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = connection_cls(HTTPSConnection, "https")
+
+    return {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count connection reuse"""
+
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self._stats)
+
+
+class HttpClient:
+    """Pooled, keep-alive HTTP client with timeouts and jittered retry"""
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), max_retries=HTTP_MAX_RETRIES,
+                 backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        adapter = CountingHTTPAdapter(self.stats, pool_connections=pool_connections,
+                                      pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt, response=None):
+        """Full-jitter exponential backoff, honouring Retry-After when the server sends one"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, retries=None, timeout=None, **kwargs):
+        """Send a request, retrying connection errors and 429/5xx responses"""
+        retries = self.max_retries if retries is None else retries
+        kwargs["timeout"] = timeout or self.timeout
+        host = _host_key(url)
+        for attempt in range(retries + 1):
+            self.stats.record_request(host)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                self.stats.record_retry(host)
+                time.sleep(self._backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                self.stats.record_retry(host)
+                delay = self._backoff(attempt, response)
+                response.close()
+                time.sleep(delay)
+                continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+def _host_key(url):
+    parsed = requests.utils.urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.scheme}://{parsed.hostname}:{port}"
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide HttpClient"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
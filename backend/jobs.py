@@ -0,0 +1,173 @@
+"""
+Background job queue for long-running work (Computer Use car searches).
+
+Jobs run on a bounded worker pool. At most `max_pending` jobs may be queued
+or running; beyond that submit() raises QueueFull so the route can answer
+429 instead of tying up a request thread. Each job records progress events
+that clients can poll or follow as a stream, and finished jobs are kept for
+`retention` seconds.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', 2))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 10))
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', 15 * 60))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when a JobManager already has max_pending unfinished jobs"""
+
+
+class Job:
+    """State, progress events and result of one background job"""
+
+    def __init__(self, kind, params):
+        self.id = f"job_{uuid.uuid4().hex}"
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    def add_event(self, event):
+        """Record a progress event (a JSON-serialisable dict)"""
+        with self._changed:
+            self.events.append({"seq": len(self.events), "time": time.time(), **event})
+            self._changed.notify_all()
+
+    def wait_for_events(self, after, timeout=None):
+        """Block until there are events past index `after` or the job finished. Returns the new events"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > after or self.done, timeout=timeout)
+            return self.events[after:]
+
+    def wait(self, timeout=None):
+        with self._changed:
+            return self._changed.wait_for(lambda: self.done, timeout=timeout)
+
+    def to_dict(self, include_events=True):
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+        if include_events:
+            data["events"] = list(self.events)
+        return data
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool with backpressure"""
+
+    def __init__(self, max_workers=JOB_CONCURRENCY, max_pending=JOB_MAX_PENDING, retention=JOB_RETENTION):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, kind, fn, **params):
+        """
+        Queue fn(progress, **params). progress(event_dict) records a progress event.
+        Raises QueueFull when max_pending jobs are already unfinished.
+        """
+        with self._lock:
+            self._expire()
+            if self._pending() >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise QueueFull(f"{self.max_pending} jobs already pending")
+            job = Job(kind, params)
+            self._jobs[job.id] = job
+            self._stats["submitted"] += 1
+        job.add_event({"type": "queued"})
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def add_completed(self, kind, result, **params):
+        """Record a job that is already done (e.g. answered from a cache) so clients can read it like any other"""
+        job = Job(kind, params)
+        now = time.time()
+        job.add_event({"type": "finished", "cached": True})
+        job._update(status=SUCCEEDED, result=result, started_at=now, finished_at=now)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+            self._stats["succeeded"] += 1
+        return job
+
+    def _run(self, job, fn):
+        job._update(status=RUNNING, started_at=time.time())
+        job.add_event({"type": "started"})
+        try:
+            result = fn(job.add_event, **job.params)
+            job.add_event({"type": "finished"})
+            job._update(status=SUCCEEDED, result=result, finished_at=time.time())
+            outcome = "succeeded"
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.add_event({"type": "failed", "error": str(e)})
+            job._update(status=FAILED, error=str(e), finished_at=time.time())
+            outcome = "failed"
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """0-based position among queued jobs (None once the job has started)"""
+        with self._lock:
+            if job.status != QUEUED:
+                return None
+            queued = sorted((j for j in self._jobs.values() if j.status == QUEUED), key=lambda j: j.created_at)
+            return next((i for i, j in enumerate(queued) if j.id == job.id), None)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            stats = dict(self._stats)
+        stats.update({
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+        })
+        return stats
@@ -0,0 +1,142 @@
+"""
+Merchant -> category index for categorising Nessie purchases.
+
+Nessie purchases carry a `merchant_id` but no category; the category lives on
+the merchant record. The index is built in bulk from `/merchants`, kept in an
+LRU-bounded dict (lookups refresh recency; a refresh keeps it, and the
+snapshot is saved in recency order), and persisted to disk so a restart
+doesn't have to refetch it. Lookups never touch the network; a background thread refreshes the index
+periodically.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from purchase_store import DATA_DIR
+
+MERCHANT_INDEX_PATH = os.getenv('MERCHANT_INDEX_PATH', os.path.join(DATA_DIR, 'merchants.json'))
+MERCHANT_INDEX_MAX_ENTRIES = int(os.getenv('MERCHANT_INDEX_MAX_ENTRIES', 100000))
+MERCHANT_INDEX_REFRESH_INTERVAL = float(os.getenv('MERCHANT_INDEX_REFRESH_INTERVAL', 6 * 60 * 60))
+
+
+def normalize_category(category):
+    """Nessie merchants have a category string, or in practice sometimes a list of them"""
+    if isinstance(category, (list, tuple)):
+        category = next((c for c in category if c), None)
+    if not category or not isinstance(category, str):
+        return None
+    return category.strip().replace('_', ' ').title() or None
+
+
+class MerchantIndex:
+    """In-memory LRU map of merchant_id -> category, backed by a JSON snapshot on disk"""
+
+    def __init__(self, fetch_merchants, path=MERCHANT_INDEX_PATH, max_entries=MERCHANT_INDEX_MAX_ENTRIES):
+        self.fetch_merchants = fetch_merchants
+        self.path = path
+        self.max_entries = max_entries
+        self.updated_at = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def _replace(self, categories):
+        """Swap in a new mapping, keeping the recency of merchants already indexed, then trim the LRU end"""
+        categories = {k: v for k, v in categories.items() if v}
+        with self._lock:
+            # Least recently used first: the existing entries in recency order, then new merchants as just inserted
+            entries = OrderedDict((k, categories[k]) for k in self._entries if k in categories)
+            entries.update((k, v) for k, v in categories.items() if k not in entries)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._entries = entries
+
+    def load(self):
+        """Load the persisted snapshot, if any. Returns True when entries were loaded"""
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Merchant index load error: {e}")
+            return False
+        self._replace(snapshot.get("merchants", {}))
+        self.updated_at = snapshot.get("updated_at")
+        return bool(self._entries)
+
+    def save(self):
+        with self._lock:
+            snapshot = {"updated_at": self.updated_at, "merchants": dict(self._entries)}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """Rebuild the index from a bulk merchant fetch. Returns True when the mapping changed"""
+        try:
+            merchants = self.fetch_merchants()
+        except Exception as e:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+            print(f"Merchant index refresh error: {e}")
+            return False
+        if not merchants:
+            return False
+
+        categories = {}
+        for merchant in merchants:
+            category = normalize_category(merchant.get('category'))
+            if merchant.get('_id') and category:
+                categories[merchant['_id']] = category
+        with self._lock:
+            changed = categories != dict(self._entries)
+            self._stats["refreshes"] += 1
+        self._replace(categories)
+        self.updated_at = time.time()
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Merchant index save error: {e}")
+        return changed
+
+    def category(self, merchant_id, default='Other'):
+        """O(1) category lookup; unknown merchants fall back to default"""
+        with self._lock:
+            category = self._entries.get(merchant_id)
+            if category is None:
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(merchant_id)
+            self._stats["hits"] += 1
+            return category
+
+    def start_background_refresh(self, interval=MERCHANT_INDEX_REFRESH_INTERVAL, on_change=None):
+        """Refresh now and then every `interval` seconds on a daemon thread"""
+        if self._refresher is not None:
+            return
+
+        def run():
+            while not self._stop.is_set():
+                if self.refresh() and on_change is not None:
+                    on_change()
+                self._stop.wait(interval)
+
+        self._refresher = threading.Thread(target=run, name='merchant-index-refresh', daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["updated_at"] = self.updated_at
+        return stats
@@ -0,0 +1,162 @@
+"""
+Settle detection for Computer Use actions.
+
+After an action the agent needs the page to stop changing before it takes the
+next screenshot. Instead of a fixed sleep, wait_for_settle() returns as soon
+as the page is quiet, bounded by a timeout:
+
+- dom:     load state, then no DOM mutations for `quiet_ms` (default)
+- network: Playwright's networkidle load state
+- visual:  two consecutive identical screenshots `quiet_ms` apart
+- sleep:   the old behaviour (load state + fixed 1s sleep), for comparison
+
+Every wait is recorded in a per-action histogram together with an estimate
+of what the fixed-sleep version would have taken, so the time saved is
+visible in /health.
+"""
+import hashlib
+import os
+import threading
+import time
+
+PAGE_SETTLE_MODE = os.getenv('PAGE_SETTLE_MODE', 'dom')
+PAGE_SETTLE_TIMEOUT = float(os.getenv('PAGE_SETTLE_TIMEOUT', 5.0))
+PAGE_SETTLE_QUIET_MS = int(os.getenv('PAGE_SETTLE_QUIET_MS', 300))
+
+LEGACY_SLEEP = 1.0  # the fixed sleep that used to follow every action
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+# Resolves true once no mutations have been seen for quietMs, false when timeoutMs runs out
+_DOM_QUIET_JS = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    const observer = new MutationObserver(() => { last = performance.now(); });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    const check = () => {
+        const now = performance.now();
+        if (now - last >= quietMs || now - start >= timeoutMs) {
+            observer.disconnect();
+            resolve(now - last >= quietMs);
+        } else {
+            setTimeout(check, 25);
+        }
+    };
+    setTimeout(check, 25);
+})
+"""
+
+
+class SettleStats:
+    """Per-action settle-time histograms plus totals against the fixed-sleep baseline"""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._actions = {}
+
+    def record(self, action, seconds, legacy_seconds, settled):
+        with self._lock:
+            entry = self._actions.get(action)
+            if entry is None:
+                entry = self._actions[action] = {
+                    "count": 0, "seconds": 0.0, "legacy_seconds": 0.0, "timeouts": 0,
+                    "histogram": [0] * (len(self.buckets) + 1),
+                }
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["legacy_seconds"] += legacy_seconds
+            entry["timeouts"] += 0 if settled else 1
+            index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+            entry["histogram"][index] += 1
+
+    def snapshot(self):
+        with self._lock:
+            actions = {name: {**entry, "histogram": list(entry["histogram"])}
+                       for name, entry in self._actions.items()}
+        labels = [f"le_{bound:g}" for bound in self.buckets] + ["inf"]
+        total = legacy = 0.0
+        for entry in actions.values():
+            total += entry["seconds"]
+            legacy += entry["legacy_seconds"]
+            entry["histogram"] = dict(zip(labels, entry["histogram"]))
+            entry["mean"] = round(entry["seconds"] / entry["count"], 3)
+            entry["seconds"] = round(entry["seconds"], 3)
+            entry["legacy_seconds"] = round(entry["legacy_seconds"], 3)
+        return {
+            "mode": PAGE_SETTLE_MODE,
+            "actions": actions,
+            "settle_seconds": round(total, 3),
+            "legacy_seconds": round(legacy, 3),
+            "saved_seconds": round(legacy - total, 3),
+        }
+
+
+settle_stats = SettleStats()
+
+
+def _wait_load_state(page, state, deadline):
+    """Wait for a load state until the deadline. Returns False on timeout"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return False
+    try:
+        page.wait_for_load_state(state, timeout=remaining * 1000)
+        return True
+    except Exception:
+        return False
+
+
+def _wait_dom_quiet(page, quiet_ms, deadline):
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            return bool(page.evaluate(_DOM_QUIET_JS, [quiet_ms, remaining * 1000]))
+        except Exception:
+            # A navigation destroyed the execution context; wait for the new document and observe again
+            if not _wait_load_state(page, "domcontentloaded", deadline):
+                return False
+
+
+def _wait_visual_quiet(page, quiet_ms, deadline):
+    previous = None
+    while time.monotonic() < deadline:
+        try:
+            frame = hashlib.sha256(page.screenshot(type="jpeg", quality=30)).digest()
+        except Exception:
+            frame = None
+        if frame is not None and frame == previous:
+            return True
+        previous = frame
+        time.sleep(min(quiet_ms / 1000, max(0.0, deadline - time.monotonic())))
+    return False
+
+
+def wait_for_settle(page, action, timeout=PAGE_SETTLE_TIMEOUT, mode=PAGE_SETTLE_MODE,
+                    quiet_ms=PAGE_SETTLE_QUIET_MS, legacy_extra=0.0):
+    """
+    Block until the page is quiet after `action` or `timeout` seconds pass.
+
+    legacy_extra is any extra fixed wait the old loop added for this action
+    (e.g. 5s for wait_5_seconds); it only affects the recorded baseline.
+    Returns (seconds waited, whether the page settled before the timeout).
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    settled = _wait_load_state(page, "load", deadline)
+    load_seconds = time.monotonic() - started
+
+    if mode == 'sleep':
+        time.sleep(LEGACY_SLEEP + legacy_extra)
+    elif mode == 'network':
+        settled = _wait_load_state(page, "networkidle", deadline)
+    elif mode == 'visual':
+        settled = _wait_visual_quiet(page, quiet_ms, deadline)
+    else:
+        settled = _wait_dom_quiet(page, quiet_ms, deadline)
+
+    seconds = time.monotonic() - started
+    settle_stats.record(action, seconds, load_seconds + LEGACY_SLEEP + legacy_extra, settled)
+    return seconds, settled
@@ -0,0 +1,187 @@
+"""
+Advisor prompt assembly with a reusable context prefix and a token budget.
+
+Every chat turn used to send one string: system prompt + financial context +
+the last 5 messages + the user's message. PromptAssembler splits that into
+
+- a prefix (system prompt + financial context) that only changes when the
+  user's numbers change. It is sent as the model's system instruction, and
+  the GenerativeModel for it is memoised by content hash. When the prefix is
+  big enough for Gemini's explicit context caching (GEMINI_CACHE_MIN_TOKENS),
+  it is uploaded once as CachedContent and later turns reference it instead
+  of resending it.
+- the per-turn part: the summary of older turns (if the session has one),
+  as much recent history as fits in PROMPT_HISTORY_TOKEN_BUDGET, newest
+  first, then the user's message.
+
+Token counts for budgeting are a local estimate (~4 bytes per token) so no
+extra API call is made; the real counts reported by Gemini are logged by
+log_usage().
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sdk import load_gemini
+
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv('PROMPT_HISTORY_TOKEN_BUDGET', 600))
+PROMPT_HISTORY_MAX_MESSAGES = int(os.getenv('PROMPT_HISTORY_MAX_MESSAGES', 20))
+PROMPT_PREFIX_CACHE_MAX = int(os.getenv('PROMPT_PREFIX_CACHE_MAX', 256))
+GEMINI_EXPLICIT_CACHE = os.getenv('GEMINI_EXPLICIT_CACHE', '1') == '1'
+GEMINI_CACHE_MODEL = os.getenv('GEMINI_CACHE_MODEL', 'models/gemini-2.0-flash-001')
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv('GEMINI_CACHE_MIN_TOKENS', 1024))
+GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', 30 * 60))
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 UTF-8 bytes per token), good enough for budgeting"""
+    return (len(text.encode('utf-8')) + 3) // 4
+
+
+def format_message(message):
+    return f"{message.role}: {message.content}"
+
+
+def trim_history(history, budget, max_messages=PROMPT_HISTORY_MAX_MESSAGES):
+    """Most recent messages (in original order) whose formatted lines fit in `budget` tokens"""
+    kept, used = [], 0
+    for message in reversed((history or [])[-max_messages:]):
+        cost = estimate_tokens(format_message(message)) + 1
+        if used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept, used
+
+
+class _Prefix:
+    """A prepared prompt prefix: the model to call and how it is cached"""
+
+    def __init__(self, model, tokens, cached_content=None, expires_at=None):
+        self.model = model
+        self.tokens = tokens
+        self.cached_content = cached_content
+        self.expires_at = expires_at
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class AssembledPrompt:
+    """What to send for one turn, plus the estimates logged next to Gemini's counts"""
+
+    def __init__(self, model, contents, prefix_key, history_text, prefix_tokens, history_tokens, history_messages,
+                 prefix_reused, explicit):
+        self.model = model
+        self.contents = contents
+        self.prefix_key = prefix_key  # sha256 of the prefix text
+        self.history_text = history_text
+        self.prefix_tokens = prefix_tokens
+        self.history_tokens = history_tokens
+        self.history_messages = history_messages
+        self.prefix_reused = prefix_reused
+        self.explicit = explicit
+
+
+def _gemini_model(model_name, **kwargs):
+    return load_gemini().GenerativeModel(model_name, **kwargs)
+
+
+class PromptAssembler:
+    """Builds per-turn prompts on top of memoised (and where possible explicitly cached) prefixes"""
+
+    def __init__(self, model_name, history_token_budget=PROMPT_HISTORY_TOKEN_BUDGET,
+                 explicit_cache=GEMINI_EXPLICIT_CACHE, cache_model=GEMINI_CACHE_MODEL,
+                 min_cache_tokens=GEMINI_CACHE_MIN_TOKENS, cache_ttl=GEMINI_CACHE_TTL,
+                 max_prefixes=PROMPT_PREFIX_CACHE_MAX, model_factory=None):
+        self.model_name = model_name
+        self.model_factory = model_factory or _gemini_model  # (model_name, system_instruction=...)
+        self.history_token_budget = history_token_budget
+        self.explicit_cache = explicit_cache
+        self.cache_model = cache_model
+        self.min_cache_tokens = min_cache_tokens
+        self.cache_ttl = cache_ttl
+        self.max_prefixes = max_prefixes
+        self._lock = threading.Lock()
+        self._prefixes = OrderedDict()  # sha256(prefix) -> _Prefix
+        self._stats = {"requests": 0, "prefix_hits": 0, "prefix_builds": 0, "explicit_caches": 0,
+                       "explicit_cache_errors": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+    def _build_prefix(self, prefix_text):
+        tokens = estimate_tokens(prefix_text)
+        if self.explicit_cache and tokens >= self.min_cache_tokens:
+            try:
+                genai = load_gemini()
+                cached = genai.caching.CachedContent.create(
+                    model=self.cache_model, system_instruction=prefix_text, ttl=self.cache_ttl)
+                with self._lock:
+                    self._stats["explicit_caches"] += 1
+                # Stop using the handle a minute before Gemini drops it
+                return _Prefix(genai.GenerativeModel.from_cached_content(cached), tokens,
+                               cached_content=cached.name,
+                               expires_at=time.monotonic() + max(self.cache_ttl - 60, 0))
+            except Exception as e:
+                with self._lock:
+                    self._stats["explicit_cache_errors"] += 1
+                print(f"Gemini context cache unavailable, sending prefix inline: {e}")
+        return _Prefix(self.model_factory(self.model_name, system_instruction=prefix_text), tokens)
+
+    def prefix(self, prefix_text):
+        """(_Prefix, key, reused) for a prefix text; builds and memoises it on first use"""
+        key = hashlib.sha256(prefix_text.encode('utf-8')).hexdigest()
+        with self._lock:
+            entry = self._prefixes.get(key)
+            if entry is not None and not entry.expired:
+                self._prefixes.move_to_end(key)
+                self._stats["prefix_hits"] += 1
+                return entry, key, True
+        # Built outside the lock: creating an explicit cache is a network call
+        entry = self._build_prefix(prefix_text)
+        with self._lock:
+            self._prefixes[key] = entry
+            self._prefixes.move_to_end(key)
+            self._stats["prefix_builds"] += 1
+            while len(self._prefixes) > self.max_prefixes:
+                self._prefixes.popitem(last=False)  # explicit caches expire server-side after their TTL
+        return entry, key, False
+
+    def assemble(self, system_prompt, context, user_message, conversation_history=None, summary=""):
+        """conversation_history is a list of Turns; summary covers the turns before them"""
+        prefix, prefix_key, reused = self.prefix(f"{system_prompt}\n\n{context}")
+        history, history_tokens = trim_history(conversation_history, self.history_token_budget)
+        history_text = "\n".join(format_message(m) for m in history)
+        if summary:
+            history_text = f"Earlier in this conversation: {summary}\n{history_text}".rstrip("\n")
+            history_tokens += estimate_tokens(summary) + 6
+        if history_text:
+            contents = f"Recent Conversation:\n{history_text}\n\nUser: {user_message}\n\nAdvisor:"
+        else:
+            contents = f"User: {user_message}\n\nAdvisor:"
+        with self._lock:
+            self._stats["requests"] += 1
+        return AssembledPrompt(prefix.model, contents, prefix_key, history_text, prefix.tokens, history_tokens,
+                               len(history), reused, prefix.cached_content is not None)
+
+    def log_usage(self, prompt, response):
+        """Print estimated vs reported prompt tokens for one request"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+        with self._lock:
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["cached_tokens"] += cached_tokens
+        print(f"Prompt tokens: {prompt_tokens} reported ({cached_tokens} cached), estimated prefix "
+              f"{prompt.prefix_tokens} ({'reused' if prompt.prefix_reused else 'new'}"
+              f"{', explicit cache' if prompt.explicit else ''}) + history {prompt.history_tokens} "
+              f"({prompt.history_messages} messages) + message {estimate_tokens(prompt.contents) - prompt.history_tokens}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["prefixes"] = len(self._prefixes)
+        stats["history_token_budget"] = self.history_token_budget
+        return stats
@@ -0,0 +1,175 @@
+"""
+Local SQLite store for Nessie purchases with incremental aggregates.
+
+Purchases are keyed by their Nessie `_id`. Each account keeps a high-water
+mark (the latest `purchase_date` ingested); on refresh, purchases dated before
+the mark are skipped without touching the database and the rest are inserted
+with INSERT OR IGNORE, so only purchases we haven't seen update the
+per-account/per-category totals. Nessie dates are day-granular, so purchases
+on the high-water day itself, and undated purchases, are re-checked by `_id`
+rather than skipped.
+
+`category` is the category in use (from categorize() at ingest time);
+`source_category` keeps the one Nessie sent with the purchase, if any, so
+recategorize() can run the same categorisation again.
+"""
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+PURCHASE_STORE_PATH = os.getenv('PURCHASE_STORE_PATH', os.path.join(DATA_DIR, 'purchases.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    _id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    purchase_date TEXT,
+    amount REAL NOT NULL,
+    merchant_id TEXT,
+    category TEXT NOT NULL,
+    status TEXT,
+    description TEXT,
+    source_category TEXT
+);
+CREATE INDEX IF NOT EXISTS purchases_account_date ON purchases (account_id, purchase_date);
+CREATE TABLE IF NOT EXISTS watermarks (
+    account_id TEXT PRIMARY KEY,
+    high_water TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS category_totals (
+    account_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    purchases INTEGER NOT NULL,
+    PRIMARY KEY (account_id, category)
+);
+"""
+
+
+def default_category(purchase):
+    return purchase.get('category') or 'Other'
+
+
+class PurchaseStore:
+    """Purchases keyed by _id, with per-account high-water marks and running category totals"""
+
+    def __init__(self, path=PURCHASE_STORE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        # ':memory:' databases are per-connection, so share one connection in that case
+        self._shared = sqlite3.connect(path, check_same_thread=False) if path == ':memory:' else None
+        with self._write_lock:
+            conn = self._conn()
+            if path != ':memory:':
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(purchases)")}
+            if 'source_category' not in columns:  # stores created before the column was added
+                conn.execute("ALTER TABLE purchases ADD COLUMN source_category TEXT")
+            conn.commit()
+
+    def _conn(self):
+        if self._shared is not None:
+            return self._shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def high_water(self, account_id):
+        row = self._conn().execute(
+            "SELECT high_water FROM watermarks WHERE account_id = ?", (account_id,)).fetchone()
+        return row[0] if row else None
+
+    def ingest(self, account_id, purchases, categorize=default_category):
+        """Store purchases we haven't seen for an account and fold them into the totals. Returns the number added"""
+        mark = self.high_water(account_id)
+        # Undated purchases can't be compared with the mark; INSERT OR IGNORE dedups them by _id
+        candidates = [p for p in purchases
+                      if p.get('_id') and (mark is None or not p.get('purchase_date') or p['purchase_date'] >= mark)]
+        if not candidates:
+            return 0
+
+        added = 0
+        new_mark = mark
+        deltas = {}
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                for p in candidates:
+                    category = categorize(p)
+                    amount = p.get('amount', 0) or 0
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO purchases "
+                        "(_id, account_id, purchase_date, amount, merchant_id, category, status, description, "
+                        "source_category) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (p['_id'], account_id, p.get('purchase_date'), amount, p.get('merchant_id'),
+                         category, p.get('status'), p.get('description'), p.get('category')))
+                    if cursor.rowcount:
+                        added += 1
+                        total, count = deltas.get(category, (0, 0))
+                        deltas[category] = (total + amount, count + 1)
+                    date = p.get('purchase_date')
+                    if date and (new_mark is None or date > new_mark):
+                        new_mark = date
+                for category, (amount, count) in deltas.items():
+                    conn.execute(
+                        "INSERT INTO category_totals (account_id, category, amount, purchases) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (account_id, category) DO UPDATE SET "
+                        "amount = amount + excluded.amount, purchases = purchases + excluded.purchases",
+                        (account_id, category, amount, count))
+                if new_mark is not None and new_mark != mark:
+                    conn.execute(
+                        "INSERT INTO watermarks (account_id, high_water) VALUES (?, ?) "
+                        "ON CONFLICT (account_id) DO UPDATE SET high_water = excluded.high_water",
+                        (account_id, new_mark))
+        return added
+
+    def category_totals(self, account_ids=None):
+        """{category: amount} summed over the given accounts (all accounts when None)"""
+        query = "SELECT category, SUM(amount) FROM category_totals"
+        params = ()
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            if not account_ids:
+                return {}
+            query += f" WHERE account_id IN ({', '.join('?' * len(account_ids))})"
+            params = tuple(account_ids)
+        query += " GROUP BY category"
+        return {category: amount for category, amount in self._conn().execute(query, params)}
+
+    def purchases(self, account_ids=None):
+        """Iterate (account_id, purchase_date, amount, category) rows"""
+        query = "SELECT account_id, purchase_date, amount, category FROM purchases"
+        params = ()
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            if not account_ids:
+                return iter(())
+            query += f" WHERE account_id IN ({', '.join('?' * len(account_ids))})"
+            params = tuple(account_ids)
+        return self._conn().execute(query, params)
+
+    def recategorize(self, categorize):
+        """Re-run categorisation over stored purchases and rebuild the totals (e.g. after new merchant data)"""
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                updates = []
+                rows = conn.execute("SELECT _id, merchant_id, source_category, category FROM purchases")
+                for _id, merchant_id, source_category, category in rows:
+                    new_category = categorize({'_id': _id, 'merchant_id': merchant_id, 'category': source_category})
+                    if new_category != category:
+                        updates.append((new_category, _id))
+                if not updates:
+                    return 0
+                conn.executemany("UPDATE purchases SET category = ? WHERE _id = ?", updates)
+                conn.execute("DELETE FROM category_totals")
+                conn.execute(
+                    "INSERT INTO category_totals (account_id, category, amount, purchases) "
+                    "SELECT account_id, category, SUM(amount), COUNT(*) FROM purchases GROUP BY account_id, category")
+        return len(updates)
@@ -0,0 +1,210 @@
+"""
+Cache of advisor answers.
+
+Keys are (scope, normalised message). The scope is a hash of everything else
+that shapes the answer: the prompt prefix (system prompt + financial
+snapshot) and the history sent with the message. When the user's numbers
+change, the prefix changes and old answers simply stop matching.
+
+Two tiers:
+
+- exact: the normalised message (case, whitespace and trailing punctuation
+  folded) must match
+- semantic (optional, RESPONSE_CACHE_SEMANTIC=1): for chat questions, a
+  paraphrase within the same scope matches if it mentions exactly the same
+  numbers and the cosine similarity of the message embeddings is at least
+  RESPONSE_CACHE_SIMILARITY. Embeddings come from sentence-transformers when
+  RESPONSE_CACHE_EMBEDDER names a model and the package is installed,
+  otherwise from a hashed character-trigram vector built with NumPy
+
+The number check keeps "...if I make 5000 a month" from answering "...if I
+make 8000 a month". The trigram vectors can't tell "good idea" from "bad
+idea" (0.87-0.91) any better than they recognise real paraphrases
+(0.84-0.92), so with them the default threshold is 0.98: in practice only
+reordered words match. Sentence-transformers models default to 0.9.
+
+Entries expire after RESPONSE_CACHE_TTL seconds, and the cache holds at most
+RESPONSE_CACHE_MAX entries (LRU).
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 30 * 60))
+RESPONSE_CACHE_MAX = int(os.getenv('RESPONSE_CACHE_MAX', 2048))
+RESPONSE_CACHE_SEMANTIC = os.getenv('RESPONSE_CACHE_SEMANTIC', '0') == '1'
+RESPONSE_CACHE_SIMILARITY = os.getenv('RESPONSE_CACHE_SIMILARITY') or None  # unset: the embedder's default_similarity
+RESPONSE_CACHE_EMBEDDER = os.getenv('RESPONSE_CACHE_EMBEDDER', 'hashing')  # or a sentence-transformers model name
+
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[a-z0-9$%']+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def normalize_prompt(text):
+    """Fold case, whitespace and trailing punctuation so trivially different prompts share a key"""
+    return _SPACE_RE.sub(" ", text.lower()).strip().rstrip("?!. ")
+
+
+def prompt_numbers(text):
+    """The numbers and amounts a prompt mentions, in order ("$5,000" and "5000" are the same number)"""
+    return tuple(number.replace(",", "") for number in _NUMBER_RE.findall(text))
+
+
+def cache_scope(*parts):
+    """Hash of the context an answer depends on (prompt prefix, history, ...)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class HashingEmbedder:
+    """Dependency-free embedding: hashed word and character-trigram counts, L2-normalised"""
+
+    default_similarity = 0.98
+
+    def __init__(self, dims=1024):
+        self.dims = dims
+
+    def __call__(self, text):
+        vector = np.zeros(self.dims, dtype=np.float32)
+        words = _WORD_RE.findall(text)
+        for word in words:
+            vector[zlib.crc32(word.encode()) % self.dims] += 1.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vector[zlib.crc32(padded[i:i + 3].encode()) % self.dims] += 0.5
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (optional dependency)"""
+
+    default_similarity = 0.9
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def __call__(self, text):
+        return np.asarray(self.model.encode(text, normalize_embeddings=True), dtype=np.float32)
+
+
+def create_embedder(name=RESPONSE_CACHE_EMBEDDER):
+    if name != 'hashing':
+        try:
+            return SentenceTransformerEmbedder(name)
+        except Exception as e:
+            print(f"WARNING: Embedding model '{name}' unavailable ({e}), using hashed trigrams")
+    return HashingEmbedder()
+
+
+class ResponseCache:
+    """Exact + optional semantic cache of advisor answers with TTL, LRU bound and hit counters"""
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX, semantic=RESPONSE_CACHE_SEMANTIC,
+                 similarity=RESPONSE_CACHE_SIMILARITY, embedder=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = None if similarity is None else float(similarity)
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (scope, normalised message) -> (response, expires_at)
+        self._vectors = {}  # scope -> {normalised message: embedding}
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0}
+
+    def _embed(self, text):
+        if self._embedder is None:
+            self._embedder = create_embedder()
+        return self._embedder(text)
+
+    def _threshold(self):
+        if self.similarity is not None:
+            return self.similarity
+        return getattr(self._embedder, 'default_similarity', HashingEmbedder.default_similarity)
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        vectors = self._vectors.get(key[0])
+        if vectors is not None:
+            vectors.pop(key[1], None)
+            if not vectors:
+                del self._vectors[key[0]]
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self._drop(key)
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def get(self, scope, message, semantic=False):
+        """Cached answer for message within scope, or None. semantic=True also accepts close paraphrases"""
+        normalized = normalize_prompt(message)
+        now = time.monotonic()
+        with self._lock:
+            response = self._live((scope, normalized), now)
+            if response is not None:
+                self._stats["hits"] += 1
+                return response
+            candidates = dict(self._vectors.get(scope, {})) if semantic and self.semantic else {}
+
+        # Only prompts with the same numbers can share an answer, however similar the wording
+        numbers = prompt_numbers(normalized)
+        texts = [text for text in candidates if prompt_numbers(text) == numbers]
+        if texts:
+            scores = np.stack([candidates[t] for t in texts]) @ self._embed(normalized)
+            best = int(np.argmax(scores))
+            if scores[best] >= self._threshold():
+                with self._lock:
+                    response = self._live((scope, texts[best]), now)
+                    if response is not None:
+                        self._stats["semantic_hits"] += 1
+                        return response
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, scope, message, response, semantic=False):
+        normalized = normalize_prompt(message)
+        vector = self._embed(normalized) if semantic and self.semantic else None
+        with self._lock:
+            key = (scope, normalized)
+            self._entries[key] = (response, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                self._vectors.setdefault(scope, {})[normalized] = vector
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["semantic_hits"]) / lookups, 3) if lookups else 0.0
+        stats["semantic"] = self.semantic
+        stats["similarity"] = self._threshold() if self.semantic else None
+        return stats
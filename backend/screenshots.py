@@ -0,0 +1,53 @@
+"""
+Screenshot encoding for the Computer Use agent loop.
+
+Frames are captured as PNG and can be re-encoded as JPEG/WebP at a given
+quality and/or downscaled before they are sent to the model. Re-encoding
+needs Pillow; without it frames stay PNG at full size.
+"""
+import os
+from io import BytesIO
+
+try:
+    from PIL import Image
+    _pillow_available = True
+except Exception:
+    Image = None  # type: ignore
+    _pillow_available = False
+
+SCREENSHOT_FORMAT = os.getenv('SCREENSHOT_FORMAT', 'png').lower()  # png, jpeg or webp
+SCREENSHOT_QUALITY = int(os.getenv('SCREENSHOT_QUALITY', 80))
+SCREENSHOT_SCALE = float(os.getenv('SCREENSHOT_SCALE', 1.0))
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+_warned = False
+
+
+def encode_screenshot(png_bytes, fmt=SCREENSHOT_FORMAT, quality=SCREENSHOT_QUALITY, scale=SCREENSHOT_SCALE):
+    """Return (bytes, mime_type) for a PNG frame re-encoded per fmt/quality/scale"""
+    global _warned
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    if fmt not in MIME_TYPES:
+        fmt = 'png'
+    if fmt == 'png' and scale >= 1.0:
+        return png_bytes, MIME_TYPES['png']
+    if not _pillow_available:
+        if not _warned:
+            print("WARNING: Pillow not installed, sending screenshots as full-size PNG")
+            _warned = True
+        return png_bytes, MIME_TYPES['png']
+
+    image = Image.open(BytesIO(png_bytes))
+    if scale < 1.0:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    out = BytesIO()
+    if fmt == 'png':
+        image.save(out, format='PNG', optimize=True)
+    else:
+        image.save(out, format=fmt.upper(), quality=quality)
+    return out.getvalue(), MIME_TYPES[fmt]
@@ -0,0 +1,123 @@
+"""
+Heavy SDKs, imported on first use.
+
+google.generativeai, google.genai and Playwright take about two seconds to
+import together, which is most of a worker's start-up time. A worker that
+never runs a car search doesn't need the last two at all. Each is loaded
+the first time something needs it:
+
+    genai = load_gemini()          # google.generativeai, configured with GEMINI_API_KEY
+    cu = load_computer_use()       # google.genai client + types and sync_playwright, or None
+
+prewarm_sdks() does the imports on a daemon thread (SDK_PREWARM=1), starting
+SDK_PREWARM_DELAY seconds after the app is imported so they don't compete
+with the rest of start-up. The first request usually finds them loaded, and
+the first /health response doesn't wait for them. Load times are reported by
+sdk_stats().
+"""
+import os
+import threading
+import time
+
+SDK_PREWARM = os.getenv('SDK_PREWARM', '1') == '1'
+SDK_PREWARM_DELAY = float(os.getenv('SDK_PREWARM_DELAY', 1.0))
+
+COMPUTER_USE_INSTALL_HINT = "Run: pip install --upgrade google-genai playwright && python -m playwright install chromium"
+
+_gemini = None
+_gemini_lock = threading.Lock()
+
+_computer_use = None
+_computer_use_loaded = False
+_computer_use_lock = threading.Lock()
+
+_load_times = {}  # sdk -> seconds its import took
+_prewarm_state = "off"
+
+
+def load_gemini():
+    """google.generativeai, imported and configured on the first call"""
+    global _gemini
+    if _gemini is None:
+        with _gemini_lock:
+            if _gemini is None:
+                started = time.perf_counter()
+                import google.generativeai as genai
+                api_key = os.getenv('GEMINI_API_KEY')
+                if api_key:
+                    genai.configure(api_key=api_key)
+                _load_times["gemini"] = time.perf_counter() - started
+                _gemini = genai
+    return _gemini
+
+
+class ComputerUseSDK:
+    """What the Computer Use agent needs: the google.genai client module, its types, and sync_playwright"""
+
+    def __init__(self, genai, types, sync_playwright):
+        self.genai = genai
+        self.types = types
+        self.Content = types.Content
+        self.Part = types.Part
+        self.sync_playwright = sync_playwright
+
+
+def load_computer_use():
+    """The Computer Use SDKs, or None when they are missing (the reason is logged once)"""
+    global _computer_use, _computer_use_loaded
+    if not _computer_use_loaded:
+        with _computer_use_lock:
+            if not _computer_use_loaded:
+                started = time.perf_counter()
+                try:
+                    # Guarded: a 'google' namespace polluted by other packages can break these imports
+                    from google import genai
+                    from google.genai import types
+                    from playwright.sync_api import sync_playwright
+                    if not (hasattr(types, "ComputerUse") and hasattr(types, "Environment")):
+                        raise ImportError("google-genai has no Computer Use types")
+                    _computer_use = ComputerUseSDK(genai, types, sync_playwright)
+                    print("✓ Computer Use dependencies loaded successfully")
+                except Exception as e:
+                    print(f"WARNING: Computer Use not available: Computer Use prerequisites missing "
+                          f"(google-genai types or Playwright): {e}. {COMPUTER_USE_INSTALL_HINT}")
+                _load_times["computer_use"] = time.perf_counter() - started
+                _computer_use_loaded = True
+    return _computer_use
+
+
+def computer_use_available():
+    return load_computer_use() is not None
+
+
+def prewarm_sdks(after=None, delay=SDK_PREWARM_DELAY):
+    """Load every SDK on a background thread after delay seconds, then call after() (e.g. to warm the browser pool)"""
+    global _prewarm_state
+    _prewarm_state = "scheduled"
+
+    def run():
+        global _prewarm_state
+        time.sleep(delay)
+        _prewarm_state = "running"
+        try:
+            load_gemini()
+            load_computer_use()
+            if after is not None:
+                after()
+            _prewarm_state = "done"
+        except Exception as e:
+            _prewarm_state = "failed"
+            print(f"SDK pre-warm failed: {e}")
+
+    thread = threading.Thread(target=run, name='sdk-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def sdk_stats():
+    return {
+        "prewarm": _prewarm_state,
+        "gemini_loaded": _gemini is not None,
+        "computer_use": None if not _computer_use_loaded else _computer_use is not None,
+        "load_ms": {name: round(seconds * 1000, 1) for name, seconds in _load_times.items()},
+    }
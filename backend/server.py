@@ -1,14 +1,34 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
-import requests
 from datetime import datetime, timedelta
 import json
-from io import BytesIO
+import re
+import secrets
 import time
 import threading
+from fanout import fan_out
+from http_client import get_http_client
+from swr_cache import SWRCache
+from purchase_store import PurchaseStore
+from merchant_index import MerchantIndex
+from analytics import PurchaseColumns
+from tts_stream import start_speech
+from speech_prefetch import SpeechPrefetcher
+from audio_cache import AudioCache, audio_cache_key
+from session_store import create_session_store
+from conversation import Turn, ConversationHistory, HistorySummarizer, format_turn, HISTORY_MAX_TURNS
+from browser_pool import BrowserPool
+from jobs import JobManager, QueueFull, SUCCEEDED
+from screenshots import encode_screenshot
+from page_settle import wait_for_settle, settle_stats
+from car_parser import CarOutputParser, split_by_budget
+from prompt_cache import PromptAssembler
+from response_cache import ResponseCache, cache_scope
+from gemini_dispatch import Dispatcher, DispatcherBusy
+from sdk import load_computer_use, computer_use_available, prewarm_sdks, sdk_stats, SDK_PREWARM
+from tracing import span, observe, start_request, current_timings, finish_request, register_gauge, render_metrics
 
 # Load environment variables
 load_dotenv()
@@ -16,85 +36,95 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+def apply_cors_headers(response, origin):
+    """Set the CORS headers for a request from origin (shared with the ASGI app)"""
+    allowed_origins = {
+        'http://localhost:5173',
+        'http://127.0.0.1:5173',
+        'http://localhost:8080',
+        'http://127.0.0.1:8080',
+    }
+    if origin in allowed_origins:
+        response.headers['Access-Control-Allow-Origin'] = origin
+    else:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Vary'] = 'Origin'
+    response.headers['Access-Control-Allow-Credentials'] = 'false'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
 # Explicit CORS headers for local dev (8080/5173)
 @app.after_request
 def add_cors_headers(response):
     try:
-        origin = request.headers.get('Origin', '')
-        allowed_origins = {
-            'http://localhost:5173',
-            'http://127.0.0.1:5173',
-            'http://localhost:8080',
-            'http://127.0.0.1:8080',
-        }
-        if origin in allowed_origins:
-            response.headers['Access-Control-Allow-Origin'] = origin
-        else:
-            response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Vary'] = 'Origin'
-        response.headers['Access-Control-Allow-Credentials'] = 'false'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        apply_cors_headers(response, request.headers.get('Origin', ''))
     finally:
         return response
 
+@app.before_request
+def start_request_timing():
+    start_request()
+
+@app.after_request
+def add_server_timing(response):
+    """Record request metrics and report per-stage timings in a Server-Timing header"""
+    timings = current_timings()
+    if timings is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        header = finish_request(timings, route, request.method, response.status_code)
+        if header:
+            response.headers['Server-Timing'] = header
+    return response
+
 # Configure APIs
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
 NESSIE_API_KEY = os.getenv('NESSIE_API_KEY')
 PORT = int(os.getenv('PORT', 3001))
 
-# Initialize Gemini
+NESSIE_BASE_URL = os.getenv('NESSIE_BASE_URL', 'http://api.nessieisreal.com')
+NESSIE_TIMEOUT = float(os.getenv('NESSIE_TIMEOUT', 5))
+NESSIE_FETCH_CONCURRENCY = int(os.getenv('NESSIE_FETCH_CONCURRENCY', 8))
+NESSIE_FETCH_DEADLINE = float(os.getenv('NESSIE_FETCH_DEADLINE', 10))
+ELEVENLABS_BASE_URL = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io')
+ELEVENLABS_TIMEOUT = float(os.getenv('ELEVENLABS_TIMEOUT', 30))
+TTS_STREAM_CHUNK_BYTES = int(os.getenv('TTS_STREAM_CHUNK_BYTES', 4096))
+AUDIO_CACHE_MAX_AGE = int(os.getenv('AUDIO_CACHE_MAX_AGE', 24 * 60 * 60))
+CAR_SEARCH_CACHE_TTL = float(os.getenv('CAR_SEARCH_CACHE_TTL', 6 * 60 * 60))
+CAR_SEARCH_BUDGET_BUCKET = int(os.getenv('CAR_SEARCH_BUDGET_BUCKET', 1000))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+COMPUTER_USE_COMPACT = os.getenv('COMPUTER_USE_COMPACT', '1') == '1'
+COMPUTER_USE_KEEP_SCREENSHOTS = int(os.getenv('COMPUTER_USE_KEEP_SCREENSHOTS', 3))
+GEMINI_COALESCE = os.getenv('GEMINI_COALESCE', '1') == '1'
+SUMMARY_CACHE_TTL = float(os.getenv('SUMMARY_CACHE_TTL', 60))
+SUMMARY_CACHE_STALE_TTL = float(os.getenv('SUMMARY_CACHE_STALE_TTL', 300))
+
+# Initialize Gemini (the SDK itself is imported on the first prompt, see sdk.py)
 if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
     # Use gemini-2.0-flash (fast and reliable)
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    prompt_assembler = PromptAssembler('gemini-2.0-flash')
 else:
-    model = None
+    prompt_assembler = None
     print("WARNING: No Gemini API key found!")
 
-# In-memory session storage (use Redis in production)
-sessions = {}
+# Admission control for every Gemini call (rate limit, concurrency, priority lanes)
+gemini_dispatcher = Dispatcher()
+
+# Advisor answers, keyed by prompt + financial snapshot
+response_cache = ResponseCache()
+
+# Session storage: in-memory by default, SESSION_BACKEND=sqlite to share sessions between workers
+sessions = create_session_store()
+
+# Long histories are folded into a running summary in the background (see conversation.py)
+history_summarizer = HistorySummarizer(sessions, lambda summary, turns: summarize_history(summary, turns))
 
 # Constants for screen dimensions
 SCREEN_WIDTH = 1440
 SCREEN_HEIGHT = 900
 
-# Strict import for Computer Use (required)
-# Guard google-genai imports to avoid ImportError if namespace is polluted by 'google' pkg
-try:
-    from google import genai as genai_client
-    from google.genai import types
-    from google.genai.types import Content, Part
-    _genai2_available = True
-except Exception as _e:
-    genai_client = None  # type: ignore
-    types = None  # type: ignore
-    Content = None  # type: ignore
-    Part = None  # type: ignore
-    _genai2_available = False
-
-try:
-    from playwright.sync_api import sync_playwright
-    _playwright_available = True
-except Exception as _e:
-    sync_playwright = None  # type: ignore
-    _playwright_available = False
-
-# Validate Computer Use presence at startup
-computer_use_available: bool = False
-try:
-    if _genai2_available and types is not None and hasattr(types, "ComputerUse") and hasattr(types, "Environment") and _playwright_available:
-        computer_use_available = True
-        print("✓ Computer Use dependencies loaded successfully")
-    else:
-        raise ImportError(
-            "Computer Use prerequisites missing (google-genai types or Playwright). "
-            "Run: pip install --upgrade google-genai playwright && python -m playwright install chromium"
-        )
-except Exception as e:
-    computer_use_available = False
-    print(f"WARNING: Computer Use not available: {e}")
+# Computer Use needs google-genai and Playwright, both imported on first use (see sdk.py)
 
 # ============================================================================
 # NESSIE API HELPERS
@@ -102,72 +132,170 @@ except Exception as e:
 
 def get_nessie_accounts():
     """Fetch accounts from Nessie API"""
-    url = f"http://api.nessieisreal.com/accounts?key={NESSIE_API_KEY}"
+    url = f"{NESSIE_BASE_URL}/accounts?key={NESSIE_API_KEY}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        with span("nessie.accounts"):
+            response = get_http_client().get(url, timeout=NESSIE_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
     except Exception as e:
         print(f"Nessie API error: {e}")
         return []
 
+def fetch_nessie_merchants():
+    """Fetch every merchant in one call (used to build the merchant index)"""
+    url = f"{NESSIE_BASE_URL}/merchants?key={NESSIE_API_KEY}"
+    with span("nessie.merchants"):
+        response = get_http_client().get(url, timeout=NESSIE_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+def fetch_nessie_transactions(account_id):
+    """Fetch transactions for an account, raising on failure"""
+    url = f"{NESSIE_BASE_URL}/accounts/{account_id}/purchases?key={NESSIE_API_KEY}"
+    with span("nessie.purchases"):
+        response = get_http_client().get(url, timeout=NESSIE_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
 def get_nessie_transactions(account_id):
     """Fetch transactions for an account"""
-    url = f"http://api.nessieisreal.com/accounts/{account_id}/purchases?key={NESSIE_API_KEY}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return fetch_nessie_transactions(account_id)
     except Exception as e:
         print(f"Nessie transactions error: {e}")
         return []
 
+def get_all_nessie_transactions(account_ids):
+    """Fetch transactions for every account concurrently, tolerating per-account failures"""
+    fetched = fan_out(
+        fetch_nessie_transactions,
+        account_ids,
+        max_concurrency=NESSIE_FETCH_CONCURRENCY,
+        deadline=NESSIE_FETCH_DEADLINE,
+    )
+    for account_id, error in fetched.errors.items():
+        print(f"Nessie transactions error ({account_id}): {error}")
+    if fetched.timed_out:
+        print(f"Nessie transactions timed out for {len(fetched.timed_out)} account(s)")
+    return fetched
+
+_purchase_store = None
+_purchase_store_lock = threading.Lock()
+
+def get_purchase_store():
+    """Return the local purchase store, opening it on first use"""
+    global _purchase_store
+    with _purchase_store_lock:
+        if _purchase_store is None:
+            _purchase_store = PurchaseStore()
+        return _purchase_store
+
+_merchant_index = None
+_merchant_index_lock = threading.Lock()
+
+def get_merchant_index():
+    """Return the merchant index, loading the disk snapshot and starting background refresh on first use"""
+    global _merchant_index
+    with _merchant_index_lock:
+        if _merchant_index is None:
+            _merchant_index = MerchantIndex(fetch_nessie_merchants)
+            _merchant_index.load()
+            if NESSIE_API_KEY:
+                _merchant_index.start_background_refresh(on_change=on_merchant_index_change)
+        return _merchant_index
+
+def categorize_purchase(purchase):
+    """Category for a purchase via its merchant (no network calls)"""
+    return purchase.get('category') or get_merchant_index().category(purchase.get('merchant_id'))
+
+def on_merchant_index_change():
+    """New merchant data: fix up stored categories and drop cached summaries"""
+    updated = get_purchase_store().recategorize(categorize_purchase)
+    if updated:
+        print(f"Recategorized {updated} stored purchase(s)")
+        summary_cache.invalidate()
+        breakdown_cache.invalidate()
+
+# Returned when Nessie has no accounts for us (or the API fails)
+MOCK_SPENDING_SUMMARY = {
+    "total_spending": 3247.82,
+    "budget_limit": 3750.00,
+    "budget_adherence": 87,
+    "savings_rate": 32,
+    "top_categories": [
+        {"category": "Housing", "amount": 1200},
+        {"category": "Food", "amount": 450},
+        {"category": "Transport", "amount": 280}
+    ]
+}
+
 def calculate_spending_summary():
     """Calculate spending summary from Nessie data"""
     accounts = get_nessie_accounts()
     
     if not accounts:
         # Return mock data if API fails
-        return {
-            "total_spending": 3247.82,
-            "budget_limit": 3750.00,
-            "budget_adherence": 87,
-            "savings_rate": 32,
-            "top_categories": [
-                {"category": "Housing", "amount": 1200},
-                {"category": "Food", "amount": 450},
-                {"category": "Transport", "amount": 280}
-            ]
-        }
+        return dict(MOCK_SPENDING_SUMMARY)
     
-    # Process real data
-    total_spending = 0
-    categories = {}
-    
-    for account in accounts:
-        account_id = account.get('_id')
-        transactions = get_nessie_transactions(account_id)
+    # Ingest only purchases we haven't stored yet, then read the running totals
+    account_ids = [account.get('_id') for account in accounts if account.get('_id')]
+    fetched = get_all_nessie_transactions(account_ids)
+    return summarize_spending(account_ids, fetched)
+
+def summarize_spending(account_ids, fetched):
+    """Store newly fetched purchases (a FanOutResult per account) and build the summary from the running totals"""
+    store = get_purchase_store()
+    with span("summary.compute"):
+        added = 0
+        for account_id, transactions in fetched.results.items():
+            added += store.ingest(account_id, transactions or [], categorize=categorize_purchase)
         
-        for txn in transactions:
-            amount = txn.get('amount', 0)
-            category = txn.get('category', 'Other')
-            total_spending += amount
-            categories[category] = categories.get(category, 0) + amount
+        categories = store.category_totals(account_ids)
+    if added:
+        breakdown_cache.invalidate(tuple(account_ids))
+    total_spending = sum(categories.values())
     
     return {
+        "account_ids": account_ids,
         "total_spending": round(total_spending, 2),
         "budget_limit": 3750.00,
         "budget_adherence": int((total_spending / 3750.00) * 100),
-        "top_categories": [{"category": k, "amount": v} for k, v in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]]
+        "top_categories": [{"category": k, "amount": v} for k, v in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]],
+        "partial": fetched.partial
     }
 
+# Per-user spending summary cache (fresh for SUMMARY_CACHE_TTL, then served stale while refreshing)
+summary_cache = SWRCache(ttl=SUMMARY_CACHE_TTL, stale_ttl=SUMMARY_CACHE_STALE_TTL, name="summary_cache")
+
+# Breakdowns of the stored purchases per set of accounts, dropped when new purchases are ingested for them
+breakdown_cache = SWRCache(ttl=SUMMARY_CACHE_TTL, stale_ttl=SUMMARY_CACHE_STALE_TTL, name="breakdown_cache")
+
+def public_summary(summary):
+    """Copy of a cached summary without the account ids it was built from"""
+    return {k: v for k, v in summary.items() if k != "account_ids"}
+
+def get_spending_summary(user_id="default"):
+    """Cached spending summary for a user"""
+    return public_summary(summary_cache.get(user_id, calculate_spending_summary))
+
+def spending_breakdown(summary):
+    """Per-category/month/account totals and rolling averages over the accounts behind a cached summary"""
+    account_ids = tuple(summary.get("account_ids", ()))
+    return breakdown_cache.get(account_ids, lambda: PurchaseColumns.from_rows(
+        get_purchase_store().purchases(account_ids)).summary())
+
+def get_spending_breakdown(user_id="default"):
+    """Breakdown for a user, over the same accounts as their spending summary"""
+    return spending_breakdown(summary_cache.get(user_id, calculate_spending_summary))
+
 # ============================================================================
 # GEMINI AI HELPERS
 # ============================================================================
 
-def build_financial_context(user_id="default"):
+def build_financial_context(user_id="default", spending=None):
     """Build comprehensive financial context for AI"""
-    spending = calculate_spending_summary()
+    spending = spending or get_spending_summary(user_id)
     
     context = f"""
 User Financial Context:
@@ -192,49 +320,140 @@ def get_system_prompt():
     """System prompt for the AI advisor"""
     return """You are a financial advisor. Give concise, helpful advice in 2-3 sentences. Be professional and conversational."""
 
-def ask_gemini(user_message, conversation_history=None):
-    """Send message to Gemini with context"""
-    if not model:
+GEMINI_UNAVAILABLE_MESSAGE = "I apologize, but I'm having trouble connecting to the AI service. Please check the server configuration."
+GEMINI_BUSY_MESSAGE = "I'm handling a lot of requests right now. Please try again in a moment."
+GEMINI_ERROR_MESSAGE = "I apologize, but I'm having trouble processing that right now. Could you try rephrasing your question?"
+
+class GeminiStreamError(Exception):
+    """Gemini failed after stream_gemini had already yielded part of the answer"""
+
+def build_prompt(user_message, conversation_history=None, user_id="default", spending=None):
+    """
+    Assemble the advisor prompt. The system prompt and financial context form a
+    reusable prefix; history (a ConversationHistory) is trimmed to
+    PROMPT_HISTORY_TOKEN_BUDGET and preceded by its summary.
+    """
+    context = build_financial_context(user_id, spending)
+    turns, summary = (conversation_history.turns, conversation_history.summary) if conversation_history is not None else (None, "")
+    with span("prompt.assemble"):
+        return prompt_assembler.assemble(get_system_prompt(), context, user_message, turns, summary)
+
+def log_gemini_error(e):
+    print(f"\n!!! GEMINI ERROR !!!")
+    print(f"Error type: {type(e).__name__}")
+    print(f"Error message: {str(e)}")
+    print(f"!!! END ERROR !!!\n")
+
+def generate(prompt, **kwargs):
+    """prompt.model.generate_content, traced as gemini.generate"""
+    with span("gemini.generate"):
+        return prompt.model.generate_content(prompt.contents, **kwargs)
+
+def response_scope(prompt):
+    """Response cache scope: the financial snapshot (prompt prefix) plus the history before the message"""
+    return cache_scope(prompt.prefix_key, prompt.history_text)
+
+def ask_gemini(user_message, conversation_history=None, user_id="default", semantic=False, lane="default", spending=None):
+    """
+    Send message to Gemini with context.
+    Answers are cached per financial snapshot; semantic=True also reuses answers to paraphrases.
+    The call is admitted by gemini_dispatcher in the given priority lane.
+    spending is the user's spending summary, if the caller already has it.
+    """
+    if not prompt_assembler:
         print("ERROR: Gemini model not initialized!")
-        return "I apologize, but I'm having trouble connecting to the AI service. Please check the server configuration."
+        return GEMINI_UNAVAILABLE_MESSAGE
     
     try:
-        # Build full context
-        context = build_financial_context()
-        system_prompt = get_system_prompt()
-        
-        # Build conversation
-        full_prompt = f"{system_prompt}\n\n{context}\n\nUser: {user_message}\n\nAdvisor:"
-        
-        # Add conversation history if exists
-        if conversation_history:
-            history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history[-5:]])
-            full_prompt = f"{system_prompt}\n\n{context}\n\nRecent Conversation:\n{history_text}\n\nUser: {user_message}\n\nAdvisor:"
+        prompt = build_prompt(user_message, conversation_history, user_id, spending)
+        scope = response_scope(prompt)
+        cached = response_cache.get(scope, user_message, semantic)
+        if cached is not None:
+            print(f"Response cache hit: {user_message[:60]}")
+            return cached
         
         print(f"\n=== GEMINI REQUEST ===")
         print(f"User Message: {user_message}")
         
-        response = model.generate_content(full_prompt)
+        response = gemini_dispatcher.call(lambda: generate(prompt), lane,
+                                          key=(prompt.prefix_key, prompt.contents) if GEMINI_COALESCE else None)
+        prompt_assembler.log_usage(prompt, response)
         
         print(f"Gemini Response: {response.text[:100]}...")
         print(f"=== END REQUEST ===\n")
         
+        response_cache.put(scope, user_message, response.text, semantic)
         return response.text
+    except DispatcherBusy as e:
+        print(f"Gemini dispatcher busy: {e}")
+        return GEMINI_BUSY_MESSAGE
     except Exception as e:
-        print(f"\n!!! GEMINI ERROR !!!")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {str(e)}")
-        print(f"!!! END ERROR !!!\n")
-        return "I apologize, but I'm having trouble processing that right now. Could you try rephrasing your question?"
+        log_gemini_error(e)
+        return GEMINI_ERROR_MESSAGE
+
+def stream_gemini(user_message, conversation_history=None, user_id="default", semantic=False, lane="interactive",
+                  spending=None):
+    """Like ask_gemini, but yields the answer as text chunks while Gemini generates it"""
+    if not prompt_assembler:
+        print("ERROR: Gemini model not initialized!")
+        yield GEMINI_UNAVAILABLE_MESSAGE
+        return
+    
+    prompt = build_prompt(user_message, conversation_history, user_id, spending)
+    scope = response_scope(prompt)
+    cached = response_cache.get(scope, user_message, semantic)
+    if cached is not None:
+        print(f"Response cache hit: {user_message[:60]}")
+        yield cached
+        return
+    print(f"\n=== GEMINI STREAM ===")
+    print(f"User Message: {user_message}")
+    started = time.perf_counter()
+    first_token_at = None
+    
+    emitted = False
+    answer = []
+    try:
+        # The slot is held until the stream ends (or the client goes away and the generator is closed)
+        with gemini_dispatcher.slot(lane), span("gemini.stream"):
+            response = generate(prompt, stream=True)
+            for chunk in response:
+                text = getattr(chunk, 'text', '')
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    observe("gemini.first_token", first_token_at - started)
+                    print(f"Time to first token: {(first_token_at - started) * 1000:.0f}ms")
+                emitted = True
+                answer.append(text)
+                yield text
+        prompt_assembler.log_usage(prompt, response)
+        response_cache.put(scope, user_message, "".join(answer), semantic)
+    except DispatcherBusy as e:
+        print(f"Gemini dispatcher busy: {e}")
+        yield GEMINI_BUSY_MESSAGE
+    except Exception as e:
+        log_gemini_error(e)
+        if emitted:
+            # The caller has part of an answer; it isn't cached, and the caller shouldn't keep it either
+            raise GeminiStreamError(str(e)) from e
+        yield GEMINI_ERROR_MESSAGE
+    print(f"Stream finished in {(time.perf_counter() - started) * 1000:.0f}ms")
+    print(f"=== END STREAM ===\n")
 
 # ============================================================================
 # ELEVENLABS HELPERS
 # ============================================================================
 
-def text_to_speech(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
-    """Convert text to speech using ElevenLabs"""
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-    
+ELEVENLABS_MODEL_ID = "eleven_monolingual_v1"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75
+}
+
+def elevenlabs_request(text):
+    """Headers and JSON body for an ElevenLabs text-to-speech call"""
     headers = {
         "xi-api-key": ELEVENLABS_API_KEY,
         "Content-Type": "application/json"
@@ -242,21 +461,130 @@ def text_to_speech(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
     
     data = {
         "text": text,
-        "model_id": "eleven_monolingual_v1",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.75
-        }
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS
     }
+    return headers, data
+
+def text_to_speech(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
+    """Convert text to speech using ElevenLabs"""
+    url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}"
+    headers, data = elevenlabs_request(text)
     
     try:
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        return response.content
+        with span("tts.synthesize"):
+            response = get_http_client().post(url, json=data, headers=headers, timeout=ELEVENLABS_TIMEOUT)
+            response.raise_for_status()
+            return response.content
     except Exception as e:
         print(f"ElevenLabs error: {e}")
         return None
 
+def text_to_speech_chunks(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
+    """Yield MP3 bytes for text from the ElevenLabs streaming endpoint as they arrive"""
+    url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}/stream"
+    headers, data = elevenlabs_request(text)
+    
+    started = time.perf_counter()
+    with span("tts.first_byte"):
+        response = get_http_client().post(url, json=data, headers=headers, timeout=ELEVENLABS_TIMEOUT, stream=True)
+    try:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size=TTS_STREAM_CHUNK_BYTES)
+    finally:
+        response.close()
+        observe("tts.stream", time.perf_counter() - started)
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+def get_audio_cache():
+    """Return the synthesized-speech disk cache, opening it on first use"""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
+
+def speech_cache_key(text, voice_id):
+    return audio_cache_key(text, voice_id, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS)
+
+def cached_text_to_speech(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
+    """Return (cache_key, audio_path), synthesizing only on a cache miss. audio_path is None on failure"""
+    key = speech_cache_key(text, voice_id)
+    cache = get_audio_cache()
+    path = cache.get(key)
+    if path:
+        return key, path
+    audio_data = text_to_speech(text, voice_id)
+    if not audio_data:
+        return key, None
+    return key, cache.put(key, audio_data)
+
+def cached_text_to_speech_chunks(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
+    """Yield MP3 bytes for text from the cache, or from ElevenLabs while writing them to the cache"""
+    key = speech_cache_key(text, voice_id)
+    cache = get_audio_cache()
+    cached = cache.open(key)
+    if cached:
+        with cached as f:
+            while True:
+                chunk = f.read(TTS_STREAM_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+    
+    writer = cache.open_writer(key)
+    completed = False
+    try:
+        for chunk in text_to_speech_chunks(text, voice_id):
+            writer.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        # Incomplete audio (error or client gone) must never be cached
+        if completed:
+            writer.commit()
+        else:
+            writer.abort()
+
+def stream_text_to_speech(text, voice_id="21m00Tcm4TlvDq8ikWAM"):
+    """MP3 audio for text sentence by sentence, in order, once the first sentence is synthesized; None if it fails"""
+    return start_speech(text, lambda sentence: cached_text_to_speech_chunks(sentence, voice_id))
+
+# Speculative synthesis of welcome messages, written to the audio cache when done
+speech_prefetcher = SpeechPrefetcher(store=lambda key, audio: get_audio_cache().put(key, audio))
+
+def prefetch_speech(voice_id):
+    """Start synthesizing text that is about to be generated; None if TTS isn't configured or prefetch is at capacity"""
+    if not ELEVENLABS_API_KEY:
+        return None
+    return speech_prefetcher.start(lambda sentence: cached_text_to_speech_chunks(sentence, voice_id))
+
+def audio_handle(key):
+    return {"key": key, "url": f"/api/advisor/audio/{key}"}
+
+def send_cached_audio(key, path):
+    """
+    Serve cached audio from disk (sendfile where the server supports it) with ETag and Range support.
+    None if another request evicted the file after it was looked up; callers treat that as a cache miss
+    """
+    try:
+        # send_file opens the file before returning, so a later eviction can't break the response
+        response = send_file(
+            path,
+            mimetype='audio/mpeg',
+            as_attachment=False,
+            download_name='speech.mp3',
+            conditional=True,
+            etag=key,
+            max_age=AUDIO_CACHE_MAX_AGE
+        )
+    except FileNotFoundError:
+        return None
+    response.headers['Content-Location'] = f"/api/advisor/audio/{key}"
+    return response
+
 # ============================================================================
 # COMPUTER USE HELPERS
 # ============================================================================
@@ -269,8 +597,13 @@ def denormalize_y(y: int, screen_height: int) -> int:
     """Convert normalized y coordinate (0-1000) to actual pixel coordinate."""
     return int(y / 1000 * screen_height)
 
-def execute_function_calls(candidate, page, screen_width, screen_height):
-    """Execute Computer Use function calls using Playwright"""
+def execute_function_calls(candidate, page, screen_width, screen_height, settle_times=None):
+    """
+    Execute Computer Use function calls using Playwright.
+    
+    After each action waits for the page to settle (see page_settle) instead
+    of sleeping; settle_times, if given, collects the seconds waited.
+    """
     results = []
     function_calls = []
     
@@ -283,6 +616,8 @@ def execute_function_calls(candidate, page, screen_width, screen_height):
         fname = function_call.name
         args = function_call.args
         print(f"  -> Executing: {fname}")
+        legacy_extra = 0.0
+        action_started = time.perf_counter()
 
         try:
             if fname == "open_web_browser":
@@ -313,91 +648,161 @@ def execute_function_calls(candidate, page, screen_width, screen_height):
                 url = args.get("url")
                 page.goto(url)
             elif fname == "wait_5_seconds":
-                time.sleep(5)
+                legacy_extra = 5.0  # now bounded by the settle timeout rather than slept in full
             elif fname == "go_back":
                 page.go_back()
             else:
                 print(f"Warning: Unimplemented function {fname}")
 
             # Wait for potential navigations/renders
-            page.wait_for_load_state(timeout=5000)
-            time.sleep(1)
+            settle_seconds, settled = wait_for_settle(page, fname, legacy_extra=legacy_extra)
+            print(f"     settled in {settle_seconds:.2f}s" + ("" if settled else " (timed out)"))
+            if settle_times is not None:
+                settle_times.append(settle_seconds)
 
         except Exception as e:
             print(f"Error executing {fname}: {e}")
             action_result = {"error": str(e)}
+        observe("computer_use.action", time.perf_counter() - action_started, action=fname)
 
         results.append((fname, action_result))
 
     return results
 
-def get_function_responses(page, results):
-    """Capture environment state after action execution"""
-    screenshot_bytes = page.screenshot(type="png")
+def capture_screenshot(page):
+    """Take a PNG screenshot and encode it for the model. Returns (raw_png_size, data, mime_type)"""
+    png_bytes = page.screenshot(type="png")
+    if not COMPUTER_USE_COMPACT:
+        return len(png_bytes), png_bytes, "image/png"
+    data, mime_type = encode_screenshot(png_bytes)
+    return len(png_bytes), data, mime_type
+
+def get_function_responses(page, results, frame_sizes=None):
+    """
+    Capture environment state after action execution.
+    
+    In compact mode the screenshot is attached once per turn (to the last
+    response) instead of to every response. frame_sizes, if given, collects
+    the raw PNG bytes the uncompacted loop would have attached.
+    """
+    types = load_computer_use().types
+    raw_size, screenshot_bytes, mime_type = capture_screenshot(page)
     current_url = page.url
     function_responses = []
     
-    for name, result in results:
+    for index, (name, result) in enumerate(results):
         response_data = {"url": current_url}
         response_data.update(result)
+        attach = not COMPUTER_USE_COMPACT or index == len(results) - 1
+        if frame_sizes is not None:
+            frame_sizes.append(raw_size)
         function_responses.append(
             types.FunctionResponse(
                 name=name,
                 response=response_data,
                 parts=[types.FunctionResponsePart(
                         inline_data=types.FunctionResponseBlob(
-                            mime_type="image/png",
+                            mime_type=mime_type,
                             data=screenshot_bytes))
-                ]
+                ] if attach else None
             )
         )
     return function_responses
 
-def search_cars_with_computer_use(budget_max: float):
-    """
-    Use Gemini Computer Use API to search for Toyota cars within budget.
-    Returns a list of car recommendations.
-    """
-    if not computer_use_available:
-        return {
-            "error": "Computer Use dependencies not installed. Run: pip install google-genai playwright && playwright install chromium",
-            "recommendations": [],
-            "success": False
-        }
+def _screenshot_slots(contents):
+    """(content_index, part_index, size) for every screenshot in contents, oldest first"""
+    slots = []
+    for ci, content in enumerate(contents):
+        for pi, part in enumerate(content.parts or []):
+            if getattr(part, 'inline_data', None) is not None and part.inline_data.data:
+                slots.append((ci, pi, len(part.inline_data.data)))
+            fr = getattr(part, 'function_response', None)
+            if fr is not None and fr.parts:
+                size = sum(len(p.inline_data.data) for p in fr.parts if p.inline_data and p.inline_data.data)
+                if size:
+                    slots.append((ci, pi, size))
+    return slots
+
+def prune_screenshots(contents, keep_last):
+    """Replace all but the last keep_last screenshots in contents with text placeholders"""
+    slots = _screenshot_slots(contents)
+    if len(slots) <= keep_last:
+        return
+    sdk = load_computer_use()
+    types, Part = sdk.types, sdk.Part
+    for ci, pi, _ in slots[:max(0, len(slots) - keep_last)]:
+        part = contents[ci].parts[pi]
+        fr = getattr(part, 'function_response', None)
+        if fr is not None:
+            contents[ci].parts[pi] = Part(function_response=types.FunctionResponse(
+                name=fr.name,
+                response={**(fr.response or {}), "screenshot": "omitted (older turn)"}
+            ))
+        else:
+            contents[ci].parts[pi] = Part(text="[Screenshot from an earlier turn omitted]")
+
+def contents_payload_bytes(contents):
+    """Approximate request size: image bytes plus text and function-call/response JSON"""
+    total = 0
+    for content in contents:
+        for part in content.parts or []:
+            if getattr(part, 'text', None):
+                total += len(part.text.encode())
+            if getattr(part, 'function_call', None) is not None:
+                total += len(json.dumps(dict(part.function_call.args or {}), default=str))
+            fr = getattr(part, 'function_response', None)
+            if fr is not None:
+                total += len(json.dumps(fr.response or {}, default=str))
+    return total + sum(size for _, _, size in _screenshot_slots(contents))
+
+_computer_use_client = None
+_computer_use_client_lock = threading.Lock()
+
+def get_computer_use_client():
+    """Return a shared Computer Use client so its HTTP connections are reused across searches"""
+    global _computer_use_client
+    with _computer_use_client_lock:
+        if _computer_use_client is None:
+            _computer_use_client = load_computer_use().genai.Client(api_key=GEMINI_API_KEY)
+        return _computer_use_client
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Return the shared pool of warm headless browsers (started on first use)"""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool(
+                load_computer_use().sync_playwright,
+                viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT},
+            )
+            _browser_pool.start()
+        return _browser_pool
+
+def run_car_search_agent(page, budget_max: float, on_progress=None):
+    """Computer Use agent loop on an already-open page. Returns the agent's final text"""
+    progress = on_progress or (lambda event: None)
+    sdk = load_computer_use()
+    types, Content, Part = sdk.types, sdk.Content, sdk.Part
+    # Shared Computer Use client (keeps its connection pool warm)
+    computer_client = get_computer_use_client()
     
-    print(f"Searching for Toyota cars with budget: ${budget_max}")
+    # Configure the model (Computer Use required, no fallback)
+    config = types.GenerateContentConfig(
+        tools=[types.Tool(computer_use=types.ComputerUse(
+            environment=types.Environment.ENVIRONMENT_BROWSER
+        ))],
+    )
     
-    playwright_instance = None
-    browser = None
+    # Initial screenshot
+    initial_raw_size, initial_screenshot, initial_mime_type = capture_screenshot(page)
+    frame_sizes = [initial_raw_size]  # raw PNG bytes the uncompacted loop would keep in contents
+    settle_times = []
     
-    try:
-        # Initialize the Computer Use client
-        computer_client = genai_client.Client(api_key=GEMINI_API_KEY)
-        
-        # Setup Playwright
-        print("Starting Playwright...")
-        playwright_instance = sync_playwright().start()
-        browser = playwright_instance.chromium.launch(headless=True)
-        context = browser.new_context(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
-        page = context.new_page()
-        
-        # Go to initial page
-        print("Navigating to Google...")
-        page.goto("https://www.google.com", wait_until="networkidle", timeout=30000)
-        time.sleep(2)
-        
-        # Configure the model (Computer Use required, no fallback)
-        config = types.GenerateContentConfig(
-            tools=[types.Tool(computer_use=types.ComputerUse(
-                environment=types.Environment.ENVIRONMENT_BROWSER
-            ))],
-        )
-        
-        # Initial screenshot
-        initial_screenshot = page.screenshot(type="png")
-        
-        # Create search prompt
-        USER_PROMPT = f"""Search on Google Shopping for used or new Toyota cars priced under ${budget_max:.0f}. 
+    # Create search prompt
+    USER_PROMPT = f"""Search on Google Shopping for used or new Toyota cars priced under ${budget_max:.0f}. 
 Find 4-5 options with good ratings. For each car, extract:
 - Make and Model
 - Year
@@ -406,59 +811,104 @@ Find 4-5 options with good ratings. For each car, extract:
 - Brief description or key features
 
 Format the results as a clear, structured list."""
+    
+    print(f"Goal: {USER_PROMPT}")
+    
+    contents = [
+        Content(role="user", parts=[
+            Part(text=USER_PROMPT),
+            Part.from_bytes(data=initial_screenshot, mime_type=initial_mime_type)
+        ])
+    ]
+    
+    # Agent Loop
+    turn_limit = 15
+    final_text = ""
+    
+    for i in range(turn_limit):
+        print(f"\n--- Turn {i+1} ---")
+        print("Thinking...")
+        progress({"type": "turn", "turn": i + 1, "turn_limit": turn_limit, "stage": "thinking"})
+        turn_started = time.perf_counter()
         
-        print(f"Goal: {USER_PROMPT}")
-        
-        contents = [
-            Content(role="user", parts=[
-                Part(text=USER_PROMPT),
-                Part.from_bytes(data=initial_screenshot, mime_type='image/png')
-            ])
-        ]
-        
-        # Agent Loop
-        turn_limit = 15
-        final_text = ""
-        
-        for i in range(turn_limit):
-            print(f"\n--- Turn {i+1} ---")
-            print("Thinking...")
+        try:
+            if COMPUTER_USE_COMPACT:
+                prune_screenshots(contents, COMPUTER_USE_KEEP_SCREENSHOTS)
+            sent_bytes = contents_payload_bytes(contents)
+            images_sent = sum(size for _, _, size in _screenshot_slots(contents))
+            baseline_bytes = sent_bytes - images_sent + sum(frame_sizes)
+            print(f"Request payload: {sent_bytes / 1024:.0f}KB (uncompacted: {baseline_bytes / 1024:.0f}KB)")
+            progress({"type": "payload", "turn": i + 1, "sent_bytes": sent_bytes, "uncompacted_bytes": baseline_bytes})
             
-            try:
-                response = computer_client.models.generate_content(
-                    model='gemini-2.5-computer-use-preview-10-2025',
-                    contents=contents,
-                    config=config,
-                )
-                
-                candidate = response.candidates[0]
-                contents.append(candidate.content)
-                
-                has_function_calls = any(part.function_call for part in candidate.content.parts)
-                
-                if not has_function_calls:
-                    text_response = " ".join([part.text for part in candidate.content.parts if part.text])
-                    print("Agent finished:", text_response)
-                    final_text = text_response
-                    break
-                
-                print("Executing actions...")
-                results = execute_function_calls(candidate, page, SCREEN_WIDTH, SCREEN_HEIGHT)
-                
-                print("Capturing state...")
-                function_responses = get_function_responses(page, results)
-                
-                contents.append(
-                    Content(role="user", parts=[Part(function_response=fr) for fr in function_responses])
-                )
-            except Exception as turn_error:
-                print(f"Error in turn {i+1}: {turn_error}")
-                # Try to continue with next turn
-                if i == turn_limit - 1:
-                    raise
+            def generate_turn():
+                with span("computer_use.generate"):
+                    return computer_client.models.generate_content(
+                        model='gemini-2.5-computer-use-preview-10-2025',
+                        contents=contents,
+                        config=config,
+                    )
+            response = gemini_dispatcher.call(generate_turn, lane="background")
+            
+            candidate = response.candidates[0]
+            contents.append(candidate.content)
+            
+            has_function_calls = any(part.function_call for part in candidate.content.parts)
+            
+            if not has_function_calls:
+                text_response = " ".join([part.text for part in candidate.content.parts if part.text])
+                print("Agent finished:", text_response)
+                final_text = text_response
+                break
+            
+            print("Executing actions...")
+            progress({
+                "type": "turn", "turn": i + 1, "turn_limit": turn_limit, "stage": "acting",
+                "actions": [part.function_call.name for part in candidate.content.parts if part.function_call]
+            })
+            results = execute_function_calls(candidate, page, SCREEN_WIDTH, SCREEN_HEIGHT, settle_times)
+            
+            print("Capturing state...")
+            with span("computer_use.screenshot"):
+                function_responses = get_function_responses(page, results, frame_sizes)
+            
+            contents.append(
+                Content(role="user", parts=[Part(function_response=fr) for fr in function_responses])
+            )
+        except Exception as turn_error:
+            print(f"Error in turn {i+1}: {turn_error}")
+            progress({"type": "turn_error", "turn": i + 1, "error": str(turn_error)})
+            # Try to continue with next turn
+            if i == turn_limit - 1:
+                raise
+        finally:
+            observe("computer_use.turn", time.perf_counter() - turn_started)
+    
+    print(f"Page settle: {len(settle_times)} actions, {sum(settle_times):.1f}s waiting")
+    if COMPUTER_USE_COMPACT:
+        print(f"Screenshots: {len(frame_sizes)} frames, {sum(frame_sizes) / 1024:.0f}KB as raw PNG")
+    return final_text
+
+def search_cars_with_computer_use(budget_max: float, on_progress=None):
+    """
+    Use Gemini Computer Use API to search for Toyota cars within budget.
+    Returns a list of car recommendations. on_progress(event) is called once per agent turn.
+    """
+    if not computer_use_available():
+        return {
+            "error": "Computer Use dependencies not installed. Run: pip install google-genai playwright && playwright install chromium",
+            "recommendations": [],
+            "success": False
+        }
+    
+    print(f"Searching for Toyota cars with budget: ${budget_max}")
+    
+    try:
+        # Runs on a pooled browser that already has Google loaded
+        final_text = get_browser_pool().run(lambda page: run_car_search_agent(page, budget_max, on_progress))
         
         # Parse the final response
-        cars = parse_car_recommendations(final_text)
+        on_record = (lambda record: on_progress({"type": "recommendation", "car": record.to_dict()})) if on_progress else None
+        cars = parse_car_recommendations(final_text, budget_max, on_record)
         return cars
         
     except Exception as e:
@@ -470,27 +920,24 @@ Format the results as a clear, structured list."""
             "recommendations": [],
             "success": False
         }
-    finally:
-        # Cleanup
-        print("Cleaning up browser...")
-        try:
-            if browser:
-                browser.close()
-        except:
-            pass
-        try:
-            if playwright_instance:
-                playwright_instance.stop()
-        except:
-            pass
-
-def parse_car_recommendations(text: str):
-    """Parse the AI response to extract structured car data"""
-    # This is a simple parser - in production you'd want more robust parsing
-    # For now, return the raw text formatted nicely
+
+def parse_car_recommendations(text: str, budget_max: float = None, on_record=None):
+    """
+    Parse the AI response to extract structured car data.
+    Cars priced over budget_max are listed under over_budget instead of recommendations.
+    """
+    parser = CarOutputParser(budget_max)
+    records = []
+    for record in parser.feed(text or "") + parser.close():
+        records.append(record)
+        if on_record:
+            on_record(record)
+    recommended, over_budget = split_by_budget(records)
+    print(f"Parsed {len(records)} cars ({len(over_budget)} over budget)")
     return {
         "raw_text": text,
-        "recommendations": [],
+        "recommendations": [r.to_dict() for r in recommended],
+        "over_budget": [r.to_dict() for r in over_budget],
         "success": True
     }
 
@@ -498,6 +945,24 @@ def parse_car_recommendations(text: str):
 # API ROUTES
 # ============================================================================
 
+API_ENDPOINTS = {
+    "health": "/health",
+    "start_session": "POST /api/advisor/start-session",
+    "chat": "POST /api/advisor/chat",
+    "chat_stream": "POST /api/advisor/chat/stream",
+    "synthesize_speech": "POST /api/advisor/synthesize-speech",
+    "synthesize_speech_stream": "POST /api/advisor/synthesize-speech/stream",
+    "cached_audio": "GET /api/advisor/audio/<key>",
+    "analyze_spending": "POST /api/advisor/analyze-spending",
+    "generate_goals": "POST /api/advisor/generate-goals",
+    "end_session": "POST /api/advisor/end-session",
+    "car_recommendations": "POST /api/advisor/car-recommendations",
+    "car_search_jobs": "POST /api/advisor/car-recommendations/jobs",
+    "car_search_job": "GET /api/advisor/car-recommendations/jobs/<job_id>",
+    "car_search_job_events": "GET /api/advisor/car-recommendations/jobs/<job_id>/events",
+    "metrics": "GET /metrics"
+}
+
 @app.route('/', methods=['GET'])
 def home():
     """Welcome page"""
@@ -505,58 +970,151 @@ def home():
         "message": "MoneyTalks Advisor API",
         "version": "1.0.0",
         "status": "running",
-        "endpoints": {
-            "health": "/health",
-            "start_session": "POST /api/advisor/start-session",
-            "chat": "POST /api/advisor/chat",
-            "synthesize_speech": "POST /api/advisor/synthesize-speech",
-            "analyze_spending": "POST /api/advisor/analyze-spending",
-            "generate_goals": "POST /api/advisor/generate-goals",
-            "end_session": "POST /api/advisor/end-session"
-        }
+        "endpoints": API_ENDPOINTS
     })
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
+def health_status():
+    """Health report: configuration plus every pool, cache and queue's stats"""
+    return {
         "status": "healthy",
         "gemini_configured": bool(GEMINI_API_KEY),
         "elevenlabs_configured": bool(ELEVENLABS_API_KEY),
-        "nessie_configured": bool(NESSIE_API_KEY)
-    })
+        "nessie_configured": bool(NESSIE_API_KEY),
+        "http_pools": get_http_client().stats.snapshot(),
+        "summary_cache": summary_cache.stats(),
+        "breakdown_cache": breakdown_cache.stats(),
+        "audio_cache": get_audio_cache().stats(),
+        "sessions": sessions.stats(),
+        "history_summarizer": history_summarizer.stats(),
+        "browser_pool": _browser_pool.stats() if _browser_pool else None,
+        "car_search_jobs": car_search_jobs.stats(),
+        "car_search_cache": car_search_cache.stats(),
+        "page_settle": settle_stats.snapshot(),
+        "prompt_cache": prompt_assembler.stats() if prompt_assembler else None,
+        "response_cache": response_cache.stats(),
+        "gemini_dispatcher": gemini_dispatcher.stats(),
+        "speech_prefetch": speech_prefetcher.stats(),
+        "sdk": sdk_stats()
+    }
 
-@app.route('/api/advisor/start-session', methods=['POST'])
-def start_session():
-    """Initialize a new advisor session"""
-    data = request.json
-    user_id = data.get('user_id', 'default')
-    
-    # Create session
-    session_id = f"session_{datetime.now().timestamp()}"
-    sessions[session_id] = {
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify(health_status())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: per-stage latency histograms, request counts and queue/cache gauges"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+def session_user_id(session_id):
+    """user_id of a session, or 'default' when there is no such session"""
+    session = sessions.get(session_id) if session_id else None
+    return session.get('user_id', 'default') if session else 'default'
+
+WELCOME_PROMPT = "Generate a brief, professional greeting for a user starting a financial advisor session. Include a quick overview of their current financial status."
+DEFAULT_WELCOME_MESSAGE = "Hello. I'm your MoneyTalks advisor. I've reviewed your recent financial activity. How can I help you today?"
+END_SESSION_PROMPT = "Provide a brief 2-sentence summary of our conversation and next steps."
+
+def analysis_prompt(spending_summary):
+    return f"Analyze this spending data and provide 2-3 key insights: {json.dumps(spending_summary)}"
+
+def goals_prompt(spending_summary):
+    return f"Based on this financial data {json.dumps(spending_summary)}, suggest 3 realistic savings goals with specific amounts and timeframes."
+
+HISTORY_SUMMARY_PROMPT = "You keep notes on a financial advisor conversation. Merge the notes so far with the new messages into at most 5 sentences. Keep the user's goals, figures, decisions and the advice given."
+
+def create_advisor_session(user_id, welcome_message, spending=None):
+    """Store a new session whose history starts with the welcome message; returns its id"""
+    session = {
         "user_id": user_id,
         "started_at": datetime.now().isoformat(),
-        "conversation_history": [],
-        "context": build_financial_context(user_id)
+        "conversation_history": ConversationHistory([Turn("advisor", welcome_message or DEFAULT_WELCOME_MESSAGE)]),
+        "context": build_financial_context(user_id, spending)
     }
     
-    # Generate welcome message
-    welcome_message = ask_gemini("Generate a brief, professional greeting for a user starting a financial advisor session. Include a quick overview of their current financial status.")
+    return sessions.create(session)
+
+def record_turn(session_id, role, content):
+    """
+    Append a message to a session's history. Past HISTORY_MAX_TURNS, the older
+    turns are summarised in the background; returns the Turn
+    """
+    turn = Turn(role, content)
+    if sessions.append_message(session_id, turn) > HISTORY_MAX_TURNS:
+        history_summarizer.schedule(session_id)
+    return turn
+
+def summarize_history(summary, turns):
+    """Running summary of a session: the notes so far plus turns, condensed by Gemini in the background lane"""
+    if not prompt_assembler:
+        return None
+    transcript = "\n".join(format_turn(turn) for turn in turns)
+    if summary:
+        transcript = f"Notes so far: {summary}\n\nNew messages:\n{transcript}"
+    prefix, _, _ = prompt_assembler.prefix(HISTORY_SUMMARY_PROMPT)
+    with span("history.summarize"):
+        response = gemini_dispatcher.call(lambda: prefix.model.generate_content(transcript), "background")
+    return response.text.strip()
+
+def generate_welcome(user_id, spending, voice_id):
+    """
+    Stream the welcome message while synthesizing its sentences as they complete.
+    Returns (welcome_message, audio handle or None)
+    """
+    prefetch = prefetch_speech(voice_id)
+    parts = []
+    try:
+        for text in stream_gemini(WELCOME_PROMPT, user_id=user_id, lane="interactive", spending=spending):
+            parts.append(text)
+            if prefetch:
+                prefetch.feed(text)
+    except GeminiStreamError:
+        # Half a welcome isn't shown: use the default one, synthesized when the client asks for it
+        if prefetch:
+            prefetch.cancel()
+        prefetch, parts = None, []
+    except Exception:
+        if prefetch:
+            prefetch.cancel()
+        raise
+    
+    welcome_message = "".join(parts) or DEFAULT_WELCOME_MESSAGE
+    key = speech_cache_key(welcome_message, voice_id)
+    if not prefetch:
+        return welcome_message, audio_handle(key) if get_audio_cache().get(key) else None
+    if get_audio_cache().get(key):
+        # Same welcome as an earlier session: its audio is already there
+        prefetch.cancel()
+    else:
+        if not parts:
+            prefetch.feed(welcome_message)
+        prefetch.finish(key)
+    return welcome_message, audio_handle(key)
+
+@app.route('/api/advisor/start-session', methods=['POST'])
+def start_session():
+    """
+    Initialize a new advisor session.
+    The welcome message's speech is synthesized while it is generated; welcome_audio.url serves it
+    (streamed if synthesis is still running)
+    """
+    data = request.json
+    user_id = data.get('user_id', 'default')
+    voice_id = data.get('voice_id', '21m00Tcm4TlvDq8ikWAM')  # Default Rachel voice
     
-    if not welcome_message:
-        welcome_message = "Hello. I'm your MoneyTalks advisor. I've reviewed your recent financial activity. How can I help you today?"
+    # One snapshot for the welcome prompt, the session context and the response
+    spending = get_spending_summary(user_id)
+    welcome_message, welcome_audio = generate_welcome(user_id, spending, voice_id)
     
-    sessions[session_id]["conversation_history"].append({
-        "role": "advisor",
-        "content": welcome_message,
-        "timestamp": datetime.now().isoformat()
-    })
+    # Create session
+    session_id = create_advisor_session(user_id, welcome_message, spending)
     
     return jsonify({
         "session_id": session_id,
         "welcome_message": welcome_message,
-        "financial_summary": calculate_spending_summary()
+        "welcome_audio": welcome_audio,
+        "financial_summary": spending
     })
 
 @app.route('/api/advisor/chat', methods=['POST'])
@@ -566,37 +1124,71 @@ def chat():
     session_id = data.get('session_id')
     user_message = data.get('message')
     
-    if not session_id or session_id not in sessions:
+    # Get session
+    session = sessions.get(session_id) if session_id else None
+    if not session:
         return jsonify({"error": "Invalid session"}), 400
     
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
     
-    # Get session
-    session = sessions[session_id]
-    
-    # Add user message to history
-    session["conversation_history"].append({
-        "role": "user",
-        "content": user_message,
-        "timestamp": datetime.now().isoformat()
-    })
+    # Add user message to history. The prompt (and the answer cache scope) uses the history before it:
+    # the prompt adds the message itself, and a scope containing it would never match a paraphrase
+    record_turn(session_id, "user", user_message)
     
     # Get AI response
-    ai_response = ask_gemini(user_message, session["conversation_history"])
+    ai_response = ask_gemini(user_message, session["conversation_history"], user_id=session["user_id"],
+                             semantic=True, lane="interactive")
     
     # Add AI response to history
-    session["conversation_history"].append({
-        "role": "advisor",
-        "content": ai_response,
-        "timestamp": datetime.now().isoformat()
-    })
+    record_turn(session_id, "advisor", ai_response)
     
     return jsonify({
         "response": ai_response,
         "timestamp": datetime.now().isoformat()
     })
 
+def sse_event(event, payload):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/advisor/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming the advisor's answer as Server-Sent Events"""
+    data = request.json
+    session_id = data.get('session_id')
+    user_message = data.get('message')
+    
+    session = sessions.get(session_id) if session_id else None
+    if not session:
+        return jsonify({"error": "Invalid session"}), 400
+    
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    
+    record_turn(session_id, "user", user_message)  # the prompt uses the history before it, as in chat()
+    
+    def generate():
+        parts = []
+        try:
+            for text in stream_gemini(user_message, session["conversation_history"], user_id=session["user_id"], semantic=True):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except GeminiStreamError:
+            yield sse_event("error", {"error": GEMINI_ERROR_MESSAGE})
+            return
+        
+        # Only a completed stream is written to the history
+        ai_response = "".join(parts)
+        turn = record_turn(session_id, "advisor", ai_response)
+        yield sse_event("done", {"response": ai_response, "timestamp": datetime.fromtimestamp(turn.at).isoformat()})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/advisor/synthesize-speech', methods=['POST'])
 def synthesize_speech():
     """Convert text to speech"""
@@ -607,17 +1199,61 @@ def synthesize_speech():
     if not text:
         return jsonify({"error": "No text provided"}), 400
     
-    audio_data = text_to_speech(text, voice_id)
+    # A second try synthesizes again if the clip was evicted before it could be sent
+    for _ in range(2):
+        key, audio_path = cached_text_to_speech(text, voice_id)
+        if not audio_path:
+            break
+        response = send_cached_audio(key, audio_path)
+        if response is not None:
+            return response
     
-    if not audio_data:
+    return jsonify({"error": "Failed to generate speech"}), 500
+
+@app.route('/api/advisor/audio/<key>', methods=['GET'])
+def get_cached_audio(key):
+    """
+    Serve previously synthesized audio by its cache key (supports ETag and Range requests).
+    Audio that is still being synthesized (welcome_audio from start-session) is streamed as it arrives
+    """
+    if not re.fullmatch(r'[0-9a-f]{64}', key):
+        return jsonify({"error": "Invalid audio key"}), 400
+    
+    prefetch = speech_prefetcher.get(key)
+    if prefetch is not None:
+        if not prefetch.wait_for_audio():
+            return jsonify({"error": "Failed to generate speech"}), 500
+        return Response(
+            stream_with_context(prefetch.iter_audio()),
+            mimetype='audio/mpeg',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    audio_path = get_audio_cache().get(key)
+    response = send_cached_audio(key, audio_path) if audio_path else None
+    if response is None:
+        return jsonify({"error": "Audio not found"}), 404
+    
+    return response
+
+@app.route('/api/advisor/synthesize-speech/stream', methods=['POST'])
+def synthesize_speech_stream():
+    """Convert text to speech, streaming MP3 audio sentence by sentence"""
+    data = request.json
+    text = data.get('text')
+    voice_id = data.get('voice_id', '21m00Tcm4TlvDq8ikWAM')  # Default Rachel voice
+    
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+    
+    audio = stream_text_to_speech(text, voice_id)
+    if audio is None:
         return jsonify({"error": "Failed to generate speech"}), 500
     
-    # Return audio as file
-    return send_file(
-        BytesIO(audio_data),
+    return Response(
+        stream_with_context(audio),
         mimetype='audio/mpeg',
-        as_attachment=False,
-        download_name='speech.mp3'
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
 
 @app.route('/api/advisor/analyze-spending', methods=['POST'])
@@ -625,15 +1261,16 @@ def analyze_spending():
     """Get spending analysis with AI insights"""
     data = request.json
     session_id = data.get('session_id')
+    user_id = session_user_id(session_id)
     
-    spending_summary = calculate_spending_summary()
+    spending_summary = get_spending_summary(user_id)
     
     # Get AI analysis
-    analysis_prompt = f"Analyze this spending data and provide 2-3 key insights: {json.dumps(spending_summary)}"
-    ai_insights = ask_gemini(analysis_prompt)
+    ai_insights = ask_gemini(analysis_prompt(spending_summary), user_id=user_id)
     
     return jsonify({
         "spending_summary": spending_summary,
+        "breakdown": get_spending_breakdown(user_id),
         "ai_insights": ai_insights
     })
 
@@ -642,12 +1279,12 @@ def generate_goals():
     """Generate personalized financial goals"""
     data = request.json
     session_id = data.get('session_id')
+    user_id = session_user_id(session_id)
     
-    spending_summary = calculate_spending_summary()
+    spending_summary = get_spending_summary(user_id)
     
     # Get AI goal recommendations
-    goals_prompt = f"Based on this financial data {json.dumps(spending_summary)}, suggest 3 realistic savings goals with specific amounts and timeframes."
-    ai_goals = ask_gemini(goals_prompt)
+    ai_goals = ask_gemini(goals_prompt(spending_summary), user_id=user_id, lane="background")
     
     return jsonify({
         "goals": ai_goals,
@@ -663,14 +1300,13 @@ def end_session():
     if not session_id:
         return jsonify({"error": "No session_id provided"}), 400
     
-    if session_id in sessions:
-        session = sessions[session_id]
+    session = sessions.get(session_id)
+    if session:
         # Generate summary
-        summary_prompt = "Provide a brief 2-sentence summary of our conversation and next steps."
-        summary = ask_gemini(summary_prompt, session["conversation_history"])
+        summary = ask_gemini(END_SESSION_PROMPT, session["conversation_history"], user_id=session["user_id"])
         
-        # Clean up session - use pop to avoid KeyError
-        sessions.pop(session_id, None)
+        # Clean up session
+        sessions.delete(session_id)
         
         return jsonify({
             "summary": summary,
@@ -683,48 +1319,229 @@ def end_session():
         "ended_at": datetime.now().isoformat()
     })
 
+# Car searches run as background jobs so they don't hold a request thread for 30-60 seconds
+car_search_jobs = JobManager()
+
+# Finished searches are cached per budget bucket; identical in-flight searches share one job
+car_search_cache = SWRCache(ttl=CAR_SEARCH_CACHE_TTL, stale_ttl=0, max_entries=256, name="car_search_cache")
+_car_search_inflight = {}
+_car_search_inflight_lock = threading.Lock()
+
+def budget_bucket(budget):
+    """
+    Round a budget down to its cache bucket. Searching at the bucket floor keeps results valid for every budget in it.
+    Budgets below one bucket are searched as given, since their floor would be $0
+    """
+    try:
+        budget = float(budget)
+    except (TypeError, ValueError):
+        budget = 30000.0
+    if not budget > 0:
+        budget = 30000.0
+    if budget < CAR_SEARCH_BUDGET_BUCKET:
+        return max(int(budget), 1)
+    return int(budget // CAR_SEARCH_BUDGET_BUCKET * CAR_SEARCH_BUDGET_BUCKET)
+
+def run_car_search(progress, bucket):
+    """Run one Computer Use search for a budget bucket, raising on failure so errors aren't cached"""
+    with span("computer_use.search"):
+        result = search_cars_with_computer_use(bucket, on_progress=progress)
+    
+    # Check if there was an error in the result
+    if isinstance(result, dict) and result.get('error'):
+        raise RuntimeError(result['error'])
+    
+    return {
+        "results": result,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def car_search_response(budget, bucket, search):
+    return {
+        "success": True,
+        "budget": budget,
+        "budget_bucket": bucket,
+        "results": search["results"],
+        "timestamp": search["timestamp"]
+    }
+
+def run_car_search_job(progress, budget, bucket):
+    """Job body: run (or reuse) the bucket's search and shape the result like the car-recommendations response"""
+    search = car_search_cache.get(bucket, lambda: run_car_search(progress, bucket))
+    return car_search_response(budget, bucket, search)
+
+def submit_car_search(budget):
+    """Return the job for a car search (cached, joined or new). Raises QueueFull when the queue is full"""
+    print(f"\n{'='*50}")
+    print(f"Received car recommendation request with budget: ${budget}")
+    print(f"{'='*50}\n")
+    
+    bucket = budget_bucket(budget)
+    cached = car_search_cache.get_if_fresh(bucket)
+    if cached is not None:
+        print(f"Car search cache hit for bucket ${bucket}")
+        return car_search_jobs.add_completed("car_search", car_search_response(budget, bucket, cached),
+                                             budget=budget, bucket=bucket)
+    
+    with _car_search_inflight_lock:
+        job = _car_search_inflight.get(bucket)
+        if job is not None and not job.done:
+            print(f"Joining in-flight car search for bucket ${bucket}")
+            return job
+        job = car_search_jobs.submit("car_search", run_car_search_job, budget=budget, bucket=bucket)
+        for done_bucket in [b for b, j in _car_search_inflight.items() if j.done]:
+            del _car_search_inflight[done_bucket]
+        _car_search_inflight[bucket] = job
+        return job
+
+def car_search_busy(budget):
+    """(body, headers) for the 429 answer when the car search queue is full"""
+    return {
+        "success": False,
+        "error": "Too many car searches in progress, please retry shortly",
+        "budget": budget
+    }, {'Retry-After': '30'}
+
+def car_search_job_links(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/advisor/car-recommendations/jobs/{job.id}",
+        "events_url": f"/api/advisor/car-recommendations/jobs/{job.id}/events"
+    }
+
+def preflight_response():
+    resp = jsonify({"ok": True})
+    resp.status_code = 204
+    return resp
+
 @app.route('/api/advisor/car-recommendations', methods=['POST', 'OPTIONS'])
 def get_car_recommendations():
-    """Get Toyota car recommendations using Computer Use API"""
+    """Get Toyota car recommendations using Computer Use API (waits for the result)"""
     if request.method == 'OPTIONS':
         # Preflight response
-        resp = jsonify({"ok": True})
-        resp.status_code = 204
-        return resp
+        return preflight_response()
     data = request.json
     budget = data.get('budget', 30000)
     
-    print(f"\n{'='*50}")
-    print(f"Received car recommendation request with budget: ${budget}")
-    print(f"{'='*50}\n")
+    try:
+        job = submit_car_search(budget)
+    except QueueFull:
+        body, headers = car_search_busy(budget)
+        return jsonify(body), 429, headers
     
     # Run Computer Use (this will take 30-60 seconds)
+    job.wait()
+    if job.status == SUCCEEDED:
+        return jsonify({**job.result, "budget": budget})
+    return jsonify({
+        "success": False,
+        "error": job.error,
+        "budget": budget
+    }), 500
+
+@app.route('/api/advisor/car-recommendations/jobs', methods=['POST', 'OPTIONS'])
+def create_car_search_job():
+    """Queue a car search and return its job id immediately"""
+    if request.method == 'OPTIONS':
+        return preflight_response()
+    data = request.json or {}
+    budget = data.get('budget', 30000)
+    
     try:
-        result = search_cars_with_computer_use(budget)
-        
-        # Check if there was an error in the result
-        if isinstance(result, dict) and result.get('error'):
-            return jsonify({
-                "success": False,
-                "error": result['error'],
-                "budget": budget
-            }), 500
-        
-        return jsonify({
-            "success": True,
-            "budget": budget,
-            "results": result,
-            "timestamp": datetime.now().isoformat()
-        })
-    except Exception as e:
-        print(f"Error in car recommendations: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": f"Server error: {str(e)}",
-            "budget": budget
-        }), 500
+        job = submit_car_search(budget)
+    except QueueFull:
+        body, headers = car_search_busy(budget)
+        return jsonify(body), 429, headers
+    
+    return jsonify(car_search_job_links(job)), 202
+
+@app.route('/api/advisor/car-recommendations/jobs/<job_id>', methods=['GET'])
+def get_car_search_job(job_id):
+    """Status, per-turn progress and (when finished) the result of a car search job"""
+    job = car_search_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+    
+    data = job.to_dict()
+    data["queue_position"] = car_search_jobs.queue_position(job)
+    return jsonify(data)
+
+@app.route('/api/admin/car-search-cache/invalidate', methods=['POST'])
+def invalidate_car_search_cache():
+    """Drop cached car searches: one budget's bucket, or everything. Requires ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled (ADMIN_TOKEN not set)"}), 403
+    if not secrets.compare_digest(request.headers.get('Authorization', ''), f"Bearer {ADMIN_TOKEN}"):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    if 'budget' in data:
+        bucket = budget_bucket(data['budget'])
+        car_search_cache.invalidate(bucket)
+        return jsonify({"invalidated": [bucket]})
+    car_search_cache.invalidate()
+    return jsonify({"invalidated": "all"})
+
+@app.route('/api/advisor/car-recommendations/jobs/<job_id>/events', methods=['GET'])
+def stream_car_search_job(job_id):
+    """Follow a car search job as Server-Sent Events until it finishes"""
+    job = car_search_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+    
+    def generate():
+        seen = 0
+        while True:
+            events = job.wait_for_events(seen, timeout=15)
+            if not events and not job.done:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield sse_event("progress", event)
+            seen += len(events)
+            if job.done and seen >= len(job.events):
+                yield sse_event("done", job.to_dict(include_events=False))
+                return
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+register_gauge("gemini_queued", "Gemini calls waiting for admission, by lane",
+               lambda: {(("lane", lane),): n for lane, n in gemini_dispatcher.stats()["queued_by_lane"].items()})
+register_gauge("gemini_inflight", "Gemini calls running", lambda: gemini_dispatcher.stats()["inflight"])
+register_gauge("car_search_jobs", "Car search jobs queued or running",
+               lambda: {(("status", status),): car_search_jobs.stats()[status] for status in ("queued", "running")})
+register_gauge("sessions_active", "Advisor sessions held", lambda: sessions.stats().get("sessions"))
+register_gauge("history_summaries_pending", "Session histories queued or being summarised",
+               lambda: history_summarizer.stats()["pending"])
+register_gauge("response_cache_hit_ratio", "Advisor answer cache hit ratio", lambda: response_cache.stats()["hit_rate"])
+register_gauge("speech_prefetch_in_flight", "Speculative syntheses not yet in the audio cache",
+               lambda: speech_prefetcher.stats()["in_flight"])
+register_gauge("summary_cache_hit_ratio", "Spending summary cache hit ratio", lambda: summary_cache.stats()["hit_rate"])
+
+BROWSER_POOL_WARMUP = os.getenv('BROWSER_POOL_WARMUP', '1') == '1'
+
+def is_serving_process():
+    """False in the debug reloader's watcher process, which never serves requests"""
+    return not (__name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true')
+
+def warm_browser_pool():
+    """Start the browser pool if Computer Use is available (runs after the SDK pre-warm)"""
+    if BROWSER_POOL_WARMUP and computer_use_available():
+        get_browser_pool()
+
+# SDK imports (then the browser warm-up) happen in the background, so /health answers right away.
+# With SDK_PREWARM=0 they happen on first use instead
+if is_serving_process() and SDK_PREWARM:
+    prewarm_sdks(after=warm_browser_pool)
 
 # ============================================================================
 # MAIN
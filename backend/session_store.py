@@ -0,0 +1,282 @@
+"""
+Advisor session storage.
+
+Two interchangeable backends behind the same interface:
+
+- MemorySessionStore: thread-safe in-process dict with idle TTL and LRU
+  eviction, for a single worker process
+- SQLiteSessionStore: a shared SQLite file (WAL mode), so several gunicorn
+  workers on one host can serve the same session
+
+Sessions are dicts of JSON-serialisable values, except conversation_history,
+which is a conversation.ConversationHistory (stored via its to_json()).
+Callers get copies, so changes must go through save()/append_message()/
+fold_history() to be persisted.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from conversation import ConversationHistory
+from purchase_store import DATA_DIR
+
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+SESSION_TTL = float(os.getenv('SESSION_TTL', 60 * 60))  # idle seconds before a session expires
+SESSION_MAX = int(os.getenv('SESSION_MAX', 10000))
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', os.path.join(DATA_DIR, 'sessions.db'))
+
+
+def new_session_id():
+    """Unguessable session id (192 bits from the OS CSPRNG)"""
+    return f"session_{secrets.token_urlsafe(24)}"
+
+
+def _copy_session(session):
+    copied = dict(session)
+    if 'conversation_history' in copied:
+        copied['conversation_history'] = copied['conversation_history'].copy()
+    return copied
+
+
+def _encode_session(session):
+    if 'conversation_history' not in session:
+        return json.dumps(session)
+    return json.dumps({**session, 'conversation_history': session['conversation_history'].to_json()})
+
+
+def _decode_session(data):
+    session = json.loads(data)
+    if 'conversation_history' in session:
+        session['conversation_history'] = ConversationHistory.from_json(session['conversation_history'])
+    return session
+
+
+class MemorySessionStore:
+    """In-process session store with idle TTL and LRU eviction"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.RLock()
+        self._sessions = OrderedDict()  # session_id -> (session, expires_at)
+        self._stats = {"created": 0, "expired": 0, "evicted": 0, "deleted": 0}
+
+    def _live(self, session_id):
+        """Session dict if present and not expired (caller holds the lock)"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        session, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._sessions[session_id]
+            self._stats["expired"] += 1
+            return None
+        self._sessions[session_id] = (session, time.monotonic() + self.ttl)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _purge(self):
+        now = time.monotonic()
+        # Entries are in access order, so expired ones cluster at the front
+        while self._sessions:
+            session_id, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[session_id]
+            self._stats["expired"] += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._stats["evicted"] += 1
+
+    def create(self, session):
+        session_id = new_session_id()
+        with self._lock:
+            self._sessions[session_id] = (_copy_session(session), time.monotonic() + self.ttl)
+            self._stats["created"] += 1
+            self._purge()
+        return session_id
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._live(session_id)
+            return _copy_session(session) if session is not None else None
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return self._live(session_id) is not None
+
+    def save(self, session_id, session):
+        with self._lock:
+            if self._live(session_id) is None:
+                return False
+            self._sessions[session_id] = (_copy_session(session), time.monotonic() + self.ttl)
+            return True
+
+    def append_message(self, session_id, turn):
+        """Atomically append a Turn to a session's history. Returns the number of unfolded turns, 0 if the session is gone"""
+        with self._lock:
+            session = self._live(session_id)
+            if session is None:
+                return 0
+            return session.setdefault('conversation_history', ConversationHistory()).append(turn)
+
+    def fold_history(self, session_id, upto, summary):
+        """Replace a session's turns before absolute index upto with summary (see ConversationHistory.fold)"""
+        with self._lock:
+            session = self._live(session_id)
+            if session is None or 'conversation_history' not in session:
+                return False
+            return session['conversation_history'].fold(upto, summary)
+
+    def delete(self, session_id):
+        """Remove a session and return it (None if it didn't exist)"""
+        with self._lock:
+            session = self._live(session_id)
+            if session is None:
+                return None
+            del self._sessions[session_id]
+            self._stats["deleted"] += 1
+            return session
+
+    def stats(self):
+        with self._lock:
+            self._purge()
+            return {"backend": "memory", "sessions": len(self._sessions), **self._stats}
+
+
+class SQLiteSessionStore:
+    """Session store in a shared SQLite file, usable from several worker processes"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+    CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn, now) inside a write transaction that other processes queue behind"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _load(self, conn, session_id, now):
+        row = conn.execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, now)).fetchone()
+        return _decode_session(row[0]) if row else None
+
+    def _store(self, conn, session_id, session, now):
+        conn.execute(
+            "INSERT INTO sessions (session_id, data, expires_at, last_access) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, "
+            "expires_at = excluded.expires_at, last_access = excluded.last_access",
+            (session_id, _encode_session(session), now + self.ttl, now))
+
+    def _purge(self, conn, now):
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,))
+
+    def create(self, session):
+        session_id = new_session_id()
+
+        def create(conn, now):
+            self._store(conn, session_id, session, now)
+            self._purge(conn, now)
+        self._write(create)
+        return session_id
+
+    def get(self, session_id):
+        def get(conn, now):
+            session = self._load(conn, session_id, now)
+            if session is not None:
+                conn.execute("UPDATE sessions SET expires_at = ?, last_access = ? WHERE session_id = ?",
+                             (now + self.ttl, now, session_id))
+            return session
+        return self._write(get)
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def save(self, session_id, session):
+        def save(conn, now):
+            if self._load(conn, session_id, now) is None:
+                return False
+            self._store(conn, session_id, session, now)
+            return True
+        return self._write(save)
+
+    def append_message(self, session_id, turn):
+        def append(conn, now):
+            session = self._load(conn, session_id, now)
+            if session is None:
+                return 0
+            count = session.setdefault('conversation_history', ConversationHistory()).append(turn)
+            self._store(conn, session_id, session, now)
+            return count
+        return self._write(append)
+
+    def fold_history(self, session_id, upto, summary):
+        def fold(conn, now):
+            session = self._load(conn, session_id, now)
+            if session is None or 'conversation_history' not in session:
+                return False
+            if not session['conversation_history'].fold(upto, summary):
+                return False
+            self._store(conn, session_id, session, now)
+            return True
+        return self._write(fold)
+
+    def delete(self, session_id):
+        def delete(conn, now):
+            session = self._load(conn, session_id, now)
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return session
+        return self._write(delete)
+
+    def stats(self):
+        count = self._conn().execute("SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        return {"backend": "sqlite", "sessions": count}
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Session store selected by SESSION_BACKEND ('memory' or 'sqlite')"""
+    if backend == 'sqlite':
+        return SQLiteSessionStore()
+    if backend != 'memory':
+        print(f"WARNING: Unknown SESSION_BACKEND '{backend}', using in-memory sessions")
+    return MemorySessionStore()
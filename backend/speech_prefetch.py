@@ -0,0 +1,244 @@
+"""
+Speculative speech synthesis for text that is still being generated.
+
+start-session streams the welcome message from Gemini into a SpeechPrefetch:
+each sentence goes to TTS as soon as it is complete, so synthesis overlaps
+generation and the trip of the JSON response back to the client. Audio is
+kept in sentence order in memory while it is produced. A client that asks
+for it (GET /api/advisor/audio/<key>) before it is finished gets the bytes
+so far, then the rest as they arrive. Once complete, the whole clip is
+written to the audio cache under the key of the full text and the in-memory
+copy is dropped. Audio with a sentence that failed to synthesize is served
+to clients already waiting for it but never cached, so a transient TTS
+error can't leave a truncated clip behind for that text.
+
+At most SPEECH_PREFETCH_MAX_ACTIVE syntheses run at once; past that, start()
+returns None and the client falls back to /synthesize-speech. Speculative
+work should never queue behind requests that asked for audio.
+AsyncSpeechPrefetch is the event-loop version for the ASGI app.
+"""
+import asyncio
+import os
+import queue
+import threading
+
+from tts_stream import SentenceBuffer, stream_sentences, astream_sentences, TTS_STREAM_CONCURRENCY
+
+SPEECH_PREFETCH_ENABLED = os.getenv('SPEECH_PREFETCH_ENABLED', '1') == '1'
+SPEECH_PREFETCH_MAX_ACTIVE = int(os.getenv('SPEECH_PREFETCH_MAX_ACTIVE', 16))
+SPEECH_PREFETCH_WAIT = float(os.getenv('SPEECH_PREFETCH_WAIT', 30))
+
+_END = object()
+
+
+class SpeechPrefetch:
+    """Synthesis of one text fed in pieces while it is generated, on its own thread"""
+
+    def __init__(self, prefetcher, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY):
+        self.prefetcher = prefetcher
+        self.key = None
+        self.chunks = []
+        self.done = False
+        self._buffer = SentenceBuffer()
+        self._sentences = queue.Queue()
+        self._cancelled = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, args=(synthesize, max_concurrency),
+                                        name='speech-prefetch', daemon=True)
+        self._thread.start()
+
+    def feed(self, text):
+        """Add generated text; complete sentences start synthesizing right away"""
+        for sentence in self._buffer.feed(text):
+            self._sentences.put(sentence)
+
+    def finish(self, key):
+        """No more text is coming. key (the audio cache key of the full text) is where the audio ends up"""
+        for sentence in self._buffer.close():
+            self._sentences.put(sentence)
+        self.prefetcher._publish(key, self)
+        self._sentences.put(_END)
+
+    def cancel(self):
+        self._cancelled = True
+        self._sentences.put(_END)
+
+    def _run(self, synthesize, max_concurrency):
+        failed = []
+        audio = stream_sentences(iter(self._sentences.get, _END), synthesize, max_concurrency, failed)
+        complete = False
+        try:
+            for chunk in audio:
+                if self._cancelled:
+                    break
+                with self._cond:
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+            complete = not self._cancelled and not failed
+        except Exception as e:
+            print(f"Speech prefetch error: {e}")
+        finally:
+            audio.close()
+            self.prefetcher._complete(self, b"".join(self.chunks) if complete else None)
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def wait_for_audio(self, timeout=SPEECH_PREFETCH_WAIT):
+        """Block until the first chunk (True) or until synthesis ended without audio (False)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.chunks or self.done, timeout)
+            return bool(self.chunks)
+
+    def iter_audio(self, timeout=SPEECH_PREFETCH_WAIT):
+        """Yield the audio from the start, waiting (up to timeout per chunk) for what is still being synthesized"""
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: index < len(self.chunks) or self.done, timeout)
+                chunks = self.chunks[index:]
+            if not chunks:
+                return
+            index += len(chunks)
+            yield from chunks
+
+
+class AsyncSpeechPrefetch:
+    """SpeechPrefetch on the running event loop, for async synthesizers"""
+
+    def __init__(self, prefetcher, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY):
+        self.prefetcher = prefetcher
+        self.key = None
+        self.chunks = []
+        self.done = False
+        self._buffer = SentenceBuffer()
+        self._sentences = asyncio.Queue()
+        self._changed = asyncio.Condition()
+        self._task = asyncio.ensure_future(self._run(synthesize, max_concurrency))
+
+    def feed(self, text):
+        for sentence in self._buffer.feed(text):
+            self._sentences.put_nowait(sentence)
+
+    def finish(self, key):
+        for sentence in self._buffer.close():
+            self._sentences.put_nowait(sentence)
+        self.prefetcher._publish(key, self)
+        self._sentences.put_nowait(_END)
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def _next_sentences(self):
+        while True:
+            sentence = await self._sentences.get()
+            if sentence is _END:
+                return
+            yield sentence
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _run(self, synthesize, max_concurrency):
+        failed = []
+        audio = astream_sentences(self._next_sentences(), synthesize, max_concurrency, failed)
+        complete = False
+        try:
+            async for chunk in audio:
+                self.chunks.append(chunk)
+                await self._notify()
+            complete = not failed
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Speech prefetch error: {e}")
+        finally:
+            await audio.aclose()
+            await asyncio.to_thread(self.prefetcher._complete, self, b"".join(self.chunks) if complete else None)
+            self.done = True
+            await self._notify()
+
+    async def wait_for_audio(self, timeout=SPEECH_PREFETCH_WAIT):
+        try:
+            async with self._changed:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.chunks or self.done), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return bool(self.chunks)
+
+    async def iter_audio(self, timeout=SPEECH_PREFETCH_WAIT):
+        index = 0
+        while True:
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(self._changed.wait_for(lambda: index < len(self.chunks) or self.done), timeout)
+            except asyncio.TimeoutError:
+                pass
+            chunks = self.chunks[index:]
+            if not chunks:
+                return
+            index += len(chunks)
+            for chunk in chunks:
+                yield chunk
+
+
+class SpeechPrefetcher:
+    """
+    Starts speculative syntheses and finds running ones by audio key.
+
+    store(key, audio) persists a finished clip (the audio cache); a prefetch
+    stays findable by key until then.
+    """
+
+    def __init__(self, store, max_active=SPEECH_PREFETCH_MAX_ACTIVE, max_concurrency=TTS_STREAM_CONCURRENCY,
+                 enabled=SPEECH_PREFETCH_ENABLED):
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.enabled = enabled
+        self._slots = threading.BoundedSemaphore(max(1, max_active))
+        self._lock = threading.Lock()
+        self._active = {}  # key -> prefetch, from finish() until the audio is stored
+        self.started = 0
+        self.skipped = 0
+
+    def _acquire(self):
+        if self.enabled and self._slots.acquire(blocking=False):
+            self.started += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def start(self, synthesize):
+        """A SpeechPrefetch using synthesize(sentence) -> audio chunks, or None when disabled or at capacity"""
+        return SpeechPrefetch(self, synthesize, self.max_concurrency) if self._acquire() else None
+
+    def start_async(self, synthesize):
+        """An AsyncSpeechPrefetch (synthesize returns an async iterator), or None"""
+        return AsyncSpeechPrefetch(self, synthesize, self.max_concurrency) if self._acquire() else None
+
+    def get(self, key):
+        with self._lock:
+            return self._active.get(key)
+
+    def _publish(self, key, prefetch):
+        prefetch.key = key
+        with self._lock:
+            self._active.setdefault(key, prefetch)
+
+    def _complete(self, prefetch, audio):
+        try:
+            if audio and prefetch.key:
+                self.store(prefetch.key, audio)
+        except Exception as e:
+            print(f"Speech prefetch store error: {e}")
+        finally:
+            with self._lock:
+                if self._active.get(prefetch.key) is prefetch:
+                    del self._active[prefetch.key]
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._active)
+        return {"in_flight": in_flight, "started": self.started, "skipped": self.skipped}
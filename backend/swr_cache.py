@@ -0,0 +1,177 @@
+"""
+TTL cache with stale-while-revalidate and single-flight loading.
+
+- fresh entries (age < ttl) are returned directly
+- stale entries (ttl <= age < ttl + stale_ttl) are returned immediately while
+  one background thread refreshes them
+- misses load synchronously, and concurrent misses for the same key share a
+  single load instead of each calling the loader
+- invalidate() stamps the key with a global invalidation counter, so a load
+  that was already running when the key was invalidated doesn't put its old
+  value back. Only the latest max_entries stamps are kept; older ones are
+  folded into a floor that rejects every load started before them, so the
+  bookkeeping stays bounded at the cost of an occasional dropped value
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """One in-progress load that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SWRCache:
+    """Per-key TTL cache with stale-while-revalidate refresh and hit/miss counters"""
+
+    def __init__(self, ttl=60.0, stale_ttl=240.0, max_entries=1024, name="cache"):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, loaded_at)
+        self._flights = {}
+        self._invalidations = 0  # counter bumped by every invalidate()
+        self._invalidated = OrderedDict()  # key -> counter at its last invalidation, oldest first
+        self._floor = 0  # counter at the last invalidation no longer in _invalidated
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                       "refreshes": 0, "load_errors": 0, "evictions": 0}
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() when it must be (re)built"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._flights:
+                        flight = self._flights[key] = _Flight()
+                        self._stats["refreshes"] += 1
+                        threading.Thread(target=self._load, args=(key, loader, flight),
+                                         name=f"{self.name}-refresh", daemon=True).start()
+                    return value
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                owner = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+                owner = True
+
+        if owner:
+            self._load(key, loader, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, loader, flight):
+        generation = self.generation(key)
+        try:
+            flight.value = loader()
+            self.set(key, flight.value, generation)
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats["load_errors"] += 1
+            print(f"{self.name} load error ({key}): {e}")
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def generation(self, key):
+        """Token to take before loading key outside get(); set() drops the value if key is invalidated after it"""
+        with self._lock:
+            return self._invalidations
+
+    def get_if_fresh(self, key):
+        """Return the value if it is within its TTL (counted as a hit), else None without loading"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def lookup(self, key):
+        """
+        (value, state) without loading, for callers that load on their own
+        (e.g. async code): state is 'fresh', 'stale' or None when the entry is
+        missing or past its stale window. Counted like get().
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if age is not None and age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                fresh = age < self.ttl
+                self._stats["hits" if fresh else "stale_hits"] += 1
+                return entry[0], ("fresh" if fresh else "stale")
+            self._stats["misses"] += 1
+            return None, None
+
+    def set(self, key, value, generation=None):
+        """
+        Store a value loaded outside get(). With the generation() taken before
+        loading, the value is dropped if the key was invalidated meanwhile.
+        Returns whether it was stored.
+        """
+        with self._lock:
+            if generation is not None and generation < self._invalidated.get(key, self._floor):
+                return False
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            return True
+
+    def peek(self, key):
+        """Return the cached value without loading or touching counters (None if absent)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None. Loads already running won't store their values"""
+        with self._lock:
+            self._invalidations += 1
+            if key is None:
+                self._entries.clear()
+                self._flights.clear()
+                self._invalidated.clear()
+                self._floor = self._invalidations
+            else:
+                self._entries.pop(key, None)
+                self._flights.pop(key, None)
+                self._invalidated.pop(key, None)
+                self._invalidated[key] = self._invalidations
+                while len(self._invalidated) > self.max_entries:
+                    _, self._floor = self._invalidated.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,229 @@
+"""
+Per-stage latency tracing and Prometheus metrics.
+
+    with span("nessie.purchases"):
+        ...
+
+A span times one stage (a Nessie call, a Gemini generate, a TTS call, a
+Computer Use turn or action) and records it in
+
+- a latency histogram per stage and labels (stage_duration_seconds), plus an
+  error counter when the block raises
+- the current request's timings, if a request is being traced. They are
+  sent back as a Server-Timing header (one entry per stage: total ms and
+  call count), so a slow response shows where its time went
+
+Request timings live in a contextvar. Threads started with
+contextvars.copy_context() (fan_out, asyncio.to_thread) report into the
+request that started them; background work such as car search jobs only
+feeds the histograms.
+
+render_metrics() returns everything in the Prometheus text format: stage
+histograms and errors, HTTP request histograms, and gauges registered with
+register_gauge() (evaluated at scrape time). A span costs two clock reads
+and one short lock hold, so tracing is on by default (TRACING_ENABLED=0
+turns spans into no-ops).
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1') == '1'
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', '1') == '1'
+METRICS_PREFIX = os.getenv('METRICS_PREFIX', 'moneytalks')
+
+# Seconds: covers sub-ms cache work up to minute-long Computer Use searches
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Histograms and counters keyed by (metric name, label pairs)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {labels: Histogram}
+        self._counters = {}  # name -> {labels: value}
+        self._help = {}
+        self._gauges = []  # (name, help, fn returning {labels: value} or a number)
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, seconds, labels=()):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def register_gauge(self, name, help_text, fn):
+        self._gauges.append((name, help_text, fn))
+
+    def render(self, prefix=METRICS_PREFIX):
+        with self._lock:
+            histograms = {name: {labels: (list(h.counts), h.sum, h.count) for labels, h in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        lines = []
+        for name, series in sorted(histograms.items()):
+            full = f"{prefix}_{name}"
+            lines += [f"# HELP {full} {self._help.get(name, name)}", f"# TYPE {full} histogram"]
+            for labels, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{full}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{full}_count{_labels(labels)} {count}")
+        for name, series in sorted(counters.items()):
+            full = f"{prefix}_{name}"
+            lines += [f"# HELP {full} {self._help.get(name, name)}", f"# TYPE {full} counter"]
+            lines += [f"{full}{_labels(labels)} {value}" for labels, value in sorted(series.items())]
+        for name, help_text, fn in self._gauges:
+            try:
+                values = fn()
+            except Exception as e:
+                print(f"Metrics gauge {name} failed: {e}")
+                continue
+            if not isinstance(values, dict):
+                values = {(): values}
+            full = f"{prefix}_{name}"
+            lines += [f"# HELP {full} {help_text}", f"# TYPE {full} gauge"]
+            lines += [f"{full}{_labels(labels)} {float(value or 0):g}" for labels, value in sorted(values.items())]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+registry = MetricsRegistry()
+registry.describe("stage_duration_seconds", "Latency of one traced stage (upstream call, agent turn, ...)")
+registry.describe("stage_errors_total", "Traced stages that raised")
+registry.describe("http_request_duration_seconds", "Time to produce a response (streamed bodies excluded)")
+registry.describe("http_requests_total", "Requests by route, method and status")
+
+
+class RequestTimings:
+    """Stage totals for one request, reported as a Server-Timing header"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [seconds, calls], in first-seen order
+
+    def add(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def header(self):
+        """Server-Timing value: one metric per stage (summed across calls) plus the total"""
+        with self._lock:
+            stages = list(self._stages.items())
+        parts = [f'{stage.replace(".", "-")};dur={seconds * 1000:.1f};desc="{calls}x"'
+                 for stage, (seconds, calls) in stages]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request():
+    """Begin collecting stage timings for the request running in this context"""
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def current_timings():
+    return _current.get()
+
+
+def observe(stage, seconds, **labels):
+    """Record an already measured stage duration"""
+    if not TRACING_ENABLED:
+        return
+    registry.observe("stage_duration_seconds", seconds, (("stage", stage),) + tuple(sorted(labels.items())))
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+class span:
+    """
+    with span(stage, **labels): time the block as `stage`. Extra labels become
+    histogram labels, so keep them low-cardinality
+    """
+
+    __slots__ = ("stage", "labels", "started")
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not TRACING_ENABLED:
+            return False
+        if exc_type is not None:
+            registry.inc("stage_errors_total", (("stage", self.stage),))
+        observe(self.stage, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def finish_request(timings, route, method, status):
+    """Record the request in the HTTP metrics; returns the Server-Timing header value (or None)"""
+    elapsed = timings.elapsed()
+    labels = (("method", method), ("route", route))
+    registry.observe("http_request_duration_seconds", elapsed, labels)
+    registry.inc("http_requests_total", labels + (("status", str(status)),))
+    return timings.header() if SERVER_TIMING_HEADER else None
+
+
+def register_gauge(name, help_text, fn):
+    registry.register_gauge(name, help_text, fn)
+
+
+def render_metrics():
+    return registry.render()
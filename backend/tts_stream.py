@@ -0,0 +1,293 @@
+"""
+Streaming speech synthesis with sentence-level chunking.
+
+Advisor text is split at sentence boundaries and each sentence is synthesized
+separately, with at most `max_concurrency` sentences in flight. Audio is
+yielded strictly in sentence order: the first sentence streams straight
+through as its bytes arrive, while the next few are synthesized ahead and
+buffered. Memory per request is bounded by the look-ahead window, not by the
+length of the text, and playback can start after the first sentence.
+
+stream_sentences() takes the sentences from an iterable instead, so text
+that is still being generated can be synthesized as it arrives (SentenceBuffer
+cuts the streamed text into sentences). astream_speech() and
+astream_sentences() do the same on an asyncio event loop for async
+synthesizers. start_speech() and astart_speech() wait for the first
+sentence's audio before handing back the stream, so a route can still
+answer with an error status when synthesis fails.
+"""
+import asyncio
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+TTS_STREAM_WORKERS = int(os.getenv('TTS_STREAM_WORKERS', 8))
+TTS_STREAM_CONCURRENCY = int(os.getenv('TTS_STREAM_CONCURRENCY', 3))
+TTS_SENTENCE_MIN_CHARS = int(os.getenv('TTS_SENTENCE_MIN_CHARS', 40))
+TTS_SENTENCE_MAX_CHARS = int(os.getenv('TTS_SENTENCE_MAX_CHARS', 400))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+(?=[A-Z0-9"\'(\[$])')
+_CLAUSE_END = re.compile(r'(?<=[,;:])\s+')
+
+_executor = None
+_executor_lock = threading.Lock()
+_DONE = object()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TTS_STREAM_WORKERS, thread_name_prefix='tts')
+        return _executor
+
+
+def split_sentences(text, min_chars=TTS_SENTENCE_MIN_CHARS, max_chars=TTS_SENTENCE_MAX_CHARS):
+    """
+    Split text into speakable chunks at sentence boundaries.
+
+    Very short sentences are merged with the next one (tiny requests sound
+    choppy and cost a round trip each); overlong ones are split at clause
+    boundaries, then at whitespace.
+    """
+    sentences = [s.strip() for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+
+    pieces = []
+    for sentence in sentences:
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        current = ""
+        for clause in _CLAUSE_END.split(sentence):
+            while len(clause) > max_chars:
+                cut = clause.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(clause[:cut].strip())
+                clause = clause[cut:].strip()
+            if current and len(current) + len(clause) + 1 > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}".strip()
+        if current:
+            pieces.append(current)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) < min_chars and len(chunks[-1]) + len(piece) + 1 <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+class _SentenceJob:
+    """Synthesizes one sentence on a worker thread, handing audio chunks over a queue"""
+
+    def __init__(self, sentence, synthesize, cancelled):
+        self.sentence = sentence
+        self.chunks = queue.Queue()
+        self.future = _get_executor().submit(self._run, sentence, synthesize, cancelled)
+
+    def _run(self, sentence, synthesize, cancelled):
+        chunks = None
+        try:
+            chunks = iter(synthesize(sentence))
+            for chunk in chunks:
+                if cancelled.is_set():
+                    break
+                if chunk:
+                    self.chunks.put(chunk)
+        except Exception as e:
+            self.chunks.put(e)
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            self.chunks.put(_DONE)
+
+
+class SentenceBuffer:
+    """Cuts text that arrives in pieces (a streamed Gemini answer) into speakable chunks as they complete"""
+
+    def __init__(self, min_chars=TTS_SENTENCE_MIN_CHARS, max_chars=TTS_SENTENCE_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._text = ""
+
+    def feed(self, text):
+        """Add text; returns the chunks that are now complete (everything up to the last sentence end)"""
+        self._text += text
+        ends = [match.start() for match in _SENTENCE_END.finditer(self._text)]
+        # Hold back a lone short opener ("Hi.") until it can be merged with the next sentence
+        if not ends or ends[-1] < self.min_chars:
+            return []
+        complete, self._text = self._text[:ends[-1]], self._text[ends[-1]:]
+        return split_sentences(complete, self.min_chars, self.max_chars)
+
+    def close(self):
+        """The rest of the text, once no more is coming"""
+        chunks = split_sentences(self._text, self.min_chars, self.max_chars) if self._text.strip() else []
+        self._text = ""
+        return chunks
+
+
+def stream_speech(text, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY, failed=None):
+    """
+    Yield audio bytes for text in sentence order.
+
+    synthesize(sentence) must return an iterable of audio byte chunks. A
+    sentence that fails is logged and skipped so one bad chunk doesn't cut
+    the rest of the answer. Closing the generator cancels outstanding work.
+    """
+    return stream_sentences(split_sentences(text), synthesize, max_concurrency, failed)
+
+
+def stream_sentences(sentences, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY, failed=None):
+    """
+    stream_speech for sentences that may still be arriving: sentences is any
+    iterable, and a sentence is sent to synthesize() as soon as it is taken
+    from it (while earlier ones are still being synthesized).
+
+    Sentences that fail are appended to the failed list, if one is given, so
+    callers can tell complete audio from audio with gaps.
+    """
+    sentences = iter(sentences)
+    cancelled = threading.Event()
+    window = []
+
+    def fill():
+        while len(window) < max(1, max_concurrency):
+            sentence = next(sentences, None)
+            if sentence is None:
+                return
+            window.append(_SentenceJob(sentence, synthesize, cancelled))
+
+    try:
+        fill()
+        while window:
+            job = window[0]
+            while True:
+                chunk = job.chunks.get()
+                if chunk is _DONE:
+                    break
+                if isinstance(chunk, Exception):
+                    print(f"TTS chunk error: {chunk}")
+                    if failed is not None:
+                        failed.append(job.sentence)
+                    continue
+                yield chunk
+            window.pop(0)
+            fill()
+    finally:
+        cancelled.set()
+
+
+def _prepend(first, audio):
+    try:
+        yield first
+        yield from audio
+    finally:
+        audio.close()
+
+
+def start_speech(text, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY):
+    """
+    stream_speech, started before it is returned: blocks until the first
+    sentence's audio arrives. None (with the work cancelled) if the first
+    sentence fails, e.g. when the TTS service is down.
+    """
+    failed = []
+    audio = stream_speech(text, synthesize, max_concurrency, failed)
+    first = next(audio, None)
+    if first is None or failed:
+        audio.close()
+        return None
+    return _prepend(first, audio)
+
+
+async def _synthesize_into(sentence, synthesize, chunks):
+    try:
+        async for chunk in synthesize(sentence):
+            if chunk:
+                await chunks.put(chunk)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await chunks.put(e)
+    finally:
+        chunks.put_nowait(_DONE)
+
+
+async def _aiter_list(items):
+    for item in items:
+        yield item
+
+
+def astream_speech(text, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY, failed=None):
+    """
+    Async version of stream_speech: synthesize(sentence) must return an async
+    iterator of audio chunks. Closing the generator cancels outstanding tasks.
+    """
+    return astream_sentences(_aiter_list(split_sentences(text)), synthesize, max_concurrency, failed)
+
+
+async def astream_sentences(sentences, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY, failed=None):
+    """Async stream_sentences: sentences is an async iterable"""
+    sentences = sentences.__aiter__()
+    window = []  # (task, chunk queue, sentence) in sentence order
+
+    async def fill():
+        while len(window) < max(1, max_concurrency):
+            try:
+                sentence = await sentences.__anext__()
+            except StopAsyncIteration:
+                return
+            chunks = asyncio.Queue()
+            task = asyncio.ensure_future(_synthesize_into(sentence, synthesize, chunks))
+            window.append((task, chunks, sentence))
+
+    try:
+        await fill()
+        while window:
+            _, chunks, sentence = window[0]
+            while True:
+                chunk = await chunks.get()
+                if chunk is _DONE:
+                    break
+                if isinstance(chunk, Exception):
+                    print(f"TTS chunk error: {chunk}")
+                    if failed is not None:
+                        failed.append(sentence)
+                    continue
+                yield chunk
+            window.pop(0)
+            await fill()
+    finally:
+        for task, _, _ in window:
+            task.cancel()
+
+
+async def _aprepend(first, audio):
+    try:
+        yield first
+        async for chunk in audio:
+            yield chunk
+    finally:
+        await audio.aclose()
+
+
+async def astart_speech(text, synthesize, max_concurrency=TTS_STREAM_CONCURRENCY):
+    """Async start_speech"""
+    failed = []
+    audio = astream_speech(text, synthesize, max_concurrency, failed)
+    first = await anext(audio, None)
+    if first is None or failed:
+        await audio.aclose()
+        return None
+    return _aprepend(first, audio)
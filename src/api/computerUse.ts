@@ -12,6 +12,8 @@ export interface CarRecommendation {
   price: number;
   condition: 'New' | 'Used';
   description: string;
+  features: string[];
+  within_budget: boolean | null;
 }
 
 export interface CarRecommendationsResponse {
@@ -20,6 +22,7 @@ export interface CarRecommendationsResponse {
   results: {
     raw_text: string;
     recommendations: CarRecommendation[];
+    over_budget: CarRecommendation[];
     success: boolean;
   };
   timestamp: string;
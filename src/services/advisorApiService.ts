@@ -3,9 +3,15 @@
 
 const API_BASE_URL = 'http://localhost:3001';
 
+export interface AudioHandle {
+  key: string;
+  url: string;
+}
+
 export interface AdvisorSession {
   session_id: string;
   welcome_message: string;
+  welcome_audio: AudioHandle | null;
   financial_summary: {
     total_spending: number;
     budget_limit: number;
@@ -126,6 +132,24 @@ class AdvisorApiService {
     }
   }
 
+  /**
+   * Fetch audio by handle (e.g. a session's welcome_audio, which may still be synthesizing)
+   */
+  async fetchAudio(handle: AudioHandle): Promise<Blob> {
+    try {
+      const response = await fetch(`${API_BASE_URL}${handle.url}`);
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.blob();
+    } catch (error) {
+      console.error('Error fetching audio:', error);
+      throw error;
+    }
+  }
+
   /**
    * Get spending analysis with AI insights
    */